@@ -0,0 +1,116 @@
+import argparse
+import os
+import subprocess
+import sys
+from statistics import median
+
+"""
+This script measures what starting quantify costs, and fails when it goes
+over the startup budget, e.g.
+
+    python -m quantify.benchmarks.bench_import --budget-ms 50
+
+Every measurement runs in a fresh interpreter: the import time of
+quantify.cli comes from python -X importtime, and the wall time of
+'quantify --help' is given next to the one of an interpreter that imports
+nothing, the part quantify cannot do anything about. The heaviest imports
+are listed so a module that sneaks back into the startup path is easy to
+find.
+
+The check also fails when quantify.cli imports one of HEAVY_MODULES, those
+are only to be imported by the command that needs them.
+"""
+MODULE = "quantify.cli"
+DEFAULT_BUDGET_MS = 50
+HEAVY_MODULES = (
+    "requests",
+    "sqlite3",
+    "pstats",
+    "concurrent.futures.process",
+    "quantify.run_somef",
+    "quantify.count_results",
+    "quantify.rqs_scripts.scan",
+    "quantify.rqs_scripts.rq2",
+    "quantify.benchmarks.bench_pipeline"
+)
+
+def python_command(*arguments):
+    # The child finds quantify where this interpreter found it
+    environment = dict(os.environ)
+    source_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    environment["PYTHONPATH"] = os.pathsep.join(filter(None, [source_dir, environment.get("PYTHONPATH")]))
+    return subprocess.run([sys.executable, *arguments], capture_output=True, text=True, env=environment, check=True)
+
+def parse_importtime(output):
+    """Returns (module, self microseconds, cumulative microseconds) for every line of python -X importtime"""
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append((module.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+def import_time(module=MODULE, repeat=5):
+    """Median cumulative import time of module in ms, and the import rows of the fastest run"""
+    times, best_rows = [], None
+    for _ in range(repeat):
+        rows = parse_importtime(python_command("-X", "importtime", "-c", f"import {module}").stderr)
+        cumulative = next(cumulative_us for name, self_us, cumulative_us in rows if name == module) / 1000
+        if not times or cumulative < min(times):
+            best_rows = rows
+        times.append(cumulative)
+    return median(times), best_rows
+
+def wall_time(arguments, repeat=5):
+    """Median wall time in ms of a fresh interpreter run with arguments"""
+    times = []
+    for _ in range(repeat):
+        result = python_command("-c", f"import subprocess, sys, time; start = time.perf_counter(); "
+                                      f"subprocess.run([sys.executable] + {list(arguments)!r}, capture_output=True); "
+                                      f"print(time.perf_counter() - start)")
+        times.append(float(result.stdout) * 1000)
+    return median(times)
+
+def heavy_imports(module=MODULE):
+    """The HEAVY_MODULES that importing module loads"""
+    result = python_command("-c", f"import sys, {module}; print('\\n'.join(sys.modules))")
+    loaded = set(result.stdout.split())
+    return [name for name in HEAVY_MODULES if name in loaded]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the startup time of the quantify CLI against a budget")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help=f"Allowed import time of {MODULE} in ms (default: {DEFAULT_BUDGET_MS})")
+    parser.add_argument("--repeat", "-r", type=int, default=5, help="Fresh interpreters per measurement, the median is kept (default: 5)")
+    parser.add_argument("--top", type=int, default=10, help="Number of heaviest imports to list (default: 10)")
+    args = parser.parse_args(argv)
+
+    milliseconds, rows = import_time(MODULE, args.repeat)
+    bare = wall_time(["-c", "pass"], args.repeat)
+    help_time = wall_time(["-m", MODULE, "--help"], args.repeat)
+
+    print(f"import {MODULE}: {milliseconds:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    print(f"quantify --help: {help_time:.1f} ms, of which {bare:.1f} ms starting the interpreter")
+    print("\nHeaviest imports (cumulative ms)")
+    # Only what the import of the module itself pulled in
+    start = next(position for position, row in enumerate(rows) if row[0] == MODULE)
+    module_rows = rows[:start + 1]
+    # Rows already imported by site are not part of the module
+    first = max((position for position, row in enumerate(module_rows) if row[0] == "site"), default=-1) + 1
+    for name, self_us, cumulative_us in sorted(module_rows[first:], key=lambda row: row[2], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>8.1f}  {name}")
+
+    failures = []
+    if milliseconds > args.budget_ms:
+        failures.append(f"import {MODULE} takes {milliseconds:.1f} ms, over the budget of {args.budget_ms:.0f} ms")
+    loaded = heavy_imports(MODULE)
+    if loaded:
+        failures.append(f"import {MODULE} loads {', '.join(loaded)}, they should be imported by the commands using them")
+
+    for failure in failures:
+        print(f"Error: {failure}")
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
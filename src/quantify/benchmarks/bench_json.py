@@ -0,0 +1,98 @@
+import argparse
+import gc
+import os
+import sys
+import time
+
+from quantify import json_backend
+from quantify.rqs_scripts import rq1, rq3, rq4, rq5
+from quantify.rqs_scripts.scan import iter_output_files, scan
+from quantify.rqs_scripts.feature_index import build_index
+
+"""
+This script measures how fast each available JSON backend parses SoMEF
+outputs and writes the RQ result files (indent=4) and the feature index
+(compact), e.g. on the bundled corpus:
+
+    python -m quantify.benchmarks.bench_json --somef-dir msr2025_data/somef_output_0.9.11
+
+Files are read into memory first so only decoding and encoding are timed.
+Every timing is the best of --repeat runs, with the garbage collector off.
+"""
+MISSING_KEY = "somef_missing_categories"
+
+def best_time(function, repeat):
+    # Like timeit, the garbage collector is kept out of the measurement
+    best = None
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+    finally:
+        gc.enable()
+    return best
+
+def available_backends():
+    return [backend for backend in json_backend.BACKENDS if json_backend.select_backend(backend) == backend]
+
+def bench_backend(backend, documents, results, index, repeat):
+    json_backend.use_backend(backend)
+    return {
+        "backend": backend,
+        "parse": best_time(lambda: [json_backend.loads(document) for document in documents], repeat),
+        "dump_results": best_time(lambda: [json_backend.dumps(result, indent=4) for result in results], repeat),
+        "dump_index": best_time(lambda: json_backend.dumps_bytes(index), repeat)
+    }
+
+def run_benchmark(somef_dir, repeat=3, limit=None):
+    files = [file_path for file_name, file_path, nested in iter_output_files(somef_dir, recursive=True)]
+    files = files[:limit] if limit else files
+
+    documents = []
+    for file_path in files:
+        with open(file_path, 'rb') as f:
+            documents.append(f.read())
+
+    # What 'quantify rqs' and 'quantify index' write for the whole directory
+    results = scan(somef_dir, MISSING_KEY, [rq1, rq3, rq4, rq5])
+    index = build_index(somef_dir, MISSING_KEY)
+
+    previous = json_backend.BACKEND
+    try:
+        rows = [bench_backend(backend, documents, results, index, repeat) for backend in available_backends()]
+    finally:
+        json_backend.use_backend(previous)
+
+    return {"files": len(documents), "bytes": sum(len(document) for document in documents), "rows": rows}
+
+def print_report(report):
+    megabytes = report["bytes"] / 1e6
+    baseline = next(row for row in report["rows"] if row["backend"] == "json")
+
+    print(f"{report['files']} SoMEF outputs, {megabytes:.1f} MB")
+    print(f"{'backend':<10}{'parse (s)':>12}{'MB/s':>10}{'speedup':>10}{'dump results (s)':>19}{'speedup':>10}{'dump index (s)':>17}{'speedup':>10}")
+    for row in report["rows"]:
+        print(f"{row['backend']:<10}"
+              f"{row['parse']:>12.3f}{megabytes / row['parse']:>10.1f}{baseline['parse'] / row['parse']:>9.2f}x"
+              f"{row['dump_results']:>19.3f}{baseline['dump_results'] / row['dump_results']:>9.2f}x"
+              f"{row['dump_index']:>17.3f}{baseline['dump_index'] / row['dump_index']:>9.2f}x")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the JSON backends on a SoMEF output directory")
+    parser.add_argument("--somef-dir", "-s", required=True, help="Directory containing SoMEF output JSON files, searched recursively")
+    parser.add_argument("--repeat", "-r", type=int, default=3, help="Runs per measurement, the best one is kept (default: 3)")
+    parser.add_argument("--limit", "-n", type=int, help="Only use the first N files")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.somef_dir):
+        print(f"Error: SoMEF output directory {args.somef_dir} not found.")
+        sys.exit(1)
+
+    print_report(run_benchmark(args.somef_dir, args.repeat, args.limit))
+
+if __name__ == "__main__":
+    main()
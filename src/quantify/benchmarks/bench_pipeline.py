@@ -0,0 +1,186 @@
+import argparse
+import contextlib
+import copy
+import io
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from statistics import median
+from concurrent.futures import ProcessPoolExecutor
+
+from quantify import json_backend
+from quantify import count_results
+from quantify.rqs_scripts import rq1, rq3, rq4, rq5
+from quantify.rqs_scripts.scan import iter_output_files, scan
+from quantify.benchmarks.corpus import DEFAULT_SOURCE, corpus_profile, generate_corpus
+from quantify.benchmarks.regression import calibrate
+
+"""
+This script measures the throughput of the RQ pipeline stage by stage on a
+SoMEF output corpus, e.g. on a synthetic corpus of 10k repositories:
+
+    python -m quantify.benchmarks.bench_pipeline --generate 10000 --source msr2025_data/somef_output_0.9.11
+
+or on an existing directory with --somef-dir. The stages are:
+
+    rq1, rq3, rq4, rq5    one scan of the corpus with that RQ alone
+    scan                  the single pass 'quantify rqs' does for all four
+    process_versions      the RQ3 version classification of the scan result
+    count                 count_rq1 ... count_rq5 over the saved analysis files
+
+RQ2 is left out, it is bound by the Software Heritage API and not by this
+code. Every stage runs in a fresh process so its peak RSS is its own, and
+its time is the best of at least --repeat runs: a short stage is run again
+until MIN_MEASURED_SECONDS were spent on it (at most MAX_REPEAT runs), so
+its best time is not one lucky or unlucky run. Throughput is given per corpus file
+and corpus megabyte for every stage, so the stages can be compared.
+"""
+MISSING_KEY = "somef_missing_categories"
+CLUSTER = "bench"
+VISITORS = {"rq1": rq1, "rq3": rq3, "rq4": rq4, "rq5": rq5}
+STAGES = ("rq1", "rq3", "rq4", "rq5", "scan", "process_versions", "count")
+MIN_MEASURED_SECONDS = 2.0
+MAX_REPEAT = 50
+
+def peak_rss_mb():
+    # On Linux ru_maxrss carries over the peak of the process that spawned
+    # this one, the high water mark of /proc is this process' own
+    try:
+        with open("/proc/self/status", 'r') as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+def write_analysis_files(somef_dir, work_dir):
+    """Writes what 'quantify rqs' writes, with a stand-in for the RQ2 lookups"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        result_rq1, result_rq3, result_rq4, result_rq5 = scan(somef_dir, MISSING_KEY, [rq1, rq3, rq4, rq5])
+        consistency = rq3.process_versions(somef_dir, result_rq3)
+
+        rq1.save_results(work_dir, result_rq1, f"analysis_{CLUSTER}_rq1.json")
+        rq3.save_results(work_dir, result_rq3, consistency, f"class_{CLUSTER}_rq3.json", f"const_{CLUSTER}_rq3.json")
+        rq4.save_results(work_dir, result_rq4, f"analysis_{CLUSTER}_rq4.json")
+        rq5.save_results(work_dir, result_rq5, f"analysis_{CLUSTER}_rq5.json")
+
+    with open(os.path.join(work_dir, f"analysis_{CLUSTER}_rq2.json"), 'w') as f:
+        json_backend.dump({"results": [], "summary": {"count_in_swh": 0, "count_not_in_swh": 0}}, f, indent=4)
+
+def count_all(work_dir, repo_count):
+    doi, _ = count_results.count_rq1(work_dir, CLUSTER, repo_count)
+    count_results.count_rq2(work_dir, CLUSTER, doi, repo_count)
+    count_results.count_rq3(work_dir, CLUSTER, repo_count)
+    count_results.count_rq4(work_dir, CLUSTER, repo_count)
+    count_results.count_rq5(work_dir, CLUSTER, repo_count)
+
+def run_stage(stage, somef_dir, work_dir, repo_count, repeat):
+    """Runs in a process of its own, returns the best time of the stage, the peak RSS of the process and the time of the calibration loop"""
+    if stage in VISITORS:
+        prepare, function = None, lambda _: scan(somef_dir, MISSING_KEY, [VISITORS[stage]])
+    elif stage == "scan":
+        prepare, function = None, lambda _: scan(somef_dir, MISSING_KEY, [rq1, rq3, rq4, rq5])
+    elif stage == "process_versions":
+        # process_versions annotates the result in place, every run gets its own copy
+        result_rq3, = scan(somef_dir, MISSING_KEY, [rq3])
+        prepare, function = lambda: copy.deepcopy(result_rq3), lambda result: rq3.process_versions(somef_dir, result)
+    elif stage == "count":
+        prepare, function = None, lambda _: count_all(work_dir, repo_count)
+    else:
+        raise ValueError(f"Unknown stage {stage}")
+
+    best = None
+    runs = 0
+    measured = 0.0
+    with contextlib.redirect_stdout(io.StringIO()):
+        while runs < repeat or (measured < MIN_MEASURED_SECONDS and runs < MAX_REPEAT):
+            argument = prepare() if prepare else None
+            start = time.perf_counter()
+            function(argument)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+            runs += 1
+            measured += elapsed
+
+    # Calibrating next to the stage follows the speed of a busy or throttled machine
+    return best, peak_rss_mb(), calibrate()
+
+def corpus_size(somef_dir):
+    files = [file_path for file_name, file_path, nested in iter_output_files(somef_dir, recursive=True)]
+    return len(files), sum(os.path.getsize(file_path) for file_path in files)
+
+def run_benchmark(somef_dir, stages=STAGES, repeat=3):
+    files, size = corpus_size(somef_dir)
+    if not files:
+        raise ValueError(f"No SoMEF outputs found in {somef_dir}")
+
+    rows = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        if "count" in stages:
+            write_analysis_files(somef_dir, work_dir)
+
+        # A new spawned process per stage, a forked one would start with this process' memory
+        context = multiprocessing.get_context("spawn")
+        for stage in stages:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                seconds, peak_rss, calibration_seconds = pool.submit(run_stage, stage, somef_dir, work_dir, files, repeat).result()
+            rows.append({
+                "stage": stage,
+                "seconds": seconds,
+                "files_per_s": files / seconds,
+                "mb_per_s": size / 1e6 / seconds,
+                "peak_rss_mb": peak_rss,
+                "calibration_seconds": calibration_seconds
+            })
+
+    # The calibration next to a single stage drifts with the machine as much as the stage does
+    return {"files": files, "bytes": size, "json_backend": json_backend.BACKEND, "calibration_seconds": median(row["calibration_seconds"] for row in rows), "rows": rows}
+
+def measure(somef_dir=None, generate=None, source=DEFAULT_SOURCE, stages=STAGES, repeat=3, seed=0):
+    """Benchmarks somef_dir, or a synthetic corpus of generate repositories modelled on source"""
+    if not generate:
+        return run_benchmark(somef_dir, stages, repeat)
+
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        generate_corpus(corpus_profile(source, seed=seed), corpus_dir, generate, seed)
+        return run_benchmark(corpus_dir, stages, repeat)
+
+def print_report(report):
+    print(f"{report['files']} SoMEF outputs, {report['bytes'] / 1e6:.1f} MB, JSON backend {report['json_backend']}, calibration loop {report['calibration_seconds'] * 1000:.1f} ms")
+    print(f"{'stage':<18}{'time (s)':>10}{'files/s':>10}{'MB/s':>10}{'peak RSS (MB)':>15}")
+    for row in report["rows"]:
+        print(f"{row['stage']:<18}{row['seconds']:>10.3f}{row['files_per_s']:>10.0f}{row['mb_per_s']:>10.1f}{row['peak_rss_mb']:>15.1f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the RQ pipeline stage by stage on a SoMEF output corpus")
+    parser.add_argument("--somef-dir", "-s", help="SoMEF output directory to measure")
+    parser.add_argument("--generate", "-g", type=int, help="Measure a synthetic corpus of this many repositories instead")
+    parser.add_argument("--source", default=DEFAULT_SOURCE, help=f"Corpus the synthetic one is modelled on (default: {DEFAULT_SOURCE})")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES), help="Stages to measure (default: all)")
+    parser.add_argument("--repeat", "-r", type=int, default=3, help="Least runs per stage, the best one is kept; short stages run more often (default: 3)")
+    parser.add_argument("--output", "-o", help="Also write the report as JSON to this file")
+    args = parser.parse_args(argv)
+
+    if not args.somef_dir and not args.generate:
+        parser.error("--somef-dir or --generate is required")
+
+    source_dir = args.source if args.generate else args.somef_dir
+    if not os.path.exists(source_dir):
+        print(f"Error: SoMEF output directory {source_dir} not found.")
+        sys.exit(1)
+
+    report = measure(args.somef_dir, args.generate, args.source, args.stages, args.repeat)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json_backend.dump(report, f, indent=4)
+
+if __name__ == "__main__":
+    main()
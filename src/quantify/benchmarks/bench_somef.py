@@ -0,0 +1,64 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from statistics import median
+
+from quantify import run_somef
+
+"""
+This script compares the two SoMEF backends of 'quantify somef' (see
+run_somef), e.g.
+
+    python -m quantify.benchmarks.bench_somef --input repos.json --jobs 4
+
+It first measures what the subprocess backend pays for every repository
+before SoMEF starts working: a fresh interpreter that imports SoMEF's
+describe entry point. The in-process backend pays it once per job. With
+--input both backends then extract the same repositories, and the time per
+repository of each is printed. SoMEF has to be installed, and extracting
+needs network access.
+"""
+
+def startup_seconds(repeat=5):
+    """Median wall time of an interpreter that imports SoMEF's describe entry point and exits"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import somef.somef_cli"], check=True)
+        times.append(time.perf_counter() - start)
+    return median(times)
+
+def extraction_seconds(input_file, backend, jobs, threshold):
+    """Seconds per repository to extract input_file with backend, and how many repositories were extracted"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        start = time.perf_counter()
+        outcomes = run_somef.run_somef_on_links(input_file, os.path.join(work_dir, "outputs"), threshold, os.path.join(work_dir, "tmp"), jobs=jobs, backend=backend)
+        elapsed = time.perf_counter() - start
+    done = sum(1 for outcome in outcomes if outcome["status"] == "done")
+    return elapsed / max(len(outcomes), 1), done
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the in-process and subprocess SoMEF backends")
+    parser.add_argument("--input", "-i", help="JSON list of repositories to extract with both backends")
+    parser.add_argument("--jobs", "-j", type=int, default=1, help="Repositories extracted concurrently (default: 1)")
+    parser.add_argument("--threshold", "-t", default="0.8", help="Threshold for SoMEF (default: 0.8)")
+    parser.add_argument("--repeat", "-r", type=int, default=5, help="Interpreter starts measured, the median is kept (default: 5)")
+    args = parser.parse_args(argv)
+
+    if not run_somef.somef_importable():
+        print("Error: SoMEF is not installed in this environment.")
+        sys.exit(1)
+
+    startup = startup_seconds(args.repeat)
+    print(f"Starting an interpreter and importing SoMEF: {startup:.2f} s, paid per repository by the subprocess backend and per job by the in-process one")
+
+    if args.input:
+        for backend in ("subprocess", "inprocess"):
+            per_repository, done = extraction_seconds(args.input, backend, args.jobs, args.threshold)
+            print(f"{backend:<12}{per_repository:>8.2f} s per repository ({done} extracted)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import argparse
+import itertools
+import random
+import time
+
+from quantify.rqs_scripts import rq3
+
+"""
+This script measures the RQ3 version classifier on synthetic release tags,
+comparing the single combined pattern with the previous cascade of three
+matches, e.g.
+
+    python -m quantify.benchmarks.bench_versions --tags 2000000
+
+Tags have the shapes seen in the SoMEF outputs (mostly semantic, then
+alphanumeric, a few calendar and free text ones). They are drawn from
+--distinct tags with a Zipf-like skew, as a handful of tags (v1.0.0,
+latest, ...) are much more common than the rest. The memoized classifier
+and parse_version, which also captures the components, are timed as well.
+
+process_versions is then timed on the same tags split into repositories of
+--tags-per-repo tags, against the previous per-file loop, and once more
+without the per-tag classifications of class_*_rq3.json (annotate=False).
+"""
+def cascade_classify(version):
+    if rq3.SEMANTIC_PATTERN.match(version):
+        return "Semantic"
+    elif rq3.CALENDAR_PATTERN.match(version):
+        return "Calendar"
+    elif rq3.ALPHANUMERIC_PATTERN.match(version):
+        return "Alphanumeric"
+    else:
+        return "Other"
+
+def random_tag(rng):
+    shape = rng.random()
+    if shape < 0.75:
+        tag = f"{rng.choice(('v', ''))}{rng.randint(0, 12)}.{rng.randint(0, 30)}.{rng.randint(0, 50)}"
+        return tag + rng.choice(("", "", "", "-beta", "-rc1"))
+    if shape < 0.77:
+        return f"{rng.randint(2015, 2025)}{rng.choice('.-_')}{rng.randint(1, 12):02d}" + rng.choice(("", f".{rng.randint(1, 28)}", "-rc1"))
+    if shape < 0.97:
+        return rng.choice(("latest", "nightly", "stable", "release", "r")) + rng.choice(("", str(rng.randint(1, 40)), f"-{rng.randint(1, 9)}.{rng.randint(0, 9)}"))
+    return rng.choice(("release ", "version ", "build #")) + str(rng.randint(1, 500))
+
+def synthetic_tags(count, distinct, seed=0):
+    rng = random.Random(seed)
+    pool = [random_tag(rng) for _ in range(distinct)]
+    cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, distinct + 1)))
+    return rng.choices(pool, cum_weights=cum_weights, k=count)
+
+def best_time(function, repeat, setup=None):
+    best = None
+    for _ in range(repeat):
+        argument = setup() if setup else None
+        start = time.perf_counter()
+        function(argument)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def per_file_process_versions(result):
+    # process_versions before the tags were classified in bulk, for comparison
+    counts = {"consistent": 0, "inconsistent": 0}
+    for file_data in result["releases"]["versions"]:
+        for file_name, versions in file_data.items():
+            classifications = [rq3.classify_version(version) for version in versions]
+            is_consistent = all(classification == classifications[0] for classification in classifications)
+            counts["consistent" if is_consistent else "inconsistent"] += 1
+            file_data[file_name] = [{"version": version, "classification": classification}
+                                    for version, classification in zip(versions, classifications)]
+    return counts
+
+def synthetic_result(tags, tags_per_repo):
+    versions = [{f"output_{start}.json": tags[start:start + tags_per_repo]} for start in range(0, len(tags), tags_per_repo)]
+    return {"releases": {"count": len(versions), "versions": versions}}
+
+def run_benchmark(count, distinct, repeat=3, tags_per_repo=100):
+    tags = synthetic_tags(count, distinct)
+    uncached = rq3.classify_version.__wrapped__
+
+    expected = list(map(cascade_classify, tags))
+    if list(map(uncached, tags)) != expected or [rq3.parse_version(tag)[0] for tag in tags] != expected:
+        raise AssertionError("The combined patterns do not classify like the cascade")
+
+    def cached(tags):
+        rq3.classify_version.cache_clear()
+        rq3.classify_versions(tags)
+
+    def process(annotate):
+        def function(result):
+            rq3.classify_version.cache_clear()
+            rq3.process_versions(None, result, annotate=annotate)
+        return function
+
+    def per_file(result):
+        rq3.classify_version.cache_clear()
+        per_file_process_versions(result)
+
+    new_result = lambda: synthetic_result(tags, tags_per_repo)
+
+    return {
+        "tags": count,
+        "distinct": len(set(tags)),
+        "repos": len(new_result()["releases"]["versions"]),
+        "classifiers": [
+            {"method": "cascade", "time": best_time(lambda _: list(map(cascade_classify, tags)), repeat)},
+            {"method": "combined", "time": best_time(lambda _: list(map(uncached, tags)), repeat)},
+            {"method": "combined+lru", "time": best_time(lambda _: cached(tags), repeat)},
+            {"method": "parse_version", "time": best_time(lambda _: list(map(rq3.parse_version, tags)), repeat)}
+        ],
+        "process_versions": [
+            {"method": "per file", "time": best_time(per_file, repeat, new_result)},
+            {"method": "bulk", "time": best_time(process(True), repeat, new_result)},
+            {"method": "bulk, no tags", "time": best_time(process(False), repeat, new_result)}
+        ]
+    }
+
+def print_rows(title, rows, tags):
+    baseline = rows[0]["time"]
+
+    print(f"{title:<18}{'time (s)':>10}{'Mtags/s':>10}{'speedup':>10}")
+    for row in rows:
+        print(f"{row['method']:<18}{row['time']:>10.3f}{tags / row['time'] / 1e6:>10.2f}{baseline / row['time']:>9.2f}x")
+
+def print_report(report):
+    print(f"{report['tags']} tags, {report['distinct']} distinct, {report['repos']} repositories")
+    print_rows("classifier", report["classifiers"], report["tags"])
+    print()
+    print_rows("process_versions", report["process_versions"], report["tags"])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the RQ3 version classifiers on synthetic tags")
+    parser.add_argument("--tags", "-n", type=int, default=1000000, help="Number of tags to classify (default: 1000000)")
+    parser.add_argument("--distinct", "-d", type=int, default=50000, help="Number of distinct tags they are drawn from (default: 50000)")
+    parser.add_argument("--tags-per-repo", "-t", type=int, default=100, help="Tags per repository for process_versions (default: 100)")
+    parser.add_argument("--repeat", "-r", type=int, default=3, help="Runs per measurement, the best one is kept (default: 3)")
+    args = parser.parse_args(argv)
+
+    print_report(run_benchmark(args.tags, args.distinct, args.repeat, args.tags_per_repo))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import argparse
+import os
+import random
+import sys
+
+from quantify import json_backend
+from quantify.rqs_scripts.scan import iter_output_files
+
+"""
+This script generates synthetic SoMEF output corpora of any size for the
+benchmarks, with the field distributions of a real corpus, e.g.
+
+    python -m quantify.benchmarks.corpus --source msr2025_data/somef_output_0.9.11 --output /tmp/corpus_10k --repos 10000
+
+The source corpus is read once into a profile: how often every top level
+category is present, and a random sample of the values it takes (release
+lists, license texts, citations, ...). Every synthetic output then keeps
+each category with that probability and a value drawn from its sample, and
+lists the categories it lacks under somef_missing_categories, so the RQ
+scripts see the same mix of shapes and sizes as on the real data.
+"""
+MISSING_KEY = "somef_missing_categories"
+DEFAULT_SOURCE = os.path.join("msr2025_data", "somef_output_0.9.11")
+
+def corpus_profile(source_dir, samples=200, seed=0):
+    """Returns the presence rate and a reservoir sample of the values of every top level category"""
+    rng = random.Random(seed)
+    files = 0
+    categories = {}
+    missing_categories = {}
+
+    for file_name, file_path, nested in iter_output_files(source_dir, recursive=True):
+        with open(file_path, 'rb') as f:
+            data = json_backend.load(f)
+        files += 1
+
+        for category in data.get(MISSING_KEY, []):
+            missing_categories[category] = True
+
+        for key, value in data.items():
+            if key == MISSING_KEY:
+                continue
+            entry = categories.setdefault(key, {"count": 0, "values": []})
+            entry["count"] += 1
+            # Reservoir sampling keeps every value equally likely to be in the sample
+            if len(entry["values"]) < samples:
+                entry["values"].append(value)
+            else:
+                slot = rng.randrange(entry["count"])
+                if slot < samples:
+                    entry["values"][slot] = value
+
+    if not files:
+        raise ValueError(f"No SoMEF outputs found in {source_dir}")
+
+    return {
+        "files": files,
+        "categories": {key: {"rate": entry["count"] / files, "values": entry["values"]} for key, entry in categories.items()},
+        "missing_categories": list(missing_categories)
+    }
+
+def synthetic_output(profile, rng):
+    data = {}
+    for key, category in profile["categories"].items():
+        if rng.random() < category["rate"]:
+            data[key] = rng.choice(category["values"])
+
+    data[MISSING_KEY] = [category for category in profile["missing_categories"] if category not in data]
+    return data
+
+def generate_corpus(profile, output_dir, repos, seed=0):
+    """Writes output_1.json ... output_{repos}.json to output_dir, numbered like 'quantify somef' numbers its outputs; returns their total size in bytes"""
+    rng = random.Random(seed)
+    os.makedirs(output_dir, exist_ok=True)
+
+    total = 0
+    for number in range(1, repos + 1):
+        file_path = os.path.join(output_dir, f"output_{number}.json")
+        with open(file_path, 'w') as f:
+            json_backend.dump(synthetic_output(profile, rng), f, indent=2)
+        total += os.path.getsize(file_path)
+    return total
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic SoMEF output corpus with the field distributions of a real one")
+    parser.add_argument("--source", "-s", default=DEFAULT_SOURCE, help=f"SoMEF output directory the distributions are taken from (default: {DEFAULT_SOURCE})")
+    parser.add_argument("--output", "-o", required=True, help="Directory to write the synthetic output_*.json files to")
+    parser.add_argument("--repos", "-n", type=int, default=1000, help="Number of synthetic repositories (default: 1000)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed, the same seed gives the same corpus (default: 0)")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.source):
+        print(f"Error: SoMEF output directory {args.source} not found.")
+        sys.exit(1)
+
+    profile = corpus_profile(args.source, seed=args.seed)
+    total = generate_corpus(profile, args.output, args.repos, args.seed)
+    print(f"Wrote {args.repos} SoMEF outputs ({total / 1e6:.1f} MB) to {args.output}, modelled on {profile['files']} files of {args.source}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import json
+import re
+import time
+from statistics import median
+
+"""
+This script turns a pipeline benchmark report (see bench_pipeline) into a
+baseline and checks later reports against it, for 'quantify bench'.
+
+Raw timings depend on the machine, so every stage time is divided by the
+time of a calibration loop: a fixed mix of JSON decoding, regular
+expressions and dict work with the standard library only, so it does not
+move when quantify itself gets faster or slower. The loop runs several times
+next to every stage, and every stage is divided by the median over all the
+stages; the loop measured next to a single stage is as noisy as the stage.
+A stage regresses when its calibrated time grows by more than the threshold
+(e.g. 0.25 for 25%), or its peak RSS by more than the memory threshold. The
+time of stages that took less than MIN_GATED_SECONDS in the baseline is shown
+but never fails the comparison, it is mostly noise; benchmark a larger corpus
+to gate it. Their memory is gated all the same.
+"""
+CALIBRATION_DOCUMENT = json.dumps({
+    "releases": [{"result": {"tag": f"v{major}.{minor}.0", "date_published": f"2024-{minor + 1:02d}-01T00:00:00Z"}}
+                 for major in range(5) for minor in range(10)],
+    "license": [{"result": {"name": "MIT License", "spdx_id": "MIT", "value": "Permission is hereby granted " * 40}}],
+    "somef_missing_categories": ["citation", "identifier", "contributors"]
+})
+CALIBRATION_PATTERN = re.compile(r"^v?\d+\.\d+\.\d+(-\w+)?$")
+MIN_GATED_SECONDS = 0.2
+
+def calibration_workload(rounds=1000):
+    counts = {}
+    for _ in range(rounds):
+        data = json.loads(CALIBRATION_DOCUMENT)
+        for release in data["releases"]:
+            tag = release["result"]["tag"]
+            kind = "semantic" if CALIBRATION_PATTERN.match(tag) else "other"
+            counts[kind] = counts.get(kind, 0) + 1
+    return counts
+
+def calibrate(repeat=7):
+    """Seconds the calibration loop takes on this machine, the median of repeat runs"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        calibration_workload()
+        times.append(time.perf_counter() - start)
+    return median(times)
+
+def make_baseline(report):
+    """Keeps what a later run is compared on: the corpus, and the calibrated time and peak RSS of every stage"""
+    return {
+        "files": report["files"],
+        "bytes": report["bytes"],
+        "calibration_seconds": report["calibration_seconds"],
+        "stages": {
+            row["stage"]: {
+                "seconds": row["seconds"],
+                "calibrated": row["seconds"] / report["calibration_seconds"],
+                "peak_rss_mb": row["peak_rss_mb"]
+            }
+            for row in report["rows"]
+        }
+    }
+
+def compare(report, baseline, threshold=0.25, memory_threshold=0.5):
+    """Returns one row per stage found in both, with its time and memory ratios and whether it regressed
+
+    Raises ValueError when the report was measured on another corpus than the baseline.
+    """
+    if (report["files"], report["bytes"]) != (baseline["files"], baseline["bytes"]):
+        raise ValueError(f"the baseline was recorded on {baseline['files']} files ({baseline['bytes']} bytes), "
+                         f"this run measured {report['files']} files ({report['bytes']} bytes)")
+
+    rows = []
+    for row in report["rows"]:
+        base = baseline["stages"].get(row["stage"])
+        if base is None:
+            continue
+
+        time_ratio = row["seconds"] / report["calibration_seconds"] / base["calibrated"]
+        memory_ratio = row["peak_rss_mb"] / base["peak_rss_mb"]
+        # Only the time of a short stage is noise, its peak RSS is not
+        gated = base["seconds"] >= MIN_GATED_SECONDS
+        rows.append({
+            "stage": row["stage"],
+            "time_ratio": time_ratio,
+            "memory_ratio": memory_ratio,
+            "gated": gated,
+            "regressed": (gated and time_ratio > 1 + threshold) or memory_ratio > 1 + memory_threshold
+        })
+    return rows
+
+def print_comparison(rows, threshold, memory_threshold):
+    print(f"{'stage':<18}{'time':>10}{'memory':>10}")
+    for row in rows:
+        status = "REGRESSION" if row["regressed"] else "ok" if row["gated"] else "ok (time too short to gate)"
+        print(f"{row['stage']:<18}{row['time_ratio']:>9.2f}x{row['memory_ratio']:>9.2f}x  {status}")
+    print(f"(calibrated against the baseline, regression above {1 + threshold:.2f}x time or {1 + memory_threshold:.2f}x memory)")
+
+if __name__ == "__main__":
+    pass
@@ -1,51 +1,74 @@
 import argparse
 import sys
-import time
-import threading
-import itertools
 import os
-import json
-from contextlib import contextmanager
+from contextlib import contextmanager, nullcontext
 
-from quantify.run_somef import run_somef_on_links
-from quantify.rqs_scripts.rq1 import rq1
-from quantify.rqs_scripts.rq2 import rq2, token as default_token
-from quantify.rqs_scripts.rq3 import rq3, process_versions, save_results as save_results_rq3
-from quantify.rqs_scripts.rq4 import rq4
-from quantify.rqs_scripts.rq5 import rq5
-from quantify.count_results import count_rq1, count_rq2, count_rq3, count_rq4, count_rq5
+from quantify import metrics, profiling, progress
+
+"""
+The command line of quantify. Only what every command needs is imported
+here: the modules of a command (requests through RQ2, SoMEF, the scan and
+its process pool, the calculations, the benchmarks) are imported by the
+function that runs it, so 'quantify --help' or 'quantify calculate' do not
+pay for the others. python -m quantify.benchmarks.bench_import checks the
+import time of this module against its budget.
+"""
+# The defaults of swh_cache, somef_queue and bench_pipeline, repeated so building the
+# parser imports neither SQLite nor the benchmarks; test_cli checks they still match
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "quantify", "swh_cache.sqlite")
+DEFAULT_QUEUE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "quantify", "somef_queue.sqlite")
+DEFAULT_TTL_DAYS = 30
+BENCH_SOURCE = os.path.join("msr2025_data", "somef_output_0.9.11")
+BENCH_STAGES = ("rq1", "rq3", "rq4", "rq5", "scan", "process_versions", "count")
 
 @contextmanager
-def spinner_animation(message="Processing"):
-    stop_event = threading.Event()
-    spinner = itertools.cycle(['-', '\\', '|', '/'])
-    
-    def animate():
-        while not stop_event.is_set():
-            sys.stdout.write(f"\r{message} {next(spinner)}")
-            sys.stdout.flush()
-            time.sleep(0.1)
-        sys.stdout.write(f"\r{message} Done!     \n")
-        sys.stdout.flush()
-
-    t = threading.Thread(target=animate)
-    t.start()
-    try:
-        yield
-    finally:
-        stop_event.set()
-        t.join()
+def stage(message, name, unit="files", **labels):
+    """The progress line of a stage, recording its metrics and profile when --metrics-out/--profile are given; yields the stage's counters
+
+    The long stages pass progress.update as the progress callback of what they run.
+    """
+    with progress.task(message, unit), metrics.stage(name, **labels) as counters, profiling.profiled(name, **labels):
+        yield counters
+
+def count_somef_outputs(counters, *directories):
+    # Listing the outputs again is only worth it when metrics are recorded
+    if not metrics.enabled():
+        return
+    from quantify.rqs_scripts.scan import iter_output_files
+
+    for directory in directories:
+        for file_name, file_path, nested in iter_output_files(directory, recursive=True):
+            counters["files"] += 1
+            counters["bytes_read"] += os.path.getsize(file_path)
+
+def count_file(counters, file_path):
+    if os.path.exists(file_path):
+        counters["files"] += 1
+        counters["bytes_read"] += os.path.getsize(file_path)
+
+def count_analysis_files(counters, rq_results_dir, file_names):
+    # A missing analysis file is an error, count_rq* only print it
+    for file_name in file_names:
+        file_path = os.path.join(rq_results_dir, file_name)
+        if os.path.exists(file_path):
+            count_file(counters, file_path)
+        else:
+            counters["errors"] += 1
 
 def get_repo_count(json_file):
+    from quantify import json_backend
+
     try:
         with open(json_file, 'r') as f:
-            data = json.load(f)
+            data = json_backend.load(f)
         return len(data)
     except Exception as e:
         print(f"Error reading {json_file}: {e}")
         return 0
 
 def run_somef(args):
+    from quantify.run_somef import parse_shard, run_somef_on_links, select_backend
+
     print(f"Running SoMEF with input file: {args.input}")
     output_dir = args.output_dir
     threshold = args.threshold
@@ -55,98 +78,565 @@ def run_somef(args):
         print(f"Error: Input file {args.input} not found.")
         return
 
+    if args.queue:
+        backend = None
+        print(f"SoMEF queue: {args.queue}")
+    else:
+        try:
+            backend = select_backend(args.backend, args.timeout)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+        print(f"SoMEF backend: {backend}")
+
+    shard = None
+    if args.shard:
+        try:
+            shard = parse_shard(args.shard)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+
     repo_count = get_repo_count(args.input)
-    
-    with spinner_animation(f"Running SoMEF on {repo_count} repositories..."):
+    message = f"Running SoMEF on {repo_count} repositories..."
+    if shard:
+        message = f"Running SoMEF on shard {args.shard} of {repo_count} repositories..."
+
+    with stage(message, "somef", unit="repositories") as counters:
 
         kt_arg = keep_tmp if keep_tmp else "temp_somef_analysis"
         
-        run_somef_on_links(args.input, output_dir, threshold, kt_arg)
+        outcomes = run_somef_on_links(args.input, output_dir, threshold, kt_arg, jobs=args.jobs, timeout=args.timeout, keep_tmp=bool(keep_tmp), resume=args.resume, progress=progress.update, backend=backend or "auto", queue=args.queue, shard=shard)
+        counters["files"] = sum(1 for outcome in outcomes if outcome["status"] == "done")
+        counters["errors"] = len(outcomes) - counters["files"]
+
+def run_merge_shards(args):
+    from quantify import json_backend
+    from quantify.run_somef import manifest_path, merge_shards
+
+    for shard_dir in args.shard_dirs:
+        if not os.path.isdir(shard_dir):
+            print(f"Error: Shard output directory {shard_dir} not found.")
+            return
+
+    try:
+        merged = merge_shards(args.shard_dirs, args.output_dir)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+
+    done = sum(1 for entry in merged.values() if entry["status"] == "done")
+    print(f"Merged {len(args.shard_dirs)} shards into {args.output_dir}: {done} of {len(merged)} repositories extracted")
+    print(f"Manifest saved to {manifest_path(args.output_dir)}")
+
+    if args.input:
+        with open(args.input, 'r') as f:
+            links = [entry.get('github_url') for entry in json_backend.load(f) if entry.get('github_url')]
+        missing = [link for link in links if link not in merged]
+        if missing:
+            print(f"{len(missing)} repositories of {args.input} are in no shard, e.g. {missing[0]}; was every shard run?")
+
+def run_somef_worker(args):
+    from quantify.somef_queue import serve
+
+    serve(args.queue, args.workers)
+
+def check_rq_inputs(somef_dir, index_path):
+    """Returns an error message when the SoMEF outputs of a run cannot be found, None otherwise"""
+    if not somef_dir and not index_path:
+        return "--somef-dir or --index is required."
+    if somef_dir and not os.path.exists(somef_dir):
+        return f"SoMEF output directory {somef_dir} not found."
+    if index_path and not somef_dir and not os.path.exists(index_path):
+        return f"Feature index {index_path} not found."
+    return None
+
+def index_results(index_path, somef_dir, missing_key, workers=1, executor=None):
+    from quantify.rqs_scripts import rq1, rq3, rq4, rq5
+    from quantify.rqs_scripts.feature_index import load_index, aggregate
+
+    # The index already holds every file's share of the results, with a SoMEF
+    # directory only the outputs added or changed since it was saved are parsed
+    if somef_dir:
+        index = refresh_index(index_path, somef_dir, missing_key, workers, executor=executor, progress=progress.update)
+    else:
+        index = load_index(index_path, missing_key)
+    return [aggregate(index, visitor) for visitor in (rq1, rq3, rq4, rq5)]
+
+@contextmanager
+def swh_resources(args):
+    """The SWH cache, connection pool and rate limit shared by every RQ2 run of a command"""
+    from quantify.rqs_scripts.rq2 import create_session, RateLimit, token as default_token
+    from quantify.rqs_scripts.swh_cache import SWHCache
+
+    cache = SWHCache(args.swh_cache, args.swh_cache_ttl, args.refresh)
+    session = create_session(default_token, args.swh_concurrency)
+    try:
+        yield {"cache": cache, "session": session, "rate_limit": RateLimit()}
+    finally:
+        session.close()
+        cache.close()
+
+def save_rq_results(args, output_dir, cluster, somef_dir, input_repos, results, swh=None):
+    from quantify.rqs_scripts import rq1, rq3, rq4, rq5
+    from quantify.rqs_scripts.rq2 import rq2, token as default_token
+
+    result_rq1, result_rq3, result_rq4, result_rq5 = results
+
+    # RQ1
+    with stage("Running RQ1...", "save", cluster=cluster, rq="rq1"):
+        rq1.save_results(output_dir, result_rq1, f"analysis_{cluster}_rq1.json")
+        
+    # RQ2
+    if input_repos:
+        with stage("Running RQ2...", "swh", unit="repositories", cluster=cluster, rq="rq2") as counters:
+            result_rq2 = rq2(input_repos, default_token, f"analysis_{cluster}_rq2.json", output_dir, concurrency=args.swh_concurrency, progress=progress.update, **swh)
+            # None when the repository list could not be read, the other RQs are still saved
+            if result_rq2 is None:
+                counters["errors"] += 1
+            else:
+                counters["files"] = len(result_rq2["results"])
+    else:
+        print("Skipping RQ2 (needs --input-repos)")
+
+    # RQ3
+    with stage("Running RQ3...", "save", cluster=cluster, rq="rq3"):
+        consistency = rq3.process_versions(somef_dir, result_rq3)
+        rq3.save_results(output_dir, result_rq3, consistency, f"class_{cluster}_rq3.json", f"const_{cluster}_rq3.json")
+
+    # RQ4
+    with stage("Running RQ4...", "save", cluster=cluster, rq="rq4"):
+        rq4.save_results(output_dir, result_rq4, f"analysis_{cluster}_rq4.json")
+
+    # RQ5
+    with stage("Running RQ5...", "save", cluster=cluster, rq="rq5"):
+        rq5.save_results(output_dir, result_rq5, f"analysis_{cluster}_rq5.json")
 
 def run_rqs(args):
+    if args.clusters:
+        run_rqs_batch(args)
+        return
+
+    from quantify.rqs_scripts import rq1, rq3, rq4, rq5
+    from quantify.rqs_scripts.scan import scan
+
     print("Running RQs analysis...")
     somef_dir = args.somef_dir
     output_dir = args.output_dir
     missing_key = "somef_missing_categories"
     cluster = args.cluster
     
-    if not os.path.exists(somef_dir):
-        print(f"Error: SoMEF output directory {somef_dir} not found.")
+    error = check_rq_inputs(somef_dir, args.index)
+    if error:
+        print(f"Error: {error}")
         return
         
     os.makedirs(output_dir, exist_ok=True)
 
-    # RQ1
-    with spinner_animation("Running RQ1..."):
-        rq1(somef_dir, missing_key, f"analysis_{cluster}_rq1.json", output_dir)
-        
-    # RQ2
-    if args.input_repos:
-        with spinner_animation("Running RQ2..."):
-            rq2(args.input_repos, default_token, f"analysis_{cluster}_rq2.json", output_dir)
+    if args.index:
+        with stage("Reading feature index for RQ1, RQ3, RQ4, RQ5...", "index", cluster=cluster) as counters:
+            results = index_results(args.index, somef_dir, missing_key, args.workers)
+            count_file(counters, args.index)
     else:
-        print("Skipping RQ2 (needs --input-repos)")
+        # RQ1, RQ3, RQ4 and RQ5 share a single pass over the SoMEF outputs
+        with stage("Scanning SoMEF outputs for RQ1, RQ3, RQ4, RQ5...", "scan", cluster=cluster) as counters:
+            results = scan(somef_dir, missing_key, [rq1, rq3, rq4, rq5], workers=args.workers, progress=progress.update)
+            count_somef_outputs(counters, somef_dir)
 
-    # RQ3
-    with spinner_animation("Running RQ3..."):
-        result_rq3 = rq3(somef_dir, missing_key)
-        # Assuming process_versions logic handles the result
-        consistency = process_versions(somef_dir, result_rq3)
-        save_results_rq3(output_dir, result_rq3, consistency, f"class_{cluster}_rq3.json", f"const_{cluster}_rq3.json")
+    with swh_resources(args) if args.input_repos else nullcontext() as swh:
+        save_rq_results(args, output_dir, cluster, somef_dir, args.input_repos, results, swh)
 
-    # RQ4
-    with spinner_animation("Running RQ4..."):
-        rq4(somef_dir, missing_key, f"analysis_{cluster}_rq4.json", output_dir)
+def rq_clusters(args):
+    """The clusters of --clusters, or the single one given by --somef-dir/--index/--cluster; None on errors"""
+    from quantify.clusters import load_clusters
 
-    # RQ5
-    with spinner_animation("Running RQ5..."):
-        rq5(somef_dir, missing_key, f"analysis_{cluster}_rq5.json", output_dir)
+    if not args.clusters:
+        clusters = [{"cluster": args.cluster, "somef_dir": args.somef_dir, "input_repos": args.input_repos, "index": args.index}]
+    else:
+        try:
+            clusters = load_clusters(args.clusters)
+        except (OSError, ValueError) as e:
+            print(f"Error: Could not read cluster manifest: {e}")
+            return None
 
-def run_calculate(args):
-    print(f"Calculating results using repo list from: {args.input}")
-    repo_count = get_repo_count(args.input)
+    for entry in clusters:
+        error = check_rq_inputs(entry["somef_dir"], entry["index"])
+        if error:
+            print(f"Error: Cluster {entry['cluster']}: {error}" if args.clusters else f"Error: {error}")
+            return None
+    return clusters
+
+def compute_rq_results(args, clusters, missing_key):
+    """Returns the RQ1, RQ3, RQ4 and RQ5 results of every cluster, scanned on one shared process pool"""
+    from concurrent.futures import ProcessPoolExecutor
+    from quantify.rqs_scripts import rq1, rq3, rq4, rq5
+    from quantify.rqs_scripts.scan import scan_many
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=args.workers) if args.workers > 1 else nullcontext() as executor:
+        scanned = [entry for entry in clusters if not entry["index"]]
+        if scanned:
+            # The chunks of every cluster go to the same pool at once
+            # One stage for all of them, they share the pool
+            names = ",".join(entry["cluster"] for entry in scanned)
+            with stage(f"Scanning SoMEF outputs of {len(scanned)} clusters for RQ1, RQ3, RQ4, RQ5...", "scan", cluster=names) as counters:
+                directories = [entry["somef_dir"] for entry in scanned]
+                for entry, cluster_results in zip(scanned, scan_many(directories, missing_key, [rq1, rq3, rq4, rq5], args.workers, executor, progress.update)):
+                    results[entry["cluster"]] = cluster_results
+                count_somef_outputs(counters, *directories)
+
+        for entry in clusters:
+            if entry["index"]:
+                with stage(f"Reading feature index of {entry['cluster']} for RQ1, RQ3, RQ4, RQ5...", "index", cluster=entry["cluster"]) as counters:
+                    results[entry["cluster"]] = index_results(entry["index"], entry["somef_dir"], missing_key, args.workers, executor)
+                    count_file(counters, entry["index"])
+
+    return results
+
+def run_rqs_batch(args):
+    """Answers the RQs for every cluster of a manifest in this process, sharing the worker pools"""
+    clusters = rq_clusters(args)
+    if clusters is None:
+        return
+
+    print(f"Running RQs analysis for {len(clusters)} clusters: {', '.join(entry['cluster'] for entry in clusters)}")
+    output_dir = args.output_dir
+    os.makedirs(output_dir, exist_ok=True)
+    results = compute_rq_results(args, clusters, "somef_missing_categories")
+
+    with swh_resources(args) if any(entry["input_repos"] for entry in clusters) else nullcontext() as swh:
+        for entry in clusters:
+            print(f"Cluster {entry['cluster']}:")
+            save_rq_results(args, output_dir, entry["cluster"], entry["somef_dir"], entry["input_repos"], results[entry["cluster"]], swh)
+
+def run_pipeline(args):
+    """Runs rqs and calculate in one go, handing the RQ results to the calculation in memory"""
+    clusters = rq_clusters(args)
+    if clusters is None:
+        return
+
+    missing = [entry["cluster"] for entry in clusters if not entry["input_repos"]]
+    if missing:
+        print(f"Error: The repository list (--input-repos, or input_repos in the manifest) is required for: {', '.join(missing)}")
+        return
+
+    print(f"Running the full pipeline for {', '.join(entry['cluster'] for entry in clusters)}")
+    os.makedirs(args.output_dir, exist_ok=True)
+    results = compute_rq_results(args, clusters, "somef_missing_categories")
+
+    with swh_resources(args) as swh:
+        for entry in clusters:
+            print(f"Cluster {entry['cluster']}:")
+            calculate_in_memory(args, entry, results[entry["cluster"]], swh)
+
+def calculate_in_memory(args, entry, results, swh):
+    from quantify.rqs_scripts import rq1, rq3, rq4, rq5
+    from quantify.rqs_scripts.rq2 import rq2, token as default_token
+    from quantify.count_results import save_calculation, calculate_rq1, calculate_rq2, calculate_rq3, calculate_rq4, calculate_rq5
+
+    output_dir = args.output_dir
+    cluster = entry["cluster"]
+    emit = args.emit_intermediate
+    result_rq1, result_rq3, result_rq4, result_rq5 = results
+
+    repo_count = get_repo_count(entry["input_repos"])
     if repo_count == 0:
         print("Error: No repositories found or file error.")
         return
 
-    results_dir = args.results_dir
-    cluster_name = args.cluster # Used for file naming
+    with stage("Running RQ2...", "swh", unit="repositories", cluster=cluster, rq="rq2") as counters:
+        result_rq2 = rq2(entry["input_repos"], default_token, f"analysis_{cluster}_rq2.json" if emit else None, output_dir, concurrency=args.swh_concurrency, progress=progress.update, **swh)
+        if result_rq2 is None:
+            counters["errors"] += 1
+        else:
+            counters["files"] = len(result_rq2["results"])
+
+    with stage("Running RQ3...", "process_versions", cluster=cluster, rq="rq3"):
+        consistency = rq3.process_versions(entry["somef_dir"], result_rq3, annotate=emit)
+
+    # The analysis files are only needed to rerun 'quantify calculate' or to look into the results
+    if emit:
+        with stage("Saving intermediate RQ results...", "save", cluster=cluster):
+            rq1.save_results(output_dir, result_rq1, f"analysis_{cluster}_rq1.json")
+            rq3.save_results(output_dir, result_rq3, consistency, f"class_{cluster}_rq3.json", f"const_{cluster}_rq3.json")
+            rq4.save_results(output_dir, result_rq4, f"analysis_{cluster}_rq4.json")
+            rq5.save_results(output_dir, result_rq5, f"analysis_{cluster}_rq5.json")
+
+    print(f"Results: {output_dir}, Cluster: {cluster}, Total Repos: {repo_count}")
+
+    with stage("Calculating RQ1 stats...", "calculate", cluster=cluster, rq="rq1") as counters:
+        try:
+            calculation_rq1 = calculate_rq1(result_rq1, cluster, repo_count)
+            save_calculation(output_dir, "rq1", cluster, calculation_rq1)
+            doi = calculation_rq1[cluster]["zenodo_doi"]
+        except Exception as e:
+            print(f"Error calculating RQ1: {e}")
+            counters["errors"] += 1
+            doi = 0
+
+    with stage("Calculating RQ2 stats...", "calculate", cluster=cluster, rq="rq2") as counters:
+        try:
+            if result_rq2 is None:
+                raise ValueError("no RQ2 results, the repository list could not be read")
+            save_calculation(output_dir, "rq2", cluster, calculate_rq2(result_rq2, cluster, doi, repo_count))
+        except Exception as e:
+            print(f"Error calculating RQ2: {e}")
+            counters["errors"] += 1
+
+    with stage("Calculating RQ3 stats...", "calculate", cluster=cluster, rq="rq3") as counters:
+        try:
+            save_calculation(output_dir, "rq3", cluster, calculate_rq3(result_rq3, consistency, cluster, repo_count))
+        except Exception as e:
+            print(f"Error calculating RQ3: {e}")
+            counters["errors"] += 1
+
+    with stage("Calculating RQ4 stats...", "calculate", cluster=cluster, rq="rq4") as counters:
+        try:
+            save_calculation(output_dir, "rq4", cluster, calculate_rq4(result_rq4, cluster, repo_count))
+        except Exception as e:
+            print(f"Error calculating RQ4: {e}")
+            counters["errors"] += 1
+
+    with stage("Calculating RQ5 stats...", "calculate", cluster=cluster, rq="rq5") as counters:
+        try:
+            save_calculation(output_dir, "rq5", cluster, calculate_rq5(result_rq5, cluster, repo_count))
+        except Exception as e:
+            print(f"Error calculating RQ5: {e}")
+            counters["errors"] += 1
+
+def refresh_index(index_path, somef_dir, missing_key, workers=1, rebuild=False, executor=None, progress=None):
+    """Updates the index at index_path against somef_dir and saves it, building it when needed"""
+    from quantify.rqs_scripts.feature_index import update_index, save_index, load_index, empty_index
+
+    index = None
+    if os.path.exists(index_path) and not rebuild:
+        try:
+            index = load_index(index_path, missing_key)
+        except (OSError, EOFError, ValueError) as e:
+            # Another version, or not gzip or cut short (e.g. by a run killed while saving it)
+            print(f"\nCannot use the index {index_path} ({e}), rebuilding it")
+
+    if index is None:
+        index = empty_index(missing_key)
+    index, stats = update_index(index, somef_dir, workers=workers, executor=executor, progress=progress)
+    print(f"\nFeature index: {stats['kept']} unchanged, {stats['parsed']} parsed, {stats['removed']} removed")
+
+    save_index(index, index_path)
+    return index
+
+def run_index(args):
+    somef_dir = args.somef_dir
+    missing_key = "somef_missing_categories"
+
+    if not os.path.exists(somef_dir):
+        print(f"Error: SoMEF output directory {somef_dir} not found.")
+        return
+
+    with progress.task(f"Indexing SoMEF outputs in {somef_dir}..."):
+        index = refresh_index(args.output, somef_dir, missing_key, workers=args.workers, rebuild=args.rebuild, progress=progress.update)
+
+    print(f"Indexed {len(index['files'])} SoMEF outputs into {args.output}")
+
+def run_calculate(args):
+    if args.clusters:
+        from quantify.clusters import load_clusters
+
+        try:
+            clusters = load_clusters(args.clusters)
+        except (OSError, ValueError) as e:
+            print(f"Error: Could not read cluster manifest: {e}")
+            return
+
+        missing = [entry["cluster"] for entry in clusters if not entry["input_repos"]]
+        if missing:
+            print(f"Error: Clusters without input_repos cannot be calculated: {', '.join(missing)}")
+            return
+
+        for entry in clusters:
+            calculate_cluster(args.rq_results_dir, args.results_dir, entry["cluster"], entry["input_repos"])
+    elif args.input:
+        calculate_cluster(args.rq_results_dir, args.results_dir, args.cluster, args.input)
+    else:
+        print("Error: --input or --clusters is required.")
+
+def calculate_cluster(rq_results_dir, results_dir, cluster_name, input_repos):
+    from quantify.count_results import count_rq1, count_rq2, count_rq3, count_rq4, count_rq5
+
+    print(f"Calculating results using repo list from: {input_repos}")
+    repo_count = get_repo_count(input_repos)
+    if repo_count == 0:
+        print("Error: No repositories found or file error.")
+        return
 
     os.makedirs(results_dir, exist_ok=True)
     
     print(f"Results: {results_dir}, Cluster: {cluster_name}, Total Repos: {repo_count}")
 
-    with spinner_animation("Calculating RQ1 stats..."):
+    with stage("Calculating RQ1 stats...", "calculate", cluster=cluster_name, rq="rq1") as counters:
+        count_analysis_files(counters, rq_results_dir, [f"analysis_{cluster_name}_rq1.json"])
+        doi = 0
         try:
-           doi, _ = count_rq1(args.rq_results_dir, cluster_name, repo_count)
+            # None when the analysis file is missing, already counted above
+            counted = count_rq1(rq_results_dir, cluster_name, repo_count)
+            if counted is not None:
+                doi, _ = counted
         except Exception as e:
             print(f"Error calculating RQ1: {e}")
-            doi = 0
+            counters["errors"] += 1
 
-    with spinner_animation("Calculating RQ2 stats..."):
+    with stage("Calculating RQ2 stats...", "calculate", cluster=cluster_name, rq="rq2") as counters:
+        count_analysis_files(counters, rq_results_dir, [f"analysis_{cluster_name}_rq2.json"])
         try:
-             count_rq2(args.rq_results_dir, cluster_name, doi, repo_count)
+             count_rq2(rq_results_dir, cluster_name, doi, repo_count)
         except Exception as e:
             print(f"Error calculating RQ2: {e}")
+            counters["errors"] += 1
 
-    with spinner_animation("Calculating RQ3 stats..."):
+    with stage("Calculating RQ3 stats...", "calculate", cluster=cluster_name, rq="rq3") as counters:
+        count_analysis_files(counters, rq_results_dir, [f"class_{cluster_name}_rq3.json", f"const_{cluster_name}_rq3.json"])
         try:
-             count_rq3(args.rq_results_dir, cluster_name, repo_count)
+             count_rq3(rq_results_dir, cluster_name, repo_count)
         except Exception as e:
             print(f"Error calculating RQ3: {e}")
+            counters["errors"] += 1
 
-    with spinner_animation("Calculating RQ4 stats..."):
+    with stage("Calculating RQ4 stats...", "calculate", cluster=cluster_name, rq="rq4") as counters:
+        count_analysis_files(counters, rq_results_dir, [f"analysis_{cluster_name}_rq4.json"])
         try:
-             count_rq4(args.rq_results_dir, cluster_name, repo_count)
+             count_rq4(rq_results_dir, cluster_name, repo_count)
         except Exception as e:
             print(f"Error calculating RQ4: {e}")
+            counters["errors"] += 1
 
-    with spinner_animation("Calculating RQ5 stats..."):
+    with stage("Calculating RQ5 stats...", "calculate", cluster=cluster_name, rq="rq5") as counters:
+        count_analysis_files(counters, rq_results_dir, [f"analysis_{cluster_name}_rq5.json"])
         try:
-             count_rq5(args.rq_results_dir, cluster_name, repo_count)
+             count_rq5(rq_results_dir, cluster_name, repo_count)
         except Exception as e:
             print(f"Error calculating RQ5: {e}")
+            counters["errors"] += 1
+
+
+def run_timeline(args):
+    """Writes the release timeline table of one cluster, or of every cluster of a manifest"""
+    from quantify.clusters import load_clusters
+    from quantify.rqs_scripts import release_timeline
+    from quantify.rqs_scripts.scan import scan_many
+
+    as_of = None
+    if args.as_of:
+        as_of = release_timeline.parse_date(args.as_of)
+        if as_of is None:
+            print(f"Error: --as-of {args.as_of} is not an ISO date.")
+            return
+
+    if args.clusters:
+        try:
+            clusters = load_clusters(args.clusters)
+        except (OSError, ValueError) as e:
+            print(f"Error: Could not read cluster manifest: {e}")
+            return
+    else:
+        clusters = [{"cluster": args.cluster, "somef_dir": args.somef_dir}]
+
+    # The index has no release dates, the SoMEF outputs are needed
+    for entry in clusters:
+        if not entry["somef_dir"] or not os.path.exists(entry["somef_dir"]):
+            print(f"Error: SoMEF output directory of cluster {entry['cluster']} not found.")
+            return
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    missing_key = "somef_missing_categories"
+
+    with progress.task(f"Reading release dates of {len(clusters)} clusters..."):
+        directories = [entry["somef_dir"] for entry in clusters]
+        results = scan_many(directories, missing_key, [release_timeline], args.workers, progress=progress.update)
+
+    for entry, (result,) in zip(clusters, results):
+        table = release_timeline.timeline_table(result, as_of)
+        release_timeline.save_results(args.output_dir, table, f"timeline_{entry['cluster']}_rq3.json")
+
+def run_bench(args):
+    """Benchmarks the RQ pipeline, saves the result as a baseline and/or fails on regressions against one"""
+    from quantify import json_backend
+    from quantify.benchmarks import bench_pipeline, regression
+
+    if not args.somef_dir and not args.generate:
+        print("Error: --somef-dir or --generate is required.")
+        sys.exit(1)
 
+    source_dir = args.source if args.generate else args.somef_dir
+    if not os.path.exists(source_dir):
+        print(f"Error: SoMEF output directory {source_dir} not found.")
+        sys.exit(1)
+
+    baseline = None
+    if args.compare:
+        try:
+            with open(args.compare, 'r') as f:
+                baseline = json_backend.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error: Could not read baseline: {e}")
+            sys.exit(1)
+
+    report = bench_pipeline.measure(args.somef_dir, args.generate, args.source, args.stages, args.repeat, args.seed)
+    bench_pipeline.print_report(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json_backend.dump(report, f, indent=4)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json_backend.dump(regression.make_baseline(report), f, indent=4)
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if baseline is not None:
+        try:
+            rows = regression.compare(report, baseline, args.threshold, args.memory_threshold)
+        except ValueError as e:
+            print(f"Error: Cannot compare with {args.compare}: {e}")
+            sys.exit(1)
+
+        print()
+        regression.print_comparison(rows, args.threshold, args.memory_threshold)
+        regressed = [row["stage"] for row in rows if row["regressed"]]
+        if regressed:
+            print(f"Performance regression in: {', '.join(regressed)}")
+            sys.exit(1)
+
+METRICS_OUT_HELP = "Write the wall time, CPU time, files, bytes, errors and peak RSS of every stage to this file, as a Prometheus textfile when it ends in .prom, JSON otherwise"
+
+def add_profile_arguments(parser):
+    parser.add_argument("--profile", metavar="DIR", help="Profile every stage with cProfile and write a .pstats file and a hotspot summary per stage to DIR")
+    parser.add_argument("--profile-top", type=int, default=20, help="Number of functions in each hotspot summary (default: 20)")
+    parser.add_argument("--profile-sampling", action="store_true", help="Use the pyinstrument sampling profiler instead of cProfile when it is installed")
+
+def add_rq_arguments(parser):
+    """Options shared by rqs and run"""
+    parser.add_argument("--somef-dir", "-s", help="Directory containing SoMEF output JSON files")
+    parser.add_argument("--index", help="Feature index built by 'quantify index' for RQ1, RQ3, RQ4 and RQ5; with --somef-dir it is first brought up to date")
+    parser.add_argument("--input-repos", "-i", help="Path to original JSON list of repositories (Required for RQ2)")
+    parser.add_argument("--output-dir", "-o", default="rq_results", help="Directory to store RQ analysis results")
+    parser.add_argument("--cluster", "-c", default="default", help="Cluster name suffix used in output filenames (default: 'default')")
+    parser.add_argument("--workers", "-w", type=int, default=1, help="Number of processes used to parse SoMEF outputs (default: 1)")
+    parser.add_argument("--swh-concurrency", type=int, default=4, help="Number of concurrent Software Heritage lookups for RQ2 (default: 4)")
+    parser.add_argument("--swh-cache", default=DEFAULT_CACHE_PATH, help=f"SQLite file caching Software Heritage lookups (default: {DEFAULT_CACHE_PATH})")
+    parser.add_argument("--swh-cache-ttl", type=float, default=DEFAULT_TTL_DAYS, help=f"Days before a cached Software Heritage answer is looked up again (default: {DEFAULT_TTL_DAYS})")
+    parser.add_argument("--refresh", action="store_true", help="Ignore cached Software Heritage answers and query SWH again")
+    parser.add_argument("--clusters", help="Cluster manifest (cluster -> somef_dir, input_repos, index); runs every cluster in one process instead of --somef-dir/--cluster")
+    parser.add_argument("--metrics-out", help=METRICS_OUT_HELP)
+    add_profile_arguments(parser)
+
+def start_profiling(args):
+    profiler = profiling.enable(args.profile, args.profile_top, args.profile_sampling)
+    if args.profile_sampling and profiler != "pyinstrument":
+        print("pyinstrument is not installed, profiling with cProfile")
+
+    # A profiler only sees this process, the SoMEF outputs are parsed here too
+    if getattr(args, "workers", 1) > 1:
+        print("Profiling: parsing the SoMEF outputs in this process instead of --workers processes")
+        args.workers = 1
 
 def main():
     parser = argparse.ArgumentParser(description="Metadata Adoption Quantify CLI")
@@ -158,28 +648,103 @@ def main():
     parser_somef.add_argument("--output-dir", "-o", default="somef_outputs", help="Directory to store SoMEF JSON outputs")
     parser_somef.add_argument("--threshold", "-t", default="0.8", help="Threshold for SoMEF")
     parser_somef.add_argument("--keep-tmp", "-kt", help="Directory to keep temp files (default: temp_somef_analysis)")
+    parser_somef.add_argument("--jobs", "-j", type=int, default=1, help="Number of repositories extracted concurrently (default: 1)")
+    parser_somef.add_argument("--timeout", type=float, help="Seconds after which a single SoMEF extraction is abandoned (default: no limit)")
+    parser_somef.add_argument("--resume", action="store_true", help="Skip repositories the run manifest marks as extracted and retry only failed ones")
+    parser_somef.add_argument("--backend", choices=("auto", "inprocess", "subprocess"), default="auto", help="inprocess imports SoMEF once per job and calls it for every repository, subprocess runs 'somef describe' per repository; auto uses inprocess when SoMEF is importable and no --timeout is given (default: auto)")
+    parser_somef.add_argument("--shard", metavar="I/N", help="Only extract shard I of N of the repositories (e.g. 2/4), split by a hash of their URL so every node gets the same split; combine the shards with 'quantify merge-shards'")
+    parser_somef.add_argument("--queue", nargs="?", const=DEFAULT_QUEUE_PATH, help=f"Queue the repositories for the workers of 'quantify somef-worker' and wait for them instead of extracting here (default queue: {DEFAULT_QUEUE_PATH})")
+    parser_somef.add_argument("--metrics-out", help=METRICS_OUT_HELP)
     parser_somef.set_defaults(func=run_somef)
 
+    # Command: merge-shards
+    parser_merge = subparsers.add_parser("merge-shards", help="Combine the outputs and manifests of 'quantify somef --shard' runs into one SoMEF output directory")
+    parser_merge.add_argument("shard_dirs", nargs="+", metavar="SHARD_DIR", help="Output directories of the shards, each with its manifest next to it")
+    parser_merge.add_argument("--output-dir", "-o", default="somef_outputs", help="Directory to gather the SoMEF JSON outputs in (default: somef_outputs)")
+    parser_merge.add_argument("--input", "-i", help="JSON list of repositories the shards were run on, to report the repositories no shard extracted")
+    parser_merge.set_defaults(func=run_merge_shards)
+
+    # Command: somef-worker
+    parser_worker = subparsers.add_parser("somef-worker", help="Keep SoMEF workers warm and extract the repositories queued by 'quantify somef --queue'")
+    parser_worker.add_argument("--queue", default=DEFAULT_QUEUE_PATH, help=f"SQLite job queue to take repositories from (default: {DEFAULT_QUEUE_PATH})")
+    parser_worker.add_argument("--workers", "-w", type=int, default=1, help="Number of worker processes, each loading SoMEF once (default: 1)")
+    parser_worker.set_defaults(func=run_somef_worker)
+
     # Command: rqs
     parser_rqs = subparsers.add_parser("rqs", help="Run RQs analysis on SoMEF output")
-    parser_rqs.add_argument("--somef-dir", "-s", required=True, help="Directory containing SoMEF output JSON files")
-    parser_rqs.add_argument("--input-repos", "-i", help="Path to original JSON list of repositories (Required for RQ2)")
-    parser_rqs.add_argument("--output-dir", "-o", default="rq_results", help="Directory to store RQ analysis results")
-    parser_rqs.add_argument("--cluster", "-c", default="default", help="Cluster name suffix used in output filenames (default: 'default')")
+    add_rq_arguments(parser_rqs)
     parser_rqs.set_defaults(func=run_rqs)
 
+    # Command: run
+    parser_run = subparsers.add_parser("run", help="Run the RQs analysis and calculate the final results in one go")
+    add_rq_arguments(parser_run)
+    parser_run.add_argument("--emit-intermediate", action="store_true", help="Also write the analysis_*, class_* and const_* files that 'quantify rqs' writes")
+    parser_run.set_defaults(func=run_pipeline)
+
+    # Command: index
+    parser_index = subparsers.add_parser("index", help="Build a columnar feature index from SoMEF output")
+    parser_index.add_argument("--somef-dir", "-s", required=True, help="Directory containing SoMEF output JSON files")
+    parser_index.add_argument("--output", "-o", default="somef_index.json.gz", help="Index file to write, gzipped when it ends in .gz (default: somef_index.json.gz)")
+    parser_index.add_argument("--workers", "-w", type=int, default=1, help="Number of processes used to parse SoMEF outputs (default: 1)")
+    parser_index.add_argument("--rebuild", action="store_true", help="Parse every SoMEF output again instead of updating an existing index")
+    parser_index.set_defaults(func=run_index)
+
+    # Command: timeline
+    parser_timeline = subparsers.add_parser("timeline", help="Write the release cadence of every repository (RQ3 timeline)")
+    parser_timeline.add_argument("--somef-dir", "-s", help="Directory containing SoMEF output JSON files")
+    parser_timeline.add_argument("--output-dir", "-o", default="rq_results", help="Directory to store the timeline tables")
+    parser_timeline.add_argument("--cluster", "-c", default="default", help="Cluster name suffix used in output filenames (default: 'default')")
+    parser_timeline.add_argument("--clusters", help="Cluster manifest (cluster -> somef_dir); writes a table for every cluster instead of --somef-dir/--cluster")
+    parser_timeline.add_argument("--workers", "-w", type=int, default=1, help="Number of processes used to parse SoMEF outputs (default: 1)")
+    parser_timeline.add_argument("--as-of", help="Date the age of the last releases is computed on, e.g. 2025-01-31 (default: now)")
+    parser_timeline.set_defaults(func=run_timeline)
+
+    # Command: bench
+    parser_bench = subparsers.add_parser("bench", help="Benchmark the RQ pipeline and compare it with a stored baseline")
+    parser_bench.add_argument("--somef-dir", "-s", help="SoMEF output directory to benchmark")
+    parser_bench.add_argument("--generate", "-g", type=int, help="Benchmark a synthetic corpus of this many repositories instead")
+    parser_bench.add_argument("--source", default=BENCH_SOURCE, help=f"Corpus the synthetic one is modelled on (default: {BENCH_SOURCE})")
+    parser_bench.add_argument("--seed", type=int, default=0, help="Seed of the synthetic corpus, keep it fixed to compare runs (default: 0)")
+    parser_bench.add_argument("--stages", nargs="+", choices=BENCH_STAGES, default=list(BENCH_STAGES), help="Stages to measure (default: all)")
+    parser_bench.add_argument("--repeat", "-r", type=int, default=3, help="Least runs per stage, the best one is kept; short stages run more often (default: 3)")
+    parser_bench.add_argument("--output", "-o", help="Also write the full report as JSON to this file")
+    parser_bench.add_argument("--save-baseline", help="Write the calibrated timings and memory of this run as a baseline to this file")
+    parser_bench.add_argument("--compare", help="Baseline to compare with; exits with status 1 when a stage regressed")
+    parser_bench.add_argument("--threshold", type=float, default=0.25, help="Allowed calibrated slowdown per stage before it counts as a regression (default: 0.25, i.e. 25%%)")
+    parser_bench.add_argument("--memory-threshold", type=float, default=0.5, help="Allowed growth of the peak RSS per stage (default: 0.5, i.e. 50%%)")
+    parser_bench.set_defaults(func=run_bench)
+
     # Command: calculate
     parser_calculate = subparsers.add_parser("calculate", help="Calculate total results percentages")
-    parser_calculate.add_argument("--input", "-i", required=True, help="Path to original JSON list of repositories (to count total repos)")
+    parser_calculate.add_argument("--input", "-i", help="Path to original JSON list of repositories (to count total repos)")
+    parser_calculate.add_argument("--clusters", help="Cluster manifest (cluster -> somef_dir, input_repos); calculates every cluster instead of --input/--cluster")
     parser_calculate.add_argument("--rq-results-dir", "-r", required=True, help="Directory containing RQ analysis output files")
     parser_calculate.add_argument("--results-dir", "-o", default="final_results", help="Directory to store final calculated results")
     parser_calculate.add_argument("--cluster", "-c", default="default", help="Cluster name suffix used in RQ result filenames (default: 'default')")
+    parser_calculate.add_argument("--metrics-out", help=METRICS_OUT_HELP)
+    add_profile_arguments(parser_calculate)
     parser_calculate.set_defaults(func=run_calculate)
 
     args = parser.parse_args()
+    # Neither a thread pool nor a connection pool can be empty
+    if getattr(args, "swh_concurrency", 1) < 1:
+        parser.error("--swh-concurrency must be at least 1")
 
     if hasattr(args, "func"):
-        args.func(args)
+        if getattr(args, "profile", None):
+            start_profiling(args)
+
+        metrics_out = getattr(args, "metrics_out", None)
+        if metrics_out:
+            metrics.enable(args.command)
+        try:
+            args.func(args)
+        finally:
+            if metrics_out:
+                metrics.save(metrics_out)
+                print(f"Metrics saved to {metrics_out}")
+            if profiling.enabled():
+                print(f"Profiles of {len(profiling.written_files())} stages saved to {args.profile}")
     else:
         parser.print_help()
 
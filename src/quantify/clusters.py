@@ -0,0 +1,49 @@
+import os
+
+from quantify import json_backend
+
+"""
+This script reads the cluster manifest used by the batch mode of
+'quantify rqs' and 'quantify calculate'. It maps every cluster to its
+SoMEF output directory and repository list, e.g.
+
+    {
+        "envri": {
+            "somef_dir": "somef_output_0.9.11/output_envri",
+            "input_repos": "repositories/github_links_envri.json"
+        }
+    }
+
+An "index" entry (a feature index built by 'quantify index') can be given
+next to or instead of "somef_dir". Relative paths are relative to the
+manifest file.
+"""
+CLUSTER_KEYS = ("somef_dir", "input_repos", "index")
+
+def load_clusters(manifest_path):
+    """Returns one dict per cluster, in manifest order, with cluster, somef_dir, input_repos and index"""
+    with open(manifest_path, 'r') as f:
+        manifest = json_backend.load(f)
+
+    if not isinstance(manifest, dict) or not manifest:
+        raise ValueError(f"{manifest_path} must map cluster names to their SoMEF directory and repository list")
+
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    clusters = []
+    for cluster, entry in manifest.items():
+        if not isinstance(entry, dict):
+            raise ValueError(f"Cluster {cluster} in {manifest_path} must be an object")
+
+        unknown = set(entry) - set(CLUSTER_KEYS)
+        if unknown:
+            raise ValueError(f"Cluster {cluster} in {manifest_path} has unknown keys: {', '.join(sorted(unknown))}")
+        if not entry.get("somef_dir") and not entry.get("index"):
+            raise ValueError(f"Cluster {cluster} in {manifest_path} needs a somef_dir or an index")
+
+        paths = {key: os.path.join(base_dir, entry[key]) if entry.get(key) else None for key in CLUSTER_KEYS}
+        clusters.append(dict(cluster=cluster, **paths))
+
+    return clusters
+
+if __name__ == "__main__":
+    pass
@@ -1,6 +1,22 @@
-import json
 import os
 
+from quantify import json_backend
+
+"""
+The count_rqN functions read the analysis files written by 'quantify rqs'.
+The calculate_rqN functions do the actual calculation on results already in
+memory, which is how 'quantify run' uses them without any intermediate file.
+"""
+
+def save_calculation(results_dir, rq_name, cluster, result):
+    calculations_dir = os.path.join(results_dir, "calculations", rq_name)
+    os.makedirs(calculations_dir, exist_ok=True)
+
+    output_file = os.path.join(calculations_dir, f"{rq_name}_results_{cluster}.json")
+    with open(output_file, "w") as outfile:
+        json_backend.dump(result, outfile, indent=4)
+
+    print(f"{rq_name.upper()} Results saved to {output_file}")
 
 def count_rq1(dir1, cluster1, num1):
     json_file_path = os.path.join(dir1, f"analysis_{cluster1}_rq1.json")
@@ -11,8 +27,16 @@ def count_rq1(dir1, cluster1, num1):
 
 
     with open(json_file_path, "r") as file:
-        data = json.load(file)
+        data = json_backend.load(file)
+
+    rq1 = calculate_rq1(data, cluster1, num1)
+    save_calculation(dir1, "rq1", cluster1, rq1)
+    
+    l_num = data.get("license", {}).get("count")
+    doi = rq1[cluster1]["zenodo_doi"]
+    return doi, l_num 
 
+def calculate_rq1(data, cluster1, num1):
     rq1 = {
         cluster1: {
             "cff": 0,
@@ -36,19 +60,7 @@ def count_rq1(dir1, cluster1, num1):
     rq1[cluster1]["codemeta"] = (data.get("codemeta.json", {}).get("count", 0) / num1) * 100
     rq1[cluster1]["zenodo_doi"] = (data.get("identifier_extract", {}).get("count", 0) / num1) * 100
     rq1[cluster1]["none"] = (data.get("None", {}).get("count", 0) / num1) * 100
-
-    results_dir = os.path.join(dir1, "calculations", "rq1")
-    os.makedirs(results_dir, exist_ok=True)
-
-    output_file = os.path.join(results_dir, f"rq1_results_{cluster1}.json")
-    with open(output_file, "w") as outfile:
-        json.dump(rq1, outfile, indent=4)
-
-    print(f"RQ1 Results saved to {output_file}")
-    
-    l_num = data.get("license", {}).get("count")
-    doi = rq1[cluster1]["zenodo_doi"]
-    return doi, l_num 
+    return rq1
 
 def count_rq2(dir2, cluster2, doi, num2):
 
@@ -60,8 +72,11 @@ def count_rq2(dir2, cluster2, doi, num2):
 
 
     with open(json_file_path, "r") as file:
-        data = json.load(file)
+        data = json_backend.load(file)
+
+    save_calculation(dir2, "rq2", cluster2, calculate_rq2(data, cluster2, doi, num2))
 
+def calculate_rq2(data, cluster2, doi, num2):
     rq2 = {cluster2:
         {
             "swh":0,
@@ -71,15 +86,7 @@ def count_rq2(dir2, cluster2, doi, num2):
 
     rq2[cluster2]["swh"] = (data.get("summary", {}).get("count_in_swh", 0) / num2) * 100
     rq2[cluster2]["zenodo_doi"] = doi
-
-    results_dir = os.path.join(dir2, "calculations", "rq2")
-    os.makedirs(results_dir, exist_ok=True)
-
-    output_file = os.path.join(results_dir, f"rq2_results_{cluster2}.json")
-    with open(output_file, "w") as outfile:
-        json.dump(rq2, outfile, indent=4)
-
-    print(f"RQ2 Results saved to {output_file}")
+    return rq2
     
 def count_rq3(dir3, cluster3, num3):
     json_file_path1 = os.path.join(dir3, f"class_{cluster3}_rq3.json")
@@ -90,10 +97,14 @@ def count_rq3(dir3, cluster3, num3):
         return
 
     with open(json_file_path1, "r") as file:
-        data1 = json.load(file)
+        data1 = json_backend.load(file)
     with open(json_file_path2, "r") as file:
-        data2 = json.load(file)
+        data2 = json_backend.load(file)
+
+    save_calculation(dir3, "rq3", cluster3, calculate_rq3(data1, data2, cluster3, num3))
 
+def calculate_rq3(data1, data2, cluster3, num3):
+    """data1 is the release classification (class_*_rq3.json), data2 the consistency summary (const_*_rq3.json)"""
     rq3 = {cluster3:
         {
             "rq3-1": {
@@ -120,15 +131,7 @@ def count_rq3(dir3, cluster3, num3):
     rq3[cluster3]["rq3-2"]["calendar"] = (data2.get("summary", {}).get("class_counts", {}).get("Calendar", 0) / num_r) * 100
     rq3[cluster3]["rq3-2"]["Alphanumeric"] = (data2.get("summary", {}).get("class_counts", {}).get("Alphanumeric", 0) / num_r) * 100
     rq3[cluster3]["rq3-2"]["other"] = (data2.get("summary", {}).get("class_counts", {}).get("Other", 0) / num_r) * 100
-
-    results_dir = os.path.join(dir3, "calculations", "rq3")
-    os.makedirs(results_dir, exist_ok=True)
-
-    output_file = os.path.join(results_dir, f"rq3_results_{cluster3}.json")
-    with open(output_file, "w") as outfile:
-        json.dump(rq3, outfile, indent=4)
-
-    print(f"RQ3 Results saved to {output_file}")
+    return rq3
 
 def count_rq4(dir4, cluster4, num4):
     json_file_path = os.path.join(dir4, f"analysis_{cluster4}_rq4.json")
@@ -139,8 +142,11 @@ def count_rq4(dir4, cluster4, num4):
 
 
     with open(json_file_path, "r") as file:
-        data = json.load(file)
+        data = json_backend.load(file)
+
+    save_calculation(dir4, "rq4", cluster4, calculate_rq4(data, cluster4, num4))
 
+def calculate_rq4(data, cluster4, num4):
     rq4 = {cluster4:
         {
             "rq4-1": {
@@ -174,15 +180,7 @@ def count_rq4(dir4, cluster4, num4):
     rq4[cluster4]["rq4-3"]["requirements"] = (data.get("requirements", {}).get("count", 0) / num4) * 100
     rq4[cluster4]["rq4-3"]["installation"] = (data.get("installation", {}).get("count", 0) / num4) * 100
     rq4[cluster4]["rq4-3"]["documentation"] = (data.get("documentation", {}).get("count", 0) / num4) * 100
-
-    results_dir = os.path.join(dir4, "calculations", "rq4")
-    os.makedirs(results_dir, exist_ok=True)
-
-    output_file = os.path.join(results_dir, f"rq4_results_{cluster4}.json")
-    with open(output_file, "w") as outfile:
-        json.dump(rq4, outfile, indent=4)
-
-    print(f"RQ4 Results saved to {output_file}")
+    return rq4
 
 def count_rq5(dir5, cluster5, num5):
 
@@ -193,8 +191,11 @@ def count_rq5(dir5, cluster5, num5):
         return
 
     with open(json_file_path, "r") as file:
-        data = json.load(file)
+        data = json_backend.load(file)
+
+    save_calculation(dir5, "rq5", cluster5, calculate_rq5(data, cluster5, num5))
 
+def calculate_rq5(data, cluster5, num5):
     rq5 = {cluster5:
         {
             "bib":0,
@@ -208,15 +209,7 @@ def count_rq5(dir5, cluster5, num5):
     rq5[cluster5]["cff"] = (data.get("citation", {}).get("cff", 0) / num5) * 100
     rq5[cluster5]["readme"] = (data.get("citation", {}).get("readme", 0) / num5) * 100
     rq5[cluster5]["total"] = (rq5[cluster5]["bib"] + rq5[cluster5]["cff"] + rq5[cluster5]["readme"])
-
-    results_dir = os.path.join(dir5, "calculations", "rq5")
-    os.makedirs(results_dir, exist_ok=True)
-
-    output_file = os.path.join(results_dir, f"rq5_results_{cluster5}.json")
-    with open(output_file, "w") as outfile:
-        json.dump(rq5, outfile, indent=4)
-
-    print(f"RQ5 Results saved to {output_file}")
+    return rq5
 
 if __name__ == "__main__":
     pass
@@ -0,0 +1,161 @@
+import os
+import re
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec.json
+except ImportError:
+    msgspec = None
+
+"""
+This script is the single place where quantify reads and writes JSON.
+
+It uses orjson or msgspec when one of them is installed and the standard
+library json module otherwise. QUANTIFY_JSON_BACKEND=json|orjson|msgspec
+forces a backend (if it is not installed, the fastest available one is used).
+
+Whatever the backend, dumps(obj, indent) writes exactly what
+json.dumps(obj, indent=indent) writes (non ASCII characters escaped), and
+dumps(obj) the compact form, so the result files do not depend on what is
+installed. orjson only indents by 2, its output is re-indented to the indent
+asked for (4 for every result and analysis file). The cases a native encoder
+writes differently go to json: non string keys, huge integers, floats in
+exponent notation, and NaN or Infinity, which both native encoders write as
+null; a document with null in it is written by json, which never happens
+with the result files. Files only quantify reads back, like the feature
+index, use dumps_bytes: compact UTF-8 in whatever form the backend writes
+fastest.
+"""
+BACKENDS = ("orjson", "msgspec", "json")
+
+# Numbers json writes in exponent notation: 1e+16 and 1e-05, which native encoders write as 1e16 and 0.00001
+exponent_pattern = re.compile(rb'[:\[,]\s*-?(?:\d+(?:\.\d+)?[eE]|0\.0000)')
+non_ascii_pattern = re.compile('[\x7f-\U0010ffff]+')
+# Exponents have a digit right before the e, digits are mapped to 0 so plain finds rule most documents out
+digits_to_zero = bytes.maketrans(b"123456789", b"000000000")
+
+def escape_non_ascii(match):
+    return json.dumps(match.group(0))[1:-1]
+
+def orjson_encode(obj, indent):
+    if indent is None:
+        return orjson.dumps(obj)
+    if not isinstance(indent, int) or indent < 0:
+        return None
+    data = orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    if indent == 2:
+        return data
+    return reindent(data, indent)
+
+def reindent(data, indent):
+    """Turns the 2 spaces per level of orjson's output into indent spaces
+
+    Line breaks and tabs inside strings are escaped, so a line break followed
+    by spaces is always indentation and a tab can mark the levels, deepest
+    first; a few bytes.replace passes are about twice as fast as json itself.
+    """
+    depth = 1
+    while b"\n" + b"  " * depth in data:
+        depth += 1
+    for level in range(depth - 1, 0, -1):
+        data = data.replace(b"\n" + b"  " * level, b"\n" + b"\t" * level)
+    return data.replace(b"\t", b" " * indent)
+
+def has_exponent(data):
+    """Whether data may hold a number json writes in exponent notation"""
+    digits = data.translate(digits_to_zero)
+    if b"0e" not in digits and b"0E" not in digits and b"0.0000" not in digits:
+        return False
+    return exponent_pattern.search(data) is not None
+
+def msgspec_encode(obj, indent):
+    data = msgspec.json.encode(obj)
+    if indent is None:
+        return data
+    return msgspec.json.format(data, indent=indent)
+
+def select_backend(name=None):
+    """Returns name if that backend is available, the fastest available one otherwise"""
+    available = {"orjson": orjson is not None, "msgspec": msgspec is not None, "json": True}
+    if available.get(name):
+        return name
+    return next(backend for backend in BACKENDS if available[backend])
+
+def use_backend(name=None):
+    """Switches every following load and dump to a backend, returns the one actually used"""
+    global BACKEND, native_loads, native_encode, encode_errors
+    BACKEND = select_backend(name)
+
+    if BACKEND == "orjson":
+        native_loads = orjson.loads
+        native_encode = orjson_encode
+        encode_errors = (TypeError,)
+    elif BACKEND == "msgspec":
+        native_loads = msgspec.json.decode
+        native_encode = msgspec_encode
+        encode_errors = (TypeError, msgspec.EncodeError)
+    else:
+        native_loads = None
+        native_encode = None
+        encode_errors = ()
+    return BACKEND
+
+use_backend(os.environ.get("QUANTIFY_JSON_BACKEND"))
+
+def loads(data):
+    """Decodes a JSON document given as str or bytes"""
+    if native_loads is None:
+        return json.loads(data)
+    try:
+        return native_loads(data)
+    except ValueError:
+        raise
+    except Exception as e:
+        # msgspec.DecodeError is not a ValueError, callers only know json's errors
+        raise ValueError(str(e)) from e
+
+def load(file):
+    return loads(file.read())
+
+def stdlib_dumps(obj, indent):
+    if indent is None:
+        return json.dumps(obj, separators=(",", ":"))
+    return json.dumps(obj, indent=indent)
+
+def dumps(obj, indent=None):
+    """Same text as json.dumps(obj, indent=indent), compact (no spaces) when indent is None"""
+    if native_encode is None:
+        return stdlib_dumps(obj, indent)
+    try:
+        data = native_encode(obj, indent)
+    except encode_errors:
+        return stdlib_dumps(obj, indent)
+
+    # null may stand for a NaN or an Infinity, which json writes as NaN and Infinity
+    if data is None or b"null" in data or has_exponent(data):
+        return stdlib_dumps(obj, indent)
+
+    text = data.decode()
+    if not text.isascii() or "\x7f" in text:
+        text = non_ascii_pattern.sub(escape_non_ascii, text)
+    return text
+
+def dumps_bytes(obj):
+    """Compact UTF-8 JSON, not necessarily byte for byte what json writes"""
+    if native_encode is not None:
+        try:
+            return native_encode(obj, None)
+        except encode_errors:
+            pass
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
+def dump(obj, file, indent=None):
+    file.write(dumps(obj, indent))
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,134 @@
+import os
+import re
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+"""
+This script records what every stage of a quantify command costs, for
+--metrics-out: wall time, CPU time (of this process and of the worker and
+SoMEF processes that finished during the stage), peak RSS, and the files,
+bytes and errors the stage counted. Errors are what a stage skips and goes
+on without: SoMEF extractions that failed, a repository list RQ2 could not
+read, missing analysis files and RQ calculations that failed. A SoMEF
+output that cannot be parsed is not an error but stops the scan, whose
+stage is then recorded as failed.
+
+Nothing is recorded until enable() is called, so the stages cost nothing
+when metrics are not asked for. save() writes a JSON report, or a
+Prometheus textfile when the path ends in .prom, e.g.
+
+    quantify_stage_wall_seconds{command="rqs",stage="scan",cluster="envri"} 12.5
+"""
+COUNTERS = ("files", "bytes_read", "errors")
+
+# name, help, key of the stage record
+PROMETHEUS_METRICS = (
+    ("quantify_stage_wall_seconds", "Wall time of the stage", "wall_seconds"),
+    ("quantify_stage_cpu_seconds", "CPU time of the stage, finished child processes included", "cpu_seconds"),
+    ("quantify_stage_files", "Files processed by the stage", "files"),
+    ("quantify_stage_bytes_read", "Bytes read by the stage", "bytes_read"),
+    ("quantify_stage_errors", "Failed extractions, missing inputs and failed calculations the stage went on without", "errors"),
+    ("quantify_stage_peak_rss_bytes", "Peak RSS of quantify at the end of the stage", "peak_rss_bytes"),
+    ("quantify_stage_children_peak_rss_bytes", "Peak RSS of the largest finished child process", "children_peak_rss_bytes"),
+    ("quantify_stage_failed", "1 when the stage ended with an exception", "failed")
+)
+
+RECORDER = None
+
+def enable(command):
+    global RECORDER
+    RECORDER = {"command": command, "started": time.time(), "stages": []}
+
+def disable():
+    global RECORDER
+    RECORDER = None
+
+def enabled():
+    return RECORDER is not None
+
+def rss_bytes(usage):
+    # Linux reports kilobytes, macOS bytes
+    return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+
+def cpu_seconds():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+@contextmanager
+def stage(name, **labels):
+    """Records one stage; yields a dict of counters (files, bytes_read, errors) the stage adds to"""
+    counters = dict.fromkeys(COUNTERS, 0)
+    if RECORDER is None:
+        yield counters
+        return
+
+    start_wall = time.perf_counter()
+    start_cpu = cpu_seconds()
+    failed = True
+    try:
+        yield counters
+        failed = False
+    finally:
+        RECORDER["stages"].append({
+            "stage": name,
+            "labels": {key: str(value) for key, value in labels.items() if value is not None},
+            "wall_seconds": round(time.perf_counter() - start_wall, 6),
+            "cpu_seconds": round(cpu_seconds() - start_cpu, 6),
+            **counters,
+            "peak_rss_bytes": rss_bytes(resource.getrusage(resource.RUSAGE_SELF)),
+            "children_peak_rss_bytes": rss_bytes(resource.getrusage(resource.RUSAGE_CHILDREN)),
+            "failed": int(failed)
+        })
+
+def report():
+    return {
+        "command": RECORDER["command"],
+        "started": datetime.fromtimestamp(RECORDER["started"], timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "started_timestamp": round(RECORDER["started"], 3),
+        "wall_seconds": round(time.time() - RECORDER["started"], 6),
+        "stages": RECORDER["stages"]
+    }
+
+def escape_label(value):
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def prometheus_text(metrics_report):
+    command = metrics_report["command"]
+    lines = []
+    for metric, help_text, key in PROMETHEUS_METRICS:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} gauge")
+        for record in metrics_report["stages"]:
+            labels = {"command": command, "stage": record["stage"], **record["labels"]}
+            label_text = ",".join(f'{re.sub(r"[^a-zA-Z0-9_]", "_", label)}="{escape_label(value)}"' for label, value in labels.items())
+            lines.append(f"{metric}{{{label_text}}} {record[key]}")
+
+    lines.append("# HELP quantify_last_run_timestamp_seconds When the command started, in seconds since the epoch")
+    lines.append("# TYPE quantify_last_run_timestamp_seconds gauge")
+    lines.append(f'quantify_last_run_timestamp_seconds{{command="{escape_label(command)}"}} {metrics_report["started_timestamp"]}')
+    return "\n".join(lines) + "\n"
+
+def save(output_path):
+    """Writes the recorded stages to output_path, as a Prometheus textfile when it ends in .prom"""
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    from quantify import json_backend
+
+    metrics_report = report()
+    # Written next to the target and renamed, so a collector never reads half a file
+    temp_path = f"{output_path}.tmp"
+    with open(temp_path, 'w') as f:
+        if output_path.endswith(".prom"):
+            f.write(prometheus_text(metrics_report))
+        else:
+            json_backend.dump(metrics_report, f, indent=4)
+    os.replace(temp_path, output_path)
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,108 @@
+import io
+import os
+import re
+from contextlib import contextmanager
+
+"""
+This script profiles the stages of a quantify command, for --profile. Every
+stage (the scan, each RQ's saving, each calculation, ...) runs under its own
+cProfile profiler and leaves two files in the profile directory, numbered in
+the order the stages ran, e.g. 01_scan_envri.pstats and 01_scan_envri.txt.
+
+The .pstats file can be opened with pstats or snakeviz. The .txt summary
+lists the quantify functions by cumulative time (so rq4.visit, the JSON
+decoding in scan.load_somef_output and the save_results of each RQ can be
+told apart) and the top functions by own time.
+
+With --profile-sampling and pyinstrument installed, a sampling profiler is
+used instead, which slows the run down much less; it writes .txt and .html
+reports.
+
+cProfile, pstats and pyinstrument are only imported once profiling is
+enabled, the CLI imports this module on every start.
+"""
+PROFILE = None
+
+def load_pyinstrument():
+    try:
+        import pyinstrument
+    except ImportError:
+        return None
+    return pyinstrument
+
+def enable(directory, top=20, sampling=False):
+    """Profiles every following stage into directory; returns the profiler used"""
+    global PROFILE
+    os.makedirs(directory, exist_ok=True)
+    sampling = sampling and load_pyinstrument() is not None
+    PROFILE = {"directory": directory, "top": top, "sampling": sampling, "count": 0, "files": []}
+    return "pyinstrument" if sampling else "cProfile"
+
+def disable():
+    global PROFILE
+    PROFILE = None
+
+def enabled():
+    return PROFILE is not None
+
+def profile_stem(name, labels):
+    PROFILE["count"] += 1
+    parts = [name] + [str(value) for value in labels.values() if value is not None]
+    file_name = re.sub(r"[^A-Za-z0-9_.-]", "_", "_".join(parts))
+    return os.path.join(PROFILE["directory"], f"{PROFILE['count']:02d}_{file_name}")
+
+def write_summary(profiler, summary_path, title, top):
+    import pstats
+
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+
+    stream.write(f"{title}\n\nquantify functions by cumulative time\n")
+    stats.sort_stats("cumulative").print_stats(r"quantify[\\/]", top)
+    stream.write(f"\nTop {top} functions by own time\n")
+    stats.sort_stats("tottime").print_stats(top)
+
+    with open(summary_path, 'w') as f:
+        f.write(stream.getvalue())
+
+@contextmanager
+def profiled(name, **labels):
+    """Profiles the block as one stage when profiling is enabled"""
+    if PROFILE is None:
+        yield
+        return
+
+    stem = profile_stem(name, labels)
+    title = " ".join([name] + [f"{key}={value}" for key, value in labels.items() if value is not None])
+
+    if PROFILE["sampling"]:
+        profiler = load_pyinstrument().Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            with open(f"{stem}.txt", 'w') as f:
+                f.write(profiler.output_text(unicode=False, color=False))
+            with open(f"{stem}.html", 'w') as f:
+                f.write(profiler.output_html())
+            PROFILE["files"].append(f"{stem}.txt")
+        return
+
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(f"{stem}.pstats")
+        write_summary(profiler, f"{stem}.txt", title, PROFILE["top"])
+        PROFILE["files"].append(f"{stem}.pstats")
+
+def written_files():
+    return list(PROFILE["files"]) if PROFILE else []
+
+if __name__ == "__main__":
+    pass
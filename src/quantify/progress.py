@@ -0,0 +1,134 @@
+import sys
+import time
+from contextlib import contextmanager
+
+"""
+This script reports how far a quantify stage is, in place of a spinner. The
+long stages take a progress callback, progress(done, total), called after
+every repository (run_somef_on_links, rq2) or every SoMEF output (scan,
+scan_many, scan_partials), e.g.
+
+    with progress.task("Scanning SoMEF outputs..."):
+        scan(somef_dir, missing_key, visitors, progress=progress.update)
+
+On a terminal the line of the stage is redrawn in place with done/total,
+items per second and the ETA, e.g.
+
+    Scanning SoMEF outputs... 1200/4000 (30%) 410.2 files/s ETA 6.8s
+
+When stdout is not a terminal (a batch log) the same is printed as a line of
+its own at most every LOG_INTERVAL seconds. Every stage ends with one line
+giving its duration and throughput. Stages without a callback only print
+that last line.
+
+The callbacks are called from the thread that runs the stage, so nothing is
+drawn from a thread of its own.
+"""
+REDRAW_INTERVAL = 0.1
+LOG_INTERVAL = 10
+
+ACTIVE = None
+
+def format_duration(seconds):
+    """e.g. 4.2s, or 1:05:09 from a minute on"""
+    if seconds < 60:
+        return f"{seconds:.1f}s"
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+class Reporter:
+
+    def __init__(self, message, unit="files", stream=None, interactive=None, log_interval=None):
+        self.message = message
+        self.unit = unit
+        self.stream = stream or sys.stdout
+        self.interactive = self.stream.isatty() if interactive is None else interactive
+        self.log_interval = LOG_INTERVAL if log_interval is None else log_interval
+
+        self.start = time.perf_counter()
+        self.done = 0
+        self.total = None
+        self.last_report = self.start
+        self.width = 0
+
+        if self.interactive:
+            self.draw(message)
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def rate(self):
+        elapsed = self.elapsed()
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def status(self):
+        """e.g. 1200/4000 (30%) 410.2 files/s ETA 6.8s"""
+        rate = self.rate()
+        if not self.total:
+            return f"{self.done} {self.unit} {rate:.1f} {self.unit}/s"
+
+        text = f"{self.done}/{self.total} ({self.done * 100 // self.total}%) {rate:.1f} {self.unit}/s"
+        if rate > 0 and self.done < self.total:
+            text += f" ETA {format_duration((self.total - self.done) / rate)}"
+        return text
+
+    def draw(self, line):
+        # Padded with spaces so a shorter line covers the previous one
+        self.stream.write(f"\r{line}{' ' * max(0, self.width - len(line))}")
+        self.stream.flush()
+        self.width = len(line)
+
+    def update(self, done, total=None):
+        """The progress callback: done items out of total (None when unknown)"""
+        self.done = done
+        if total is not None:
+            self.total = total
+
+        now = time.perf_counter()
+        interval = REDRAW_INTERVAL if self.interactive else self.log_interval
+        if now - self.last_report < interval:
+            return
+        self.last_report = now
+
+        if self.interactive:
+            self.draw(f"{self.message} {self.status()}")
+        else:
+            self.stream.write(f"{self.message} {self.status()}\n")
+            self.stream.flush()
+
+    def finish(self, failed=False):
+        elapsed = self.elapsed()
+        outcome = "Failed" if failed else "Done!"
+        line = f"{self.message} {outcome} {format_duration(elapsed)}"
+        if self.done:
+            line += f", {self.done} {self.unit} ({self.rate():.1f} {self.unit}/s)"
+
+        if self.interactive:
+            self.draw(line)
+            self.stream.write("\n")
+        else:
+            self.stream.write(f"{line}\n")
+        self.stream.flush()
+
+@contextmanager
+def task(message, unit="files", stream=None):
+    """Reports the progress of the block; yields its Reporter, which update() feeds too"""
+    global ACTIVE
+    reporter = Reporter(message, unit, stream)
+    previous, ACTIVE = ACTIVE, reporter
+    failed = True
+    try:
+        yield reporter
+        failed = False
+    finally:
+        ACTIVE = previous
+        reporter.finish(failed)
+
+def update(done, total=None):
+    """The progress callback of the running task, does nothing outside of one"""
+    if ACTIVE is not None:
+        ACTIVE.update(done, total)
+
+if __name__ == "__main__":
+    pass
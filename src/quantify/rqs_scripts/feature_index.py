@@ -0,0 +1,208 @@
+import os
+import gzip
+import hashlib
+from itertools import chain
+from functools import reduce
+
+from quantify import json_backend
+from quantify.rqs_scripts import rq1, rq3, rq4, rq5
+from quantify.rqs_scripts.scan import scan_partials, iter_output_files
+
+"""
+This script turns a SoMEF output directory into a columnar feature index,
+one row per output file, so the RQs can be recomputed without parsing the
+SoMEF JSON again.
+
+Every count and list of the RQ1, RQ3, RQ4 and RQ5 results becomes a column
+holding that file's own share (e.g. "rq4/license/spdx/count"). Summing a
+count column and concatenating a list column gives back exactly what a scan
+of the directory gives. Next to those, a few readable per-repository
+features (has_cff, spdx_id, release_tags, ...) are kept for ad hoc analysis.
+
+Every row also records the file's mtime, size and SHA-256, so update_index
+only parses the files that were added or changed since the index was built.
+"""
+INDEX_VERSION = 2
+VISITORS = [rq1, rq3, rq4, rq5]
+
+def rq_name(visitor):
+    return visitor.__name__.rsplit(".", 1)[-1]
+
+def leaf_paths(result, prefix=()):
+    """Yields (path, leaf) for every count and list of an RQ result"""
+    for key, value in result.items():
+        if isinstance(value, dict):
+            yield from leaf_paths(value, prefix + (key,))
+        else:
+            yield prefix + (key,), value
+
+def column_name(visitor, path):
+    return "/".join((rq_name(visitor),) + path)
+
+def description_source(result_rq4):
+    if result_rq4["description"]["count_long"]:
+        return "readme"
+    if result_rq4["description"]["count_short"]:
+        return "github_api"
+    if result_rq4["no_description"]["count"]:
+        return "missing"
+    return None
+
+def citation_format(result_rq5):
+    for name, key in (("bibtex", "bib"), ("cff", "cff"), ("readme", "readme")):
+        if result_rq5["citation"][key]:
+            return name
+    return None
+
+def features(result_rq1, result_rq3, result_rq4, result_rq5):
+    spdx = result_rq4["license"]["spdx"]["licenses"]
+    versions = result_rq3["releases"]["versions"]
+    return {
+        "has_cff": result_rq1["citation.cff"]["count"] > 0,
+        "has_readme": result_rq1["readme_url"]["count"] > 0,
+        "has_codemeta": result_rq1["codemeta.json"]["count"] > 0,
+        "has_license": result_rq1["license"]["count"] > 0,
+        "spdx_id": spdx[0]["spdx_id"] if spdx else None,
+        "release_tags": next(iter(versions[0].values())) if versions else [],
+        "description_source": description_source(result_rq4),
+        "citation_format": citation_format(result_rq5)
+    }
+
+def empty_index(missing_key):
+    columns = {}
+    for visitor in VISITORS:
+        for path, leaf in leaf_paths(visitor.new_result()):
+            columns[column_name(visitor, path)] = []
+    for feature in features(*[visitor.new_result() for visitor in VISITORS]):
+        columns[feature] = []
+
+    return {
+        "version": INDEX_VERSION,
+        "missing_key": missing_key,
+        "files": [],
+        "nested": [],
+        "mtime_ns": [],
+        "size": [],
+        "sha256": [],
+        "columns": columns
+    }
+
+def file_digest(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def append_row(index, file, nested, stat, sha256, partials):
+    columns = index["columns"]
+    index["files"].append(file)
+    index["nested"].append(nested)
+    index["mtime_ns"].append(stat.st_mtime_ns)
+    index["size"].append(stat.st_size)
+    index["sha256"].append(sha256)
+
+    # Files a visitor does not look at (nested ones for the top level RQs) add nothing
+    partials = [partial if partial is not None else visitor.new_result() for visitor, partial in zip(VISITORS, partials)]
+
+    for visitor, partial in zip(VISITORS, partials):
+        for path, leaf in leaf_paths(partial):
+            columns[column_name(visitor, path)].append(leaf)
+    for feature, value in features(*partials).items():
+        columns[feature].append(value)
+
+def copy_row(index, old_index, row, stat):
+    for key in ("files", "nested", "sha256"):
+        index[key].append(old_index[key][row])
+    index["mtime_ns"].append(stat.st_mtime_ns)
+    index["size"].append(stat.st_size)
+
+    for name, column in index["columns"].items():
+        column.append(old_index["columns"][name][row])
+
+def update_index(index, directory, workers=1, executor=None, progress=None):
+    """Brings an index up to date with directory, parsing only new and changed files
+
+    Returns the new index and how many rows were kept, parsed and removed.
+    progress(done, total) follows the files being parsed.
+    """
+    missing_key = index["missing_key"]
+    old_rows = {file: row for row, file in enumerate(index["files"])}
+
+    # (file, file_path, nested, stat, old row or None, sha256 or None) in directory listing order
+    plan = []
+    stale = []
+    for file_name, file_path, nested in iter_output_files(directory, recursive=True):
+        file = os.path.relpath(file_path, directory)
+        stat = os.stat(file_path)
+        row = old_rows.get(file)
+
+        if row is not None and index["mtime_ns"][row] == stat.st_mtime_ns and index["size"][row] == stat.st_size:
+            plan.append((file, file_path, nested, stat, row, None))
+            continue
+
+        # Touched but not modified (e.g. re-extracted to the same result) keeps its row as well
+        sha256 = file_digest(file_path)
+        if row is not None and index["sha256"][row] == sha256:
+            plan.append((file, file_path, nested, stat, row, None))
+            continue
+
+        plan.append((file, file_path, nested, stat, None, sha256))
+        stale.append((file_name, file_path, nested))
+
+    parsed = scan_partials(directory, missing_key, VISITORS, workers, files=stale, executor=executor, progress=progress) if stale else []
+    parsed = iter(partials for file_name, file_path, nested, partials in parsed)
+
+    updated = empty_index(missing_key)
+    for file, file_path, nested, stat, row, sha256 in plan:
+        if row is not None:
+            copy_row(updated, index, row, stat)
+        else:
+            append_row(updated, file, nested, stat, sha256, next(parsed))
+
+    listed = set(file for file, file_path, nested, stat, row, sha256 in plan)
+    removed = sum(1 for file in index["files"] if file not in listed)
+    stats = {"kept": len(plan) - len(stale), "parsed": len(stale), "removed": removed}
+    return updated, stats
+
+def build_index(directory, missing_key, workers=1):
+    index, _ = update_index(empty_index(missing_key), directory, workers)
+    return index
+
+def aggregate(index, visitor):
+    """Recomputes the result of one RQ from its columns"""
+    result = visitor.new_result()
+    columns = index["columns"]
+
+    for path, leaf in leaf_paths(visitor.new_result()):
+        column = columns[column_name(visitor, path)]
+        parent = reduce(lambda node, key: node[key], path[:-1], result)
+        parent[path[-1]] = list(chain.from_iterable(column)) if isinstance(leaf, list) else sum(column)
+
+    return result
+
+def save_index(index, output_path):
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    # Written to a temp file first so a killed run never leaves a truncated index behind
+    tmp_path = output_path + ".tmp"
+    opener = gzip.open if output_path.endswith(".gz") else open
+    with opener(tmp_path, 'wb') as f:
+        f.write(json_backend.dumps_bytes(index))
+    os.replace(tmp_path, output_path)
+
+def load_index(index_path, missing_key):
+    opener = gzip.open if index_path.endswith(".gz") else open
+    with opener(index_path, 'rb') as f:
+        index = json_backend.load(f)
+
+    if index.get("version") != INDEX_VERSION:
+        raise ValueError(f"{index_path} was built by another version of quantify, rebuild it with 'quantify index'")
+    if index.get("missing_key") != missing_key:
+        raise ValueError(f"{index_path} was built with missing key {index.get('missing_key')!r}, not {missing_key!r}")
+    return index
+
+if __name__ == "__main__":
+    pass
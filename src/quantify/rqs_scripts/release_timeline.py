@@ -0,0 +1,115 @@
+import os
+import sys
+from datetime import datetime, timezone
+from statistics import median
+
+from quantify import json_backend
+from quantify.rqs_scripts.scan import scan
+
+"""
+This script extends RQ3 with the release timeline of every repository: how
+many releases it has, the median number of days between two of them and how
+old the last one is.
+
+Only the dates of the releases are decoded (see scan and selective_json),
+so the release notes never reach memory, and each document is reduced to a
+single row as soon as it is visited. The rows of a cluster are saved as one
+compact table, e.g. timeline_envri_rq3.json:
+
+    {"as_of": "2025-01-31T00:00:00Z",
+     "columns": ["file", "release_count", ...],
+     "rows": [["output_1.json", 12, 12, 30.5, "2020-01-02T10:00:00Z", ...], ...],
+     "summary": {...}}
+"""
+RECURSIVE = False
+
+FIELDS = {
+    "releases": {"result": {"date_published": True, "date_created": True}}
+}
+
+COLUMNS = ("file", "release_count", "dated_count", "median_interval_days", "first_release", "last_release", "last_release_age_days")
+
+def parse_date(value):
+    # GitHub writes dates like 2024-09-13T11:19:24Z, which fromisoformat only reads from Python 3.11
+    if not isinstance(value, str):
+        return None
+    try:
+        date = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return date if date.tzinfo else date.replace(tzinfo=timezone.utc)
+
+def format_date(date):
+    return date.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def days_between(start, end):
+    return round((end - start).total_seconds() / 86400, 3)
+
+def release_date(release):
+    """The publication date of a release, its creation date when it was never published"""
+    result = release.get("result", {})
+    return parse_date(result.get("date_published")) or parse_date(result.get("date_created"))
+
+def new_result():
+    return {"rows": []}
+
+def visit(result, file_name, data, missing_key):
+    missing_categories = data.get(missing_key, [])
+    if 'releases' not in data or 'releases' in missing_categories:
+        return
+
+    releases = data["releases"]
+    dates = sorted(date for date in map(release_date, releases) if date is not None)
+    intervals = [days_between(start, end) for start, end in zip(dates, dates[1:])]
+
+    # Without dates only the count is known
+    result["rows"].append([
+        file_name,
+        len(releases),
+        len(dates),
+        round(median(intervals), 3) if intervals else None,
+        format_date(dates[0]) if dates else None,
+        format_date(dates[-1]) if dates else None
+    ])
+
+def release_timeline(directory, missing_key):
+    result, = scan(directory, missing_key, [sys.modules[__name__]])
+    return result
+
+def timeline_table(result, as_of=None):
+    """Adds the age of the last release on as_of (default: now) to every row and summarizes the cluster"""
+    as_of = as_of or datetime.now(timezone.utc)
+
+    rows = []
+    for row in result["rows"]:
+        last_release = parse_date(row[5])
+        rows.append(row + [days_between(last_release, as_of) if last_release else None])
+
+    def column_median(name):
+        values = [row[COLUMNS.index(name)] for row in rows if row[COLUMNS.index(name)] is not None]
+        return round(median(values), 3) if values else None
+
+    return {
+        "as_of": format_date(as_of),
+        "columns": list(COLUMNS),
+        "rows": rows,
+        "summary": {
+            "repos": len(rows),
+            "repos_with_dates": sum(1 for row in rows if row[2]),
+            "median_release_count": column_median("release_count"),
+            "median_interval_days": column_median("median_interval_days"),
+            "median_last_release_age_days": column_median("last_release_age_days")
+        }
+    }
+
+def save_results(output_directory, table, output_file):
+    os.makedirs(output_directory, exist_ok=True)
+
+    # One compact line, the table can hold tens of thousands of rows
+    with open(os.path.join(output_directory, output_file), 'w') as f:
+        json_backend.dump(table, f)
+
+    print(f"Results saved to {output_file}")
+
+if __name__ == "__main__":
+    pass
@@ -1,11 +1,34 @@
 import os
-import json
+import sys
+
+from quantify import json_backend
+from quantify.rqs_scripts.scan import scan
 
 """
 This script is for answering RQ1
 """
-def rq1(directory, missing_key, output_file, output_directory):
-    result = {
+RECURSIVE = False
+
+# Every category is scanned for codemeta.json/AUTHORS sources, the rest only needs a few result fields
+FIELDS = {
+    "*": {"source": True},
+    "citation": {"result": {"format": True}},
+    "has_build_file": {"result": {"value": True, "format": True}},
+    "identifier": {"result": {"value": True}}
+}
+
+PACKAGE_FILES = [
+    "description", 
+    "composer.json", 
+    "package.json", 
+    "pom.xml", 
+    "pyproject.toml", 
+    "requirements.txt", 
+    "setup.py"
+]
+
+def new_result():
+    return {
         "citation.cff": {"count": 0},
         "readme_url": {"count": 0},
         "package": {"count": 0, "files": []},
@@ -17,131 +40,120 @@ def rq1(directory, missing_key, output_file, output_directory):
         "None": {"count": 0}
     }
 
-    package_files = [
-        "description", 
-        "composer.json", 
-        "package.json", 
-        "pom.xml", 
-        "pyproject.toml", 
-        "requirements.txt", 
-        "setup.py"
-    ]
-
-    for file_name in os.listdir(directory):
-        if file_name.startswith("output_") and file_name.endswith(".json"):
-            file_path = os.path.join(directory, file_name)
-            
-            with open(file_path, 'r') as file:
-                data = json.load(file)
-            
-            missing_categories = data.get(missing_key, [])
-            all_keys_missing = True
+def visit(result, file_name, data, missing_key):
+    missing_categories = data.get(missing_key, [])
+    all_keys_missing = True
 
-            if 'citation' in data and 'citation' not in missing_categories:
-                for citation in data["citation"]:
-                    format_value = citation.get("result", {}).get("format")
-                    if format_value == "cff":
-                        result["citation.cff"]["count"] += 1
-                        all_keys_missing = False
-
-            if 'readme_url' in data and 'readme_url' not in missing_categories:
-                result['readme_url']['count'] += 1
+    if 'citation' in data and 'citation' not in missing_categories:
+        for citation in data["citation"]:
+            format_value = citation.get("result", {}).get("format")
+            if format_value == "cff":
+                result["citation.cff"]["count"] += 1
                 all_keys_missing = False
 
-            if 'contributors' in data and 'contributors' not in missing_categories:
-                result['contributors']['count'] += 1
-                result["contributors"]['files'].append(file_name)
-                all_keys_missing = False
-            
-            if 'license' in data and 'license' not in missing_categories:
-                result['license']['count'] += 1
-                all_keys_missing = False
+    if 'readme_url' in data and 'readme_url' not in missing_categories:
+        result['readme_url']['count'] += 1
+        all_keys_missing = False
+
+    if 'contributors' in data and 'contributors' not in missing_categories:
+        result['contributors']['count'] += 1
+        result["contributors"]['files'].append(file_name)
+        all_keys_missing = False
+    
+    if 'license' in data and 'license' not in missing_categories:
+        result['license']['count'] += 1
+        all_keys_missing = False
 
-            # Now we check for codemeta.json across all fields with "source" instead of temp_dir
-            codemeta_found = False
-            for key, value in data.items():
-                if key == missing_key or key in missing_categories:
-                    continue
-                
-                if isinstance(value, list):
-                    for item in value:
-                        if isinstance(item, dict):
-                            source_value = item.get("source", "")
-                            if isinstance(source_value, str) and "codemeta.json" in source_value.lower():
-                                result["codemeta.json"]["count"] += 1
-                                result["codemeta.json"]["files"].append(file_name)
+    # Now we check for codemeta.json across all fields with "source" instead of temp_dir
+    codemeta_found = False
+    for key, value in data.items():
+        if key == missing_key or key in missing_categories:
+            continue
+        
+        if isinstance(value, list):
+            for item in value:
+                if isinstance(item, dict):
+                    source_value = item.get("source", "")
+                    if isinstance(source_value, str) and "codemeta.json" in source_value.lower():
+                        result["codemeta.json"]["count"] += 1
+                        result["codemeta.json"]["files"].append(file_name)
+                        all_keys_missing = False
+                        codemeta_found = True
+                        break
+        
+        if codemeta_found:
+            break
+    
+    # Same thing here we AUTHORS in different formats
+    authors_file_found = False
+    for key, value in data.items():
+        if key == missing_key or key in missing_categories:
+            continue
+        
+        if isinstance(value, list):
+            for item in value:
+                if isinstance(item, dict):
+                    source_value = item.get("source", "")
+                    if isinstance(source_value, str):
+                        source_lower = source_value.lower()
+                        if "/authors" in source_lower or "/authors." in source_lower:
+                            if source_lower.endswith("/authors") or "/authors." in source_lower:
+                                result["authors"]["count"] += 1
+                                result["authors"]["files"].append(file_name)
                                 all_keys_missing = False
-                                codemeta_found = True
+                                authors_file_found = True
                                 break
-                
-                if codemeta_found:
-                    break
+        
+        if authors_file_found:
+            break
+    
+    # Same thing here for package files
+    package_found = False
+    if 'has_build_file' in data and 'has_build_file' not in missing_categories:
+        for build_file in data["has_build_file"]:
+            source_value = build_file.get("result", {}).get("value", "").lower()
+            format_value = build_file.get("result", {}).get("format", "").lower()
             
-            # Same thing here we AUTHORS in different formats
-            authors_file_found = False
-            for key, value in data.items():
-                if key == missing_key or key in missing_categories:
-                    continue
-                
-                if isinstance(value, list):
-                    for item in value:
-                        if isinstance(item, dict):
-                            source_value = item.get("source", "")
-                            if isinstance(source_value, str):
-                                source_lower = source_value.lower()
-                                if "/authors" in source_lower or "/authors." in source_lower:
-                                    if source_lower.endswith("/authors") or "/authors." in source_lower:
-                                        result["authors"]["count"] += 1
-                                        result["authors"]["files"].append(file_name)
-                                        all_keys_missing = False
-                                        authors_file_found = True
-                                        break
-                
-                if authors_file_found:
+            for pkg_file in PACKAGE_FILES:
+                if pkg_file.lower() in source_value or pkg_file.lower() == format_value:
+                    if not package_found: 
+                        result["package"]["count"] += 1
+                        result["package"]["files"].append(file_name)
+                        all_keys_missing = False
+                        package_found = True
                     break
             
-            # Same thing here for package files
-            package_found = False
-            if 'has_build_file' in data and 'has_build_file' not in missing_categories:
-                for build_file in data["has_build_file"]:
-                    source_value = build_file.get("result", {}).get("value", "").lower()
-                    format_value = build_file.get("result", {}).get("format", "").lower()
-                    
-                    for pkg_file in package_files:
-                        if pkg_file.lower() in source_value or pkg_file.lower() == format_value:
-                            if not package_found: 
-                                result["package"]["count"] += 1
-                                result["package"]["files"].append(file_name)
-                                all_keys_missing = False
-                                package_found = True
-                            break
-                    
-                    if package_found:
-                        break
+            if package_found:
+                break
 
-            if 'identifier' in data and 'identifier' not in missing_categories:
-                for identifier in data["identifier"]:
-                    doi_value = identifier.get("result", {}).get("value", "")
+    if 'identifier' in data and 'identifier' not in missing_categories:
+        for identifier in data["identifier"]:
+            doi_value = identifier.get("result", {}).get("value", "")
 
-                    if doi_value.startswith("https://doi.org/") and "10.5281/zenodo." in doi_value:
-                        extracted_part = doi_value.split("https://doi.org/")[-1]
-                        result["identifier_extract"]["count"] += 1
-                        result["identifier_extract"]["extracted_values"].append(extracted_part)
-                        break
-                    
-                    elif doi_value.startswith("https://zenodo.org/badge/latestdoi/"):
-                        extracted_part = doi_value.split("https://zenodo.org/badge/latestdoi/")[-1]
-                        result["identifier_extract"]["count"] += 1
-                        result["identifier_extract"]["extracted_values"].append(doi_value)
-                        break
+            if doi_value.startswith("https://doi.org/") and "10.5281/zenodo." in doi_value:
+                extracted_part = doi_value.split("https://doi.org/")[-1]
+                result["identifier_extract"]["count"] += 1
+                result["identifier_extract"]["extracted_values"].append(extracted_part)
+                break
+            
+            elif doi_value.startswith("https://zenodo.org/badge/latestdoi/"):
+                extracted_part = doi_value.split("https://zenodo.org/badge/latestdoi/")[-1]
+                result["identifier_extract"]["count"] += 1
+                result["identifier_extract"]["extracted_values"].append(doi_value)
+                break
 
-            if all_keys_missing:
-                result['None']['count'] += 1
-    
+    if all_keys_missing:
+        result['None']['count'] += 1
+
+def save_results(output_directory, result, output_file):
     os.makedirs(output_directory, exist_ok=True)
     output_path = os.path.join(output_directory, output_file)
     with open(output_path, 'w') as outfile:
-        json.dump(result, outfile, indent=4)
+        json_backend.dump(result, outfile, indent=4)
+
+def rq1(directory, missing_key, output_file, output_directory):
+    result, = scan(directory, missing_key, [sys.modules[__name__]])
+    save_results(output_directory, result, output_file)
     
 if __name__ == "__main__":
     pass
\ No newline at end of file
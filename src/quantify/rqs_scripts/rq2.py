@@ -1,7 +1,14 @@
-import json
 import requests
 import os
+import math
 import time
+import threading
+from contextlib import nullcontext
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
+from quantify import json_backend
 
 
 """
@@ -11,36 +18,127 @@ SWH_API_ENDPOINT = "https://archive.softwareheritage.org/api/1/origin/"
 
 token = ""
 
-def check_swh_presence(github_url, token):
+MAX_RATE_LIMIT_RETRIES = 5
+# Seconds waited when a rate limit answer gives no usable reset time
+DEFAULT_RETRY_SECONDS = 60
+
+class RateLimit:
+    """Shared by all lookup threads so one exhausted quota pauses every request until it resets"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.resume_at = 0.0
+
+    def wait(self):
+        with self.lock:
+            delay = self.resume_at - time.time()
+        if delay > 0:
+            print(f"Rate limit reached. Waiting {delay:.0f}s for reset...")
+            time.sleep(delay)
+
+    def pause_until(self, resume_at):
+        with self.lock:
+            self.resume_at = max(self.resume_at, resume_at)
+
+    def update(self, response):
+        """Reads SWH's rate limit headers, returns True when the request has to be retried"""
+        if response.status_code == 429:
+            self.pause_until(time.time() + retry_after(response))
+            return True
+
+        remaining = header_number(response, "X-RateLimit-Remaining")
+        if remaining is not None and remaining <= 0:
+            reset = header_number(response, "X-RateLimit-Reset")
+            self.pause_until(reset if reset is not None else time.time() + DEFAULT_RETRY_SECONDS)
+        return False
+
+def header_number(response, name):
+    """The header as a float, None when it is missing or not a finite number"""
+    try:
+        value = float(response.headers.get(name, ""))
+    except ValueError:
+        return None
+    return value if math.isfinite(value) else None
+
+def retry_after(response):
+    """Seconds to wait after a 429, from Retry-After (seconds or HTTP date) or X-RateLimit-Reset"""
+    value = response.headers.get("Retry-After")
+    if value is not None:
+        seconds = header_number(response, "Retry-After")
+        if seconds is not None:
+            return max(0.0, seconds)
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            pass
+
+    reset = header_number(response, "X-RateLimit-Reset")
+    if reset is not None:
+        return max(0.0, reset - time.time())
+
+    return DEFAULT_RETRY_SECONDS
 
-    headers = {"Authorization": f"Bearer {token}"}
-    full_url = f"{SWH_API_ENDPOINT}{github_url}/get/"
+def create_session(token, concurrency=1):
+    """One keep-alive connection per lookup thread, reused for every repository"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency, pool_block=True)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Authorization"] = f"Bearer {token}"
+    return session
+
+def query_swh(github_url, session, endpoint=SWH_API_ENDPOINT, rate_limit=None):
+    """Returns (in_swh, status_code), status_code is None when SWH could not be reached"""
+    full_url = f"{endpoint}{github_url}/get/"
+    rate_limit = rate_limit or RateLimit()
+
+    for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+        rate_limit.wait()
 
-    while True:
-        
         try:
-            response = requests.get(full_url, headers=headers)
+            response = session.get(full_url)
             print(f"Processing {full_url} - Status: {response.status_code}")
-            
-            if response.status_code == 200:
-                return True
-            
-            elif response.status_code == 404:
-                return False
-            
-            #elif response.status_code == 429:
-                #print("Rate limit reached. Waiting for reset...")
-                #time.sleep(3600) 
-
-            else:
-                print(f"Unexpected status code: {response.status_code}")
-                return False
-                
+
         except requests.RequestException as e:
             print(f"Error checking URL {github_url}: {e}")
-            return False
+            return False, None
+
+        if rate_limit.update(response):
+            continue
+
+        if response.status_code == 200:
+            return True, 200
 
-def rq2(input_file, token, output_file, output_directory):
+        elif response.status_code == 404:
+            return False, 404
+
+        else:
+            print(f"Unexpected status code: {response.status_code}")
+            return False, response.status_code
+
+    print(f"Giving up on {github_url} after {MAX_RATE_LIMIT_RETRIES} rate limited attempts")
+    return False, 429
+
+def check_swh_presence(github_url, token, session=None, endpoint=SWH_API_ENDPOINT, rate_limit=None, cache=None):
+    if cache is not None:
+        cached = cache.get(github_url)
+        if cached is not None:
+            return cached[0]
+
+    # A session made here for this one lookup is closed after it
+    with nullcontext(session) if session is not None else create_session(token) as session:
+        in_swh, status_code = query_swh(github_url, session, endpoint, rate_limit)
+
+    if cache is not None:
+        cache.put(github_url, in_swh, status_code)
+    return in_swh
+
+def rq2(input_file, token, output_file, output_directory, concurrency=4, endpoint=SWH_API_ENDPOINT, cache=None, session=None, rate_limit=None, progress=None):
+    """Returns the RQ2 result and saves it unless output_file is None
+
+    session and rate_limit can be shared by several runs, e.g. one per cluster; a given session is left open.
+    progress(done, total) is called after every repository, in input order.
+    """
     result = {
         "results": [],
         "summary": {
@@ -51,38 +149,54 @@ def rq2(input_file, token, output_file, output_directory):
 
     try:
         with open(input_file, 'r') as file:
-            repositories = json.load(file)
+            repositories = json_backend.load(file)
         print(f"Loaded {len(repositories)} repositories from {input_file}")
 
     except Exception as e:
         print(f"Could not open {input_file}: {e}")
         return
 
-    for repo in repositories:
-        github_url = repo.get("github_url")
+    github_urls = [repo.get("github_url") for repo in repositories if repo.get("github_url")]
 
-        if github_url:
+    own_session = session is None
+    session = session or create_session(token, concurrency)
+    rate_limit = rate_limit or RateLimit()
 
-            in_swh = check_swh_presence(github_url, token)
-            result["results"].append({
-                "github_link": github_url,
-                "in_swh": in_swh
-            })
-            
-            if in_swh:
-                result["summary"]["count_in_swh"] += 1
-                print(f"{github_url} is available on SWH")
-            else:
-                result["summary"]["count_not_in_swh"] += 1
+    try:
+        # The lookups are tiny and network bound, map keeps the results in input order
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            presence = executor.map(lambda url: check_swh_presence(url, token, session, endpoint, rate_limit, cache), github_urls)
+
+            for done, (github_url, in_swh) in enumerate(zip(github_urls, presence), 1):
+                result["results"].append({
+                    "github_link": github_url,
+                    "in_swh": in_swh
+                })
+
+                if in_swh:
+                    result["summary"]["count_in_swh"] += 1
+                    print(f"{github_url} is available on SWH")
+                else:
+                    result["summary"]["count_not_in_swh"] += 1
+
+                if progress is not None:
+                    progress(done, len(github_urls))
+    finally:
+        if own_session:
+            session.close()
 
     print(f"Processed repositories. In SWH: {result['summary']['count_in_swh']}, Not in SWH: {result['summary']['count_not_in_swh']}")
 
+    if output_file is None:
+        return result
+
     os.makedirs(output_directory, exist_ok=True)
     output_path = os.path.join(output_directory, output_file)
 
     with open(output_path, 'w') as f:
-        json.dump(result, f, indent=4)
+        json_backend.dump(result, f, indent=4)
     print(f"Results saved to {output_path}")
+    return result
 
 if __name__ == "__main__":
     pass
@@ -1,11 +1,15 @@
 import os
-import json
+import sys
 import re
+from functools import lru_cache
+
+from quantify import json_backend
+from quantify.rqs_scripts.scan import scan
 
 """
 This script is for answering RQ3
 """
-SEMANTIC_PATTERN = r"^v?\d+\.\d+\.\d+(-\w+)?$"
+SEMANTIC_PATTERN = re.compile(r"^v?\d+\.\d+\.\d+(-\w+)?$")
 CALENDAR_PATTERN = re.compile(
     r"""
     ^                                
@@ -24,53 +28,145 @@ CALENDAR_PATTERN = re.compile(
     re.VERBOSE
 )
 
-ALPHANUMERIC_PATTERN = r"^[a-zA-Z0-9._-]+$"
+ALPHANUMERIC_PATTERN = re.compile(r"^[a-zA-Z0-9._-]+$")
+
+# The three patterns above as one alternation, tried in the same order, so a
+# tag is classified in a single match; the outer group that matched names
+# the scheme. VERSION_COMPONENTS_PATTERN is the same alternation with the
+# components of each scheme captured, which makes it a bit slower.
+VERSION_PATTERN = re.compile(
+    r"""
+    ^(?:
+        (?P<semantic>v?\d+\.\d+\.\d+(?:-\w+)?)$
+    |
+        (?P<calendar>
+            (?:\d{4}|\d{2})[-._](?:0[1-9]|1[0-2])[-._]?
+            (?:0[1-9]|[1-9]|[1-2][0-9]|3[0-1])?[-._]?\d*
+            (?:[-._]?(?:dev|alpha|beta|rc\d*))?
+        )$
+    |
+        (?P<alphanumeric>[a-zA-Z0-9._-]+)$
+    )
+    """,
+    re.VERBOSE
+)
+
+VERSION_COMPONENTS_PATTERN = re.compile(
+    r"""
+    ^(?:
+        (?P<semantic>
+            v?(?P<major>\d+)\.(?P<minor>\d+)\.(?P<patch>\d+)
+            (?:-(?P<pre>\w+))?
+        )$
+    |
+        (?P<calendar>
+            (?P<year>\d{4}|\d{2})
+            [-._]
+            (?P<month>0[1-9]|1[0-2])
+            [-._]?
+            (?P<day_or_minor>0[1-9]|[1-9]|[1-2][0-9]|3[0-1])?
+            [-._]?
+            (?P<micro>\d+)?
+            (?P<modifier>[-._]?(?:dev|alpha|beta|rc\d*))?
+        )$
+    |
+        (?P<alphanumeric>[a-zA-Z0-9._-]+)$
+    )
+    """,
+    re.VERBOSE
+)
+
+CLASSES = ("Semantic", "Calendar", "Alphanumeric", "Other")
+
+SCHEMES = {
+    "semantic": ("Semantic", ("major", "minor", "patch", "pre")),
+    "calendar": ("Calendar", ("year", "month", "day_or_minor", "micro", "modifier")),
+    "alphanumeric": ("Alphanumeric", ())
+}
+
+NUMERIC_COMPONENTS = {"major", "minor", "patch", "year", "month", "day_or_minor", "micro"}
+
+# Tags repeat a lot across repositories (v1.0.0, latest, ...), so the
+# classification of the most recent ones is kept
+CLASSIFY_CACHE_SIZE = 8192
 
+@lru_cache(maxsize=CLASSIFY_CACHE_SIZE)
 def classify_version(version):
-    if re.match(SEMANTIC_PATTERN, version):
-        return "Semantic"
-    elif re.match(CALENDAR_PATTERN, version):
-        return "Calendar"
-    elif re.match(ALPHANUMERIC_PATTERN, version):
-        return "Alphanumeric"
-    else:
+    match = VERSION_PATTERN.match(version)
+    if match is None:
         return "Other"
+    return SCHEMES[match.lastgroup][0]
 
-def rq3(directory, missing_key):
-    result = {
+def parse_version(version):
+    """Returns the classification of a tag and its components, e.g. ("Semantic", {"major": 1, "minor": 2, "patch": 3, "pre": None})"""
+    match = VERSION_COMPONENTS_PATTERN.match(version)
+    if match is None:
+        return "Other", {}
+
+    classification, names = SCHEMES[match.lastgroup]
+    if not names:
+        return classification, {}
+
+    return classification, {name: int(value) if value is not None and name in NUMERIC_COMPONENTS else value
+                            for name, value in zip(names, match.group(*names))}
+
+def classify_versions(versions):
+    """Classifies a list of tags in one call, in the same order"""
+    return list(map(classify_version, versions))
+
+RECURSIVE = False
+
+FIELDS = {
+    "releases": {"result": {"tag": True}}
+}
+
+def new_result():
+    return {
         "releases": {"count": 0, "versions": []},
         "None": {"count": 0}
     }
-    for file_name in os.listdir(directory):
-        if file_name.startswith("output_") and file_name.endswith(".json"):
-            file_path = os.path.join(directory, file_name)
-            
-            with open(file_path, 'r') as file:
-                data = json.load(file)
-            
-            missing_categories = data.get(missing_key, [])
-            releases_missing = True
-
-            if 'releases' in data and 'releases' not in missing_categories:
-                releases = data["releases"]  
-                result['releases']['count'] += 1
-                releases_missing = False
-
-                tags_list = []
-                for release in releases:
-                    tag = release.get("result", {}).get("tag", "").lower()
-                    if tag: 
-                        tags_list.append(tag)
-                
-                if tags_list:
-                    result['releases']['versions'].append({file_name: tags_list})
-
-            if releases_missing:
-                result['None']['count'] += 1
 
+def visit(result, file_name, data, missing_key):
+    missing_categories = data.get(missing_key, [])
+    releases_missing = True
+
+    if 'releases' in data and 'releases' not in missing_categories:
+        releases = data["releases"]  
+        result['releases']['count'] += 1
+        releases_missing = False
+
+        tags_list = []
+        for release in releases:
+            tag = release.get("result", {}).get("tag", "").lower()
+            if tag: 
+                tags_list.append(tag)
+        
+        if tags_list:
+            result['releases']['versions'].append({file_name: tags_list})
+
+    if releases_missing:
+        result['None']['count'] += 1
+
+def rq3(directory, missing_key):
+    result, = scan(directory, missing_key, [sys.modules[__name__]])
     return result
 
-def process_versions(directory, result):
+def flatten_versions(result):
+    """Returns the tags of every file as one flat list, with the file names and the offsets where their tags start and end"""
+    file_names, offsets, tags = [], [0], []
+    for file_data in result["releases"]["versions"]:
+        for file_name, versions in file_data.items():
+            file_names.append(file_name)
+            tags.extend(versions)
+            offsets.append(len(tags))
+    return file_names, offsets, tags
+
+def classify_tags(tags):
+    """Classifies a flat list of tags into one byte per tag, the index of its class in CLASSES. Each distinct tag is classified once."""
+    codes = {tag: CLASSES.index(classify_version(tag)) for tag in set(tags)}
+    return bytes(map(codes.__getitem__, tags))
+
+def process_versions(directory, result, annotate=True):
     consistency_results = {
         "files": {},
         "summary": {
@@ -84,28 +180,40 @@ def process_versions(directory, result):
             }
         }
     }
-    
-    for file_data in result["releases"]["versions"]:
-        for file_name, versions in file_data.items():
-            classifications = [classify_version(version) for version in versions]
-            primary_classification = classifications[0] 
-            
-            consistency_results["summary"]["class_counts"][primary_classification] += 1
-
-            is_consistent = all(classification == primary_classification for classification in classifications)
-            consistency_results["files"][file_name] = {
-                "is_consistent": is_consistent,
-                "classification": primary_classification if is_consistent else "Inconsistent"
-            }
 
-            if is_consistent:
-                consistency_results["summary"]["consistent_count"] += 1
-            else:
-                consistency_results["summary"]["inconsistent_count"] += 1
+    # All tags are classified in bulk; a file is consistent when all of its
+    # codes equal the first one
+    file_names, offsets, tags = flatten_versions(result)
+    codes = classify_tags(tags)
+
+    for file_name, start, end in zip(file_names, offsets, offsets[1:]):
+        if start == end:
+            continue
+        primary_classification = CLASSES[codes[start]]
+
+        consistency_results["summary"]["class_counts"][primary_classification] += 1
+
+        is_consistent = codes.count(codes[start:start + 1], start, end) == end - start
+        consistency_results["files"][file_name] = {
+            "is_consistent": is_consistent,
+            "classification": primary_classification if is_consistent else "Inconsistent"
+        }
+
+        if is_consistent:
+            consistency_results["summary"]["consistent_count"] += 1
+        else:
+            consistency_results["summary"]["inconsistent_count"] += 1
+
+    # The classification of every tag goes into the class_*_rq3.json file;
+    # it is not needed when only the consistency summary is used
+    if annotate:
+        position = 0
+        for file_data in result["releases"]["versions"]:
+            for file_name, versions in file_data.items():
+                file_data[file_name] = [{"version": version, "classification": CLASSES[code]}
+                                        for version, code in zip(versions, codes[position:position + len(versions)])]
+                position += len(versions)
 
-            file_data[file_name] = [{"version": version, "classification": classification} 
-                                    for version, classification in zip(versions, classifications)]
-    
     return consistency_results
 
 
@@ -113,10 +221,10 @@ def save_results(output_directory, result, consistency_results, output_release_c
     os.makedirs(output_directory, exist_ok=True)
 
     with open(os.path.join(output_directory, output_release_class_analysis), 'w') as f:
-        json.dump(result, f, indent=4)
+        json_backend.dump(result, f, indent=4)
 
     with open(os.path.join(output_directory, output_release_const_analysis), 'w') as f:
-        json.dump(consistency_results, f, indent=4)
+        json_backend.dump(consistency_results, f, indent=4)
 
     print(f"Results saved to {output_release_class_analysis} and {output_release_const_analysis}")
 
@@ -1,50 +1,57 @@
 import os
-import json
+import sys
+
+from quantify import json_backend
+from quantify.rqs_scripts.scan import scan
 
 """
 This script is for answering RQ5
 """
 
-def rq5(directory, missing_key, output_file, output_directory):
-    result = {
+RECURSIVE = False
+
+FIELDS = {
+    "citation": {"result": {"format": True, "original_header": True}}
+}
+
+def new_result():
+    return {
         "citation": {"bib": 0, "cff": 0, "readme": 0},
         "None": {"count": 0}
     }
 
-    for file_name in os.listdir(directory):
+def visit(result, file_name, data, missing_key):
+    missing_categories = data.get(missing_key, [])
+
+    if 'citation' in data and 'citation' not in missing_categories:
         
-        if file_name.startswith("output_") and file_name.endswith(".json"):
-            file_path = os.path.join(directory, file_name)
+        for citation in data["citation"]:
+            format_value = citation.get("result", {}).get("format")
             
-            with open(file_path, 'r') as file:
-                data = json.load(file)
-    
-            missing_categories = data.get(missing_key, [])
-
-            if 'citation' in data and 'citation' not in missing_categories:
-                
-                for citation in data["citation"]:
-                    format_value = citation.get("result", {}).get("format")
-                    
-                    if format_value == "bibtex":
-                        result["citation"]["bib"] += 1
-                        break
-
-                    if format_value == "cff":
-                        result["citation"]["cff"] += 1
-                        break
-
-                    if citation.get("result", {}).get("original_header"):
-                        result["citation"]["readme"] += 1
-                        break
-                    
-                    else:
-                        result["None"]["count"] += 1
+            if format_value == "bibtex":
+                result["citation"]["bib"] += 1
+                break
 
+            if format_value == "cff":
+                result["citation"]["cff"] += 1
+                break
+
+            if citation.get("result", {}).get("original_header"):
+                result["citation"]["readme"] += 1
+                break
+            
+            else:
+                result["None"]["count"] += 1
+
+def save_results(output_directory, result, output_file):
     os.makedirs(output_directory, exist_ok=True)
     output_file_path = os.path.join(output_directory, output_file)
     with open(output_file_path, 'w') as outfile:
-        json.dump(result, outfile, indent=4)
+        json_backend.dump(result, outfile, indent=4)
+
+def rq5(directory, missing_key, output_file, output_directory):
+    result, = scan(directory, missing_key, [sys.modules[__name__]])
+    save_results(output_directory, result, output_file)
     
     print("Successfully extracted the necessary information!")
 
@@ -0,0 +1,212 @@
+import os
+import importlib
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+
+from quantify import json_backend
+from quantify.rqs_scripts.selective_json import loads_selected, merge_fields
+
+"""
+This script walks a SoMEF output directory once and hands every parsed
+document to the RQ visitors (rq1, rq3, rq4, rq5), so each file is only
+loaded a single time no matter how many RQs are answered.
+
+A visitor is any module (or object) exposing:
+    RECURSIVE                                  -> also visit output files in subdirectories
+    new_result()                               -> the empty aggregate for this RQ
+    visit(result, file_name, data, missing_key) -> folds one SoMEF document into result
+    FIELDS (optional)                          -> the parts of a document the visitor reads,
+                                                  see selective_json; without it the whole
+                                                  document is decoded
+
+Only the union of the visitors' FIELDS is decoded, so heavy values such as
+license texts and release notes are skipped unless some visitor needs them.
+
+With workers > 1 the files are split into contiguous chunks that are scanned
+in a process pool, and the partial results are merged back in listing order
+so the output is the same as a sequential scan.
+
+scan, scan_many and scan_partials take a progress callback, called as
+progress(done, total) after every file (sequential) or every chunk (workers),
+see quantify.progress.
+"""
+
+def is_output_file(file_name):
+    return file_name.startswith("output_") and file_name.endswith(".json")
+
+def iter_output_files(directory, recursive=False):
+    """Yields (file_name, file_path, nested) in directory listing order"""
+    if not recursive:
+        for file_name in os.listdir(directory):
+            if is_output_file(file_name):
+                yield file_name, os.path.join(directory, file_name), False
+        return
+
+    for root, dirs, files in os.walk(directory):
+        nested = root != directory
+        for file_name in files:
+            if is_output_file(file_name):
+                yield file_name, os.path.join(root, file_name), nested
+
+def select_fields(visitors, missing_key):
+    fields = {missing_key: True}
+    for visitor in visitors:
+        visitor_fields = getattr(visitor, "FIELDS", None)
+        if visitor_fields is None:
+            return None
+        fields = merge_fields(fields, visitor_fields)
+    return fields
+
+def load_somef_output(file_path, fields=None):
+    if fields is None:
+        with open(file_path, 'rb') as file:
+            return json_backend.load(file)
+    with open(file_path, 'r') as file:
+        return loads_selected(file.read(), fields)
+
+def merge_results(result, other):
+    """Folds a partial result into result: counts are added and lists are concatenated"""
+    for key, value in other.items():
+        if isinstance(value, dict):
+            merge_results(result[key], value)
+        elif isinstance(value, list):
+            result[key].extend(value)
+        else:
+            result[key] += value
+    return result
+
+def visit_file(visitors, results, file_name, file_path, nested, missing_key, fields=None):
+    data = load_somef_output(file_path, fields)
+
+    for visitor, result in zip(visitors, results):
+        if nested and not visitor.RECURSIVE:
+            continue
+        visitor.visit(result, file_name, data, missing_key)
+
+def scan_chunk(visitor_names, chunk, missing_key):
+    """Runs in a worker process, visitors are passed by module name so they can be pickled"""
+    visitors = [importlib.import_module(name) for name in visitor_names]
+    return scan_files(chunk, missing_key, visitors)
+
+def visit_file_partials(visitors, file_name, file_path, nested, missing_key, fields=None):
+    """Returns the file's own result for every visitor, None for visitors that do not look at it"""
+    partials = [None if nested and not visitor.RECURSIVE else visitor.new_result() for visitor in visitors]
+    data = load_somef_output(file_path, fields)
+
+    for visitor, partial in zip(visitors, partials):
+        if partial is not None:
+            visitor.visit(partial, file_name, data, missing_key)
+
+    return partials
+
+def partials_chunk(visitor_names, chunk, missing_key):
+    visitors = [importlib.import_module(name) for name in visitor_names]
+    fields = select_fields(visitors, missing_key)
+
+    return [visit_file_partials(visitors, file_name, file_path, nested, missing_key, fields)
+            for file_name, file_path, nested in chunk]
+
+def split_chunks(items, count):
+    size = -(-len(items) // count)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+@contextmanager
+def worker_pool(workers, executor=None):
+    """Yields the shared executor when there is one, a pool of its own otherwise"""
+    if executor is not None:
+        yield executor
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            yield pool
+
+def scan_files(files, missing_key, visitors, progress=None, done=0, total=None):
+    """Scans (file_name, file_path, nested) entries in this process; done and total carry the progress of a larger scan"""
+    results = [visitor.new_result() for visitor in visitors]
+    fields = select_fields(visitors, missing_key)
+    total = len(files) if total is None else total
+
+    for file_name, file_path, nested in files:
+        visit_file(visitors, results, file_name, file_path, nested, missing_key, fields)
+        done += 1
+        if progress is not None:
+            progress(done, total)
+    return results
+
+def scan(directory, missing_key, visitors, workers=1, executor=None, progress=None):
+    """Loads every SoMEF output once and feeds it to each visitor, returns one result per visitor"""
+    return scan_many([directory], missing_key, visitors, workers, executor, progress)[0]
+
+def scan_many(directories, missing_key, visitors, workers=1, executor=None, progress=None):
+    """Scans several directories on one process pool, returns the results of scan for each of them
+
+    The chunks of every directory are queued at once, so the pool stays busy
+    from the first directory to the last one.
+    """
+    recursive = any(visitor.RECURSIVE for visitor in visitors)
+    # Listed up front so the progress has a total
+    all_files = [list(iter_output_files(directory, recursive)) for directory in directories]
+    total = sum(len(files) for files in all_files)
+
+    if workers <= 1 and executor is None:
+        all_results, done = [], 0
+        for files in all_files:
+            all_results.append(scan_files(files, missing_key, visitors, progress, done, total))
+            done += len(files)
+        return all_results
+
+    visitor_names = [visitor.__name__ for visitor in visitors]
+    all_results = [[visitor.new_result() for visitor in visitors] for directory in directories]
+
+    with worker_pool(workers, executor) as pool:
+        pending = []
+        for results, files in zip(all_results, all_files):
+            if not files:
+                continue
+            # A few chunks per worker keeps the pool busy when file sizes are uneven
+            for chunk in split_chunks(files, max(workers, 1) * 4):
+                pending.append((results, len(chunk), pool.submit(scan_chunk, visitor_names, chunk, missing_key)))
+
+        # Merging in submission order keeps the file order of a sequential scan
+        done = 0
+        for results, size, future in pending:
+            for result, other in zip(results, future.result()):
+                merge_results(result, other)
+            done += size
+            if progress is not None:
+                progress(done, total)
+
+    return all_results
+
+def scan_partials(directory, missing_key, visitors, workers=1, files=None, executor=None, progress=None):
+    """Like scan, but keeps every file apart: returns (file_name, file_path, nested, partials) per file
+
+    files limits the scan to some (file_name, file_path, nested) entries of iter_output_files.
+    """
+    if files is None:
+        recursive = any(visitor.RECURSIVE for visitor in visitors)
+        files = list(iter_output_files(directory, recursive))
+
+    if (workers <= 1 and executor is None) or not files:
+        fields = select_fields(visitors, missing_key)
+        rows = []
+        for file_name, file_path, nested in files:
+            rows.append((file_name, file_path, nested, visit_file_partials(visitors, file_name, file_path, nested, missing_key, fields)))
+            if progress is not None:
+                progress(len(rows), len(files))
+        return rows
+
+    chunks = split_chunks(files, max(workers, 1) * 4)
+    visitor_names = [visitor.__name__ for visitor in visitors]
+
+    rows = []
+    with worker_pool(workers, executor) as pool:
+        partials = pool.map(partials_chunk, [visitor_names] * len(chunks), chunks, [missing_key] * len(chunks))
+        for chunk, chunk_partials in zip(chunks, partials):
+            rows += [file + (file_partials,) for file, file_partials in zip(chunk, chunk_partials)]
+            if progress is not None:
+                progress(len(rows), len(files))
+
+    return rows
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,130 @@
+import re
+import json
+
+from quantify import json_backend
+
+"""
+This script decodes only the parts of a SoMEF output that the RQs ask for.
+
+A field spec says what is needed: True needs a whole value, a dict needs only
+the listed keys of an object (and is applied to every item of a list), and
+the "*" key applies to every key of that object. For example
+    {"license": {"result": {"spdx_id": True}}, "releases": {"result": {"tag": True}}}
+needs license[*].result.spdx_id and the release tags, so the license texts
+and release notes are never built.
+
+SoMEF writes pretty printed JSON, where the children of a container at depth
+d start on a new line indented by exactly (d + 1) * indent spaces, and raw
+newlines cannot appear inside strings. That lets us jump straight to the
+keys we need and skip everything else without decoding it. Skipping is done
+in Python and decoding in C, so small values, long lists of small items and
+objects that need every key ("*") are simply decoded whole.
+
+The result always holds every field the spec asks for and may hold more.
+Documents in any other layout, and specs that need the whole document anyway,
+are decoded in full by json_backend, which is faster when orjson or msgspec
+is installed.
+"""
+decoder = json.JSONDecoder()
+indent_pattern = re.compile(r'\{\n( +)"')
+marker_patterns = {}
+compiled_cache = {}
+
+SMALL_VALUE = 4096
+
+def merge_fields(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    if a is True or b is True:
+        return True
+
+    merged = dict(a)
+    for key, value in b.items():
+        merged[key] = merge_fields(merged.get(key), value)
+    return merged
+
+def compile_fields(fields):
+    """Turns a spec into (spec per key, spec for any other key) with "*" already merged in"""
+    if fields is True:
+        return True
+
+    star = fields.get("*")
+    explicit = {key: compile_fields(merge_fields(spec, star)) for key, spec in fields.items() if key != "*"}
+    return explicit, None if star is None else compile_fields(star)
+
+def compiled_fields(fields):
+    # Keyed by id, the spec is kept in the cache so the id cannot be reused by another object
+    cached = compiled_cache.get(id(fields))
+    if cached is None or cached[0] is not fields:
+        cached = compiled_cache[id(fields)] = (fields, compile_fields(fields))
+    return cached[1]
+
+def detect_indent(text):
+    """Returns the indent of a pretty printed JSON object, None for any other layout"""
+    match = indent_pattern.match(text)
+    return len(match.group(1)) if match else None
+
+def child_markers(text, start, end, spaces):
+    pattern = marker_patterns.get(spaces)
+    if pattern is None:
+        # Closing brackets of the children sit at the same indent, so they are not markers
+        pattern = marker_patterns[spaces] = re.compile("\n" + " " * spaces + "(?=[^ \\]}])")
+
+    positions = [match.end() for match in pattern.finditer(text, start, end)]
+    # Each child runs until the line of the next one, the last one until the end of its parent
+    bounds = [position - spaces - 1 for position in positions[1:]] + [end]
+    return list(zip(positions, bounds))
+
+def decode_value(text, start, end, depth, indent, compiled):
+    opener = text[start]
+    if compiled is True or opener not in "{[":
+        return decoder.raw_decode(text, start)[0]
+
+    # Walking the layout only pays off when there is a lot to skip: small values and
+    # objects whose every key is wanted ("*") are decoded whole
+    if end - start < SMALL_VALUE or (opener == "{" and compiled[1] is not None):
+        return decoder.raw_decode(text, start)[0]
+
+    markers = child_markers(text, start, end, indent * (depth + 1))
+
+    if opener == "[":
+        # A long list of small items is decoded faster in one go than item by item
+        if end - start < SMALL_VALUE * len(markers):
+            return decoder.raw_decode(text, start)[0]
+        return [decode_value(text, position, bound, depth + 1, indent, compiled)
+                for position, bound in markers]
+
+    explicit, star = compiled
+    result = {}
+    for position, bound in markers:
+        key, key_end = decoder.raw_decode(text, position)
+        spec = explicit.get(key, star)
+        if spec is None:
+            continue
+
+        value_start = key_end + 1
+        while text[value_start] == " ":
+            value_start += 1
+        result[key] = decode_value(text, value_start, bound, depth + 1, indent, spec)
+
+    return result
+
+def loads_selected(text, fields=None):
+    if fields is None:
+        return json_backend.loads(text)
+
+    compiled = compiled_fields(fields)
+    indent = detect_indent(text)
+    whole = compiled is True or compiled[1] is not None or len(text) < SMALL_VALUE
+    if indent is not None and not whole:
+        try:
+            return decode_value(text, 0, len(text), 0, indent, compiled)
+        except (ValueError, IndexError):
+            pass
+
+    return json_backend.loads(text)
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,76 @@
+import os
+import time
+import sqlite3
+import threading
+from urllib.parse import urlsplit, urlunsplit
+
+"""
+This script keeps the Software Heritage presence answers of RQ2 in a SQLite
+file, so rerunning RQ2 over the same repositories does not query SWH again
+until the cached answer is older than the TTL.
+"""
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "quantify", "swh_cache.sqlite")
+DEFAULT_TTL_DAYS = 30
+
+# Only definite answers are worth keeping, errors and rate limits are retried on the next run
+CACHEABLE_STATUS_CODES = (200, 404)
+
+def normalize_origin(url):
+    """https://GitHub.com/foo/bar.git/ and https://github.com/foo/bar are the same origin"""
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip("/")
+    if path.endswith(".git"):
+        path = path[:-len(".git")]
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, "", ""))
+
+class SWHCache:
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_days=DEFAULT_TTL_DAYS, refresh=False):
+        self.ttl = ttl_days * 24 * 3600
+        self.refresh = refresh
+        self.lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # RQ2 looks repositories up from several threads, the lock serialises access to the connection
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS swh_presence ("
+            "origin TEXT PRIMARY KEY, in_swh INTEGER NOT NULL, status_code INTEGER, checked_at REAL NOT NULL)"
+        )
+        self.connection.commit()
+
+    def get(self, url):
+        """Returns (in_swh, status_code) for a fresh cached answer, None when SWH has to be asked"""
+        if self.refresh:
+            return None
+
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT in_swh, status_code, checked_at FROM swh_presence WHERE origin = ?",
+                (normalize_origin(url),)
+            ).fetchone()
+
+        if row is None or time.time() - row[2] > self.ttl:
+            return None
+        return bool(row[0]), row[1]
+
+    def put(self, url, in_swh, status_code):
+        if status_code not in CACHEABLE_STATUS_CODES:
+            return
+
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO swh_presence (origin, in_swh, status_code, checked_at) VALUES (?, ?, ?, ?)",
+                (normalize_origin(url), int(in_swh), status_code, time.time())
+            )
+            self.connection.commit()
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+if __name__ == "__main__":
+    pass
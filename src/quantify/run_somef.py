@@ -1,21 +1,328 @@
 import subprocess
 import os
-import json
+import time
+import shutil
+import hashlib
+import importlib
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from importlib import metadata
 
-def run_somef_on_links(json_file, output_dir, threshold, temp):
+from quantify import json_backend
+
+"""
+This script runs SoMEF on a list of repositories, with one of two backends:
+
+    subprocess    runs 'somef describe' for every repository, each in its own
+                  temporary directory; every repository pays for starting an
+                  interpreter and importing SoMEF and its classifiers
+    inprocess     imports SoMEF's describe entry point once per worker process
+                  and calls it for every repository the worker gets
+
+'auto' picks inprocess when SoMEF can be imported here and no timeout is
+asked for: a call inside a worker cannot be abandoned the way a subprocess
+can be killed, so --timeout always uses the subprocess backend.
+
+A repository list can be split over several machines with shard=(i, n): a
+repository belongs to shard i of n (1 <= i <= n) by the SHA-1 of its URL, so
+every node picks the same split from the same list. Output files keep the
+position of the repository in the whole list (output_{position}.json) and
+every node writes its own manifest; merge_shards gathers the outputs and
+manifests of the shards into one directory, the same as an unsharded run.
+"""
+BACKENDS = ("auto", "inprocess", "subprocess")
+
+def manifest_path(output_dir):
+    """The run manifest lives next to the output directory, e.g. somef_outputs_manifest.json"""
+    return os.path.normpath(output_dir) + "_manifest.json"
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as file:
+        return json_backend.load(file)
+
+def save_manifest(path, manifest):
+    # Written to a temp file first so a killed run never leaves a truncated manifest behind
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json_backend.dump(manifest, f, indent=4)
+    os.replace(tmp_path, path)
+
+def get_somef_version():
+    try:
+        return metadata.version("somef")
+    except metadata.PackageNotFoundError:
+        return None
+
+def is_valid_output(output_file):
+    try:
+        with open(output_file, 'r') as file:
+            json_backend.load(file)
+        return True
+    except (OSError, ValueError):
+        return False
+
+def is_complete(entry, output_file):
+    """A repository is done when its manifest entry says so for output_file and that is still a readable JSON file
+
+    Without an entry the output at its position may be another repository's, from an earlier version of the list.
+    """
+    if entry is None or entry.get("status") != "done" or entry.get("output_file") != os.path.basename(output_file):
+        return False
+    return is_valid_output(output_file)
+
+def build_command(link, output_file, threshold, keep_dir=None):
+    command = ["somef", "describe", "-r", link, "-o", output_file, "-t", str(threshold), "-p", "-m"]
+    if keep_dir:
+        command += ["-kt", keep_dir]
+    return command
+
+def extract_repository(link, output_file, threshold, job_temp, keep_tmp=False, timeout=None, new_session=False):
+    """Runs SoMEF on one repository in its own temp directory, returns the job outcome
+
+    With new_session, 'somef describe' does not get the signals sent to the process group of this one.
+    """
+    print(f"Extracting: {link}")
+    os.makedirs(job_temp, exist_ok=True)
+
+    # SoMEF downloads and unpacks the repository under TMPDIR, so every job gets its own
+    env = dict(os.environ, TMPDIR=job_temp, TEMP=job_temp, TMP=job_temp)
+    command = build_command(link, output_file, threshold, job_temp if keep_tmp else None)
+
+    start = time.time()
+    try:
+        completed = subprocess.run(command, env=env, timeout=timeout, start_new_session=new_session)
+        exit_code = completed.returncode
+        status = "done" if exit_code == 0 and os.path.exists(output_file) else "failed"
+    except subprocess.TimeoutExpired:
+        print(f"Timed out after {timeout}s: {link}")
+        exit_code = None
+        status = "timeout"
+    except OSError as e:
+        print(f"Could not run SoMEF on {link}: {e}")
+        exit_code = None
+        status = "failed"
+    finally:
+        if not keep_tmp:
+            shutil.rmtree(job_temp, ignore_errors=True)
+
+    return {
+        "github_url": link,
+        "output_file": output_file,
+        "status": status,
+        "exit_code": exit_code,
+        "duration": round(time.time() - start, 3)
+    }
+
+def parse_shard(text):
+    """Parses 'i/n', e.g. '2/4', into (i, n); raises ValueError unless 1 <= i <= n"""
+    index, separator, count = text.partition("/")
+    try:
+        index, count = int(index), int(count)
+    except ValueError:
+        raise ValueError(f"Invalid shard {text}, expected i/n such as 1/4") from None
+    if not separator or not 1 <= index <= count:
+        raise ValueError(f"Invalid shard {text}, expected i/n with 1 <= i <= n")
+    return index, count
+
+def shard_of(link, count):
+    """The shard (1 to count) a repository belongs to; hash() would differ between interpreters"""
+    digest = hashlib.sha1(link.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count + 1
+
+def somef_importable():
+    # Looked up without importing it, SoMEF is only imported by the workers
+    return importlib.util.find_spec("somef") is not None
+
+def select_backend(backend="auto", timeout=None):
+    """Returns the backend to run, raises ValueError when the one asked for cannot be used"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown SoMEF backend {backend}, expected one of {', '.join(BACKENDS)}")
+    if backend == "auto":
+        return "inprocess" if timeout is None and somef_importable() else "subprocess"
+    if backend == "inprocess":
+        if timeout is not None:
+            raise ValueError("a timeout needs the subprocess backend, an in-process extraction cannot be abandoned")
+        if not somef_importable():
+            raise ValueError("SoMEF cannot be imported in this environment")
+    return backend
+
+def load_somef_cli():
+    """Imports SoMEF's describe entry point, once per process"""
+    return importlib.import_module("somef.somef_cli")
+
+def extract_in_process(link, output_file, threshold, job_temp, keep_tmp=False, timeout=None):
+    """Runs SoMEF's describe on one repository in this worker process, returns the job outcome like extract_repository"""
+    print(f"Extracting: {link}")
+    somef_cli = load_somef_cli()
+
+    start = time.time()
+    try:
+        # Same as 'somef describe -r link -o output_file -t threshold -p -m [-kt job_temp]'
+        somef_cli.run_cli(threshold=float(threshold), repo_url=link, output=output_file, pretty=True, missing=True,
+                          keep_tmp=job_temp if keep_tmp else None)
+        exit_code = 0
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else 1
+    except Exception as e:
+        print(f"SoMEF failed on {link}: {e}")
+        exit_code = 1
+
+    return {
+        "github_url": link,
+        "output_file": output_file,
+        "status": "done" if exit_code == 0 and os.path.exists(output_file) else "failed",
+        "exit_code": exit_code,
+        "duration": round(time.time() - start, 3)
+    }
+
+def failed_outcome(task):
+    link, output_file = task[:2]
+    return {"github_url": link, "output_file": output_file, "status": "failed", "exit_code": None, "duration": 0.0}
+
+def extraction_pool(backend, jobs):
+    if backend == "inprocess":
+        # Each worker imports SoMEF when it starts and keeps it for every repository it extracts
+        return ProcessPoolExecutor(max_workers=max(1, jobs), initializer=load_somef_cli)
+    # Extraction mostly waits on the network and on the SoMEF subprocess, so threads are enough
+    return ThreadPoolExecutor(max_workers=max(1, jobs))
+
+def pool_outcomes(backend, jobs, tasks):
+    """Extracts tasks on a pool of this run, yields (position, outcome) as they finish"""
+    extract = extract_in_process if backend == "inprocess" else extract_repository
+    with extraction_pool(backend, jobs) as executor:
+        futures = {executor.submit(extract, *task): position for position, task in enumerate(tasks)}
+        for future in as_completed(futures):
+            position = futures[future]
+            try:
+                outcome = future.result()
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for its memory), its repositories count as failed
+                outcome = failed_outcome(tasks[position])
+            yield position, dict(outcome, backend=backend)
+
+def run_somef_on_links(json_file, output_dir, threshold, temp, jobs=1, timeout=None, keep_tmp=False, resume=False, progress=None, backend="auto", queue=None, shard=None):
+    """Extracts every repository of json_file, returns the outcome of each job
+
+    progress(done, total) is called whenever a repository is finished.
+    With queue, the path of a somef_queue, the repositories are queued for
+    the warm workers of 'quantify somef-worker' instead, and jobs and backend
+    are up to them.
+    With shard, (i, n) as returned by parse_shard, only the repositories of
+    shard i are extracted.
+    Raises ValueError when the backend asked for cannot be used, see select_backend.
+    """
+    if queue is None:
+        backend = select_backend(backend, timeout)
     os.makedirs(output_dir, exist_ok=True)
-    
+
     with open(json_file, 'r') as file:
-        data = json.load(file)
-    
+        data = json_backend.load(file)
+
+    manifest_file = manifest_path(output_dir)
+    manifest = load_manifest(manifest_file)
+    version = get_somef_version()
+
+    tasks = []
+    skipped = 0
     for i, entry in enumerate(data):
         link = entry.get('github_url')
         if link:
-            print(f"Extracting: {link}")
+            if shard is not None and shard_of(link, shard[1]) != shard[0]:
+                continue
+
             output_file = os.path.join(output_dir, f"output_{i+1}.json")
-            command = f"somef describe -r {link} -o {output_file} -t {threshold} -p -m"
-            subprocess.run(command, shell=True)
+
+            if resume and is_complete(manifest.get(link), output_file):
+                skipped += 1
+                continue
+
+            job_temp = os.path.join(temp, f"job_{i+1}")
+            tasks.append((link, output_file, threshold, job_temp, keep_tmp, timeout))
+
+    if shard is not None:
+        print(f"Shard {shard[0]}/{shard[1]}: {len(tasks) + skipped} of {len(data)} repositories")
+    if skipped:
+        print(f"Resuming: skipping {skipped} repositories that were already extracted")
+
+    if queue is not None:
+        # Imported here, somef_queue imports this module
+        from quantify.somef_queue import queue_outcomes
+        finished = queue_outcomes(queue, tasks)
+    else:
+        finished = pool_outcomes(backend, jobs, tasks)
+
+    outcomes = {}
+    for done, (position, outcome) in enumerate(finished, 1):
+        outcomes[position] = outcome
+        manifest[outcome["github_url"]] = {
+            "output_file": os.path.basename(outcome["output_file"]),
+            "status": outcome["status"],
+            "duration": outcome["duration"],
+            "somef_version": version,
+            "exit_code": outcome["exit_code"],
+            "backend": outcome["backend"]
+        }
+        if shard is not None:
+            manifest[outcome["github_url"]]["shard"] = f"{shard[0]}/{shard[1]}"
+        save_manifest(manifest_file, manifest)
+        if progress is not None:
+            progress(done, len(tasks))
+
+    outcomes = [outcomes[position] for position in range(len(tasks))]
+
+    failed = [outcome for outcome in outcomes if outcome["status"] != "done"]
+    print(f"Extracted {len(outcomes) - len(failed)} of {len(outcomes)} repositories")
+    for outcome in failed:
+        print(f"{outcome['status'].capitalize()}: {outcome['github_url']}")
+
+    return outcomes
+
+def merge_shards(shard_dirs, output_dir):
+    """Copies the outputs of the shard output directories into output_dir and merges their manifests into its own
+
+    A repository extracted by one shard wins over a failed attempt of
+    another, so shards rerun with --resume or with another n merge too.
+    Returns the merged manifest; raises ValueError when a shard has no
+    manifest or two shards give an output file to different repositories,
+    i.e. were not run on the same repository list.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_file = manifest_path(output_dir)
+    merged = load_manifest(manifest_file)
+    owners = {entry["output_file"]: link for link, entry in merged.items()}
+
+    for shard_dir in shard_dirs:
+        shard_manifest = load_manifest(manifest_path(shard_dir))
+        if not shard_manifest:
+            raise ValueError(f"No run manifest for {shard_dir}, expected {manifest_path(shard_dir)}")
+
+        for link, entry in shard_manifest.items():
+            file_name = entry["output_file"]
+            owner = owners.get(file_name)
+            if owner is not None and owner != link:
+                raise ValueError(f"{file_name} is {owner} in one shard and {link} in {shard_dir}, were the shards run on the same list?")
+
+            source = os.path.join(shard_dir, file_name)
+            done = is_complete(entry, source)
+            if entry.get("status") == "done" and not done:
+                # Listed as done but its output is gone or truncated, --resume extracts it again
+                entry = dict(entry, status="failed")
+            current = merged.get(link)
+            if current is not None and current.get("status") == "done" and not done:
+                continue
+
+            destination = os.path.join(output_dir, file_name)
+            if done and os.path.abspath(source) != os.path.abspath(destination):
+                shutil.copyfile(source, destination)
+            merged[link] = entry
+            owners[file_name] = link
+
+    save_manifest(manifest_file, merged)
+    return merged
 
 
 if __name__ == "__main__":
-    pass
\ No newline at end of file
+    pass
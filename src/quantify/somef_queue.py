@@ -0,0 +1,318 @@
+import os
+import time
+import uuid
+import signal
+import socket
+import sqlite3
+import multiprocessing
+from contextlib import contextmanager
+
+from quantify.run_somef import extract_in_process, extract_repository, failed_outcome, load_somef_cli, somef_importable
+
+"""
+This script keeps SoMEF warm between runs. 'quantify somef-worker' starts
+long-lived worker processes that import SoMEF and its models once, then pull
+repository jobs from a SQLite queue, e.g.
+
+    quantify somef-worker --queue ~/.cache/quantify/somef_queue.sqlite --workers 4
+
+'quantify somef --queue' only enqueues its repositories and waits for them,
+so several clusters and ad-hoc runs share the same warm workers instead of
+each loading SoMEF again. The queue is a SQLite file like the SWH cache:
+claiming a job is one IMMEDIATE transaction, so any number of workers and
+daemons can share it.
+
+A job with a timeout is run with 'somef describe' in a subprocess, the only
+kind of extraction that can be abandoned. The daemon restarts a worker that
+dies and puts the job it was running back in the queue, up to MAX_ATTEMPTS
+times. Interrupting a waiting 'quantify somef --queue' cancels the jobs of
+its batch that have not started, and so does finding no live worker for
+HEARTBEAT_SECONDS: those repositories count as failed, --resume retries them.
+"""
+DEFAULT_QUEUE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "quantify", "somef_queue.sqlite")
+POLL_SECONDS = 1.0
+# A worker that neither polled nor runs a job for this long is not counted as alive
+HEARTBEAT_SECONDS = 30
+MAX_ATTEMPTS = 2
+FINISHED = ("done", "failed", "timeout")
+
+class JobQueue:
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Shared by several processes: autocommit with explicit transactions, and waiting on locks instead of failing
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, batch TEXT NOT NULL, github_url TEXT NOT NULL, output_file TEXT NOT NULL, "
+            "threshold TEXT NOT NULL, job_temp TEXT NOT NULL, keep_tmp INTEGER NOT NULL, timeout REAL, "
+            "status TEXT NOT NULL DEFAULT 'queued', attempts INTEGER NOT NULL DEFAULT 0, worker TEXT, backend TEXT, "
+            "exit_code INTEGER, duration REAL, enqueued_at REAL NOT NULL, started_at REAL, finished_at REAL);"
+            "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);"
+            "CREATE INDEX IF NOT EXISTS jobs_batch ON jobs (batch, status);"
+            "CREATE TABLE IF NOT EXISTS workers (worker TEXT PRIMARY KEY, backend TEXT NOT NULL, heartbeat REAL NOT NULL);"
+        )
+
+    @contextmanager
+    def transaction(self):
+        # IMMEDIATE takes the write lock up front, so two workers never claim the same job
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.connection
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        self.connection.execute("COMMIT")
+
+    def enqueue(self, tasks, batch=None):
+        """Queues the (link, output_file, threshold, job_temp, keep_tmp, timeout) tasks of run_somef_on_links
+
+        Returns the batch they were queued under and their job ids, in task order.
+        """
+        batch = batch or uuid.uuid4().hex
+        now = time.time()
+        job_ids = []
+        with self.transaction() as connection:
+            for link, output_file, threshold, job_temp, keep_tmp, timeout in tasks:
+                cursor = connection.execute(
+                    "INSERT INTO jobs (batch, github_url, output_file, threshold, job_temp, keep_tmp, timeout, enqueued_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (batch, link, os.path.abspath(output_file), str(threshold), os.path.abspath(job_temp), int(keep_tmp), timeout, now)
+                )
+                job_ids.append(cursor.lastrowid)
+        return batch, job_ids
+
+    def claim(self, worker, backend):
+        """Marks the oldest queued job as running on worker, returns (job_id, task) or None when the queue is empty"""
+        with self.transaction() as connection:
+            row = connection.execute(
+                "SELECT id, github_url, output_file, threshold, job_temp, keep_tmp, timeout FROM jobs "
+                "WHERE status = 'queued' ORDER BY id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, backend = ?, started_at = ?, attempts = attempts + 1 WHERE id = ?",
+                (worker, backend, time.time(), row[0])
+            )
+        job_id, link, output_file, threshold, job_temp, keep_tmp, timeout = row
+        return job_id, (link, output_file, threshold, job_temp, bool(keep_tmp), timeout)
+
+    def finish(self, job_id, outcome):
+        with self.transaction() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, exit_code = ?, duration = ?, finished_at = ? WHERE id = ?",
+                (outcome["status"], outcome["exit_code"], outcome["duration"], time.time(), job_id)
+            )
+
+    def release(self, worker):
+        """The jobs a gone worker was running go back to the queue, or fail once they used MAX_ATTEMPTS"""
+        with self.transaction() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = 'failed', finished_at = ? WHERE worker = ? AND status = 'running' AND attempts >= ?",
+                (time.time(), worker, MAX_ATTEMPTS)
+            )
+            released = connection.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL WHERE worker = ? AND status = 'running'", (worker,)
+            ).rowcount
+            connection.execute("DELETE FROM workers WHERE worker = ?", (worker,))
+        return released
+
+    def running_workers(self):
+        return [row[0] for row in self.connection.execute("SELECT DISTINCT worker FROM jobs WHERE status = 'running'")]
+
+    def heartbeat(self, worker, backend):
+        with self.transaction() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO workers (worker, backend, heartbeat) VALUES (?, ?, ?)", (worker, backend, time.time())
+            )
+
+    def remove_worker(self, worker):
+        with self.transaction() as connection:
+            connection.execute("DELETE FROM workers WHERE worker = ?", (worker,))
+
+    def live_workers(self):
+        """Workers that polled the queue lately or are running a job"""
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM workers WHERE heartbeat > ? OR worker IN (SELECT worker FROM jobs WHERE status = 'running')",
+            (time.time() - HEARTBEAT_SECONDS,)
+        ).fetchone()[0]
+
+    def finished(self, batch):
+        """Returns {job_id: outcome} for the finished jobs of batch"""
+        rows = self.connection.execute(
+            f"SELECT id, github_url, output_file, status, exit_code, duration, backend FROM jobs "
+            f"WHERE batch = ? AND status IN ({', '.join('?' * len(FINISHED))})",
+            (batch, *FINISHED)
+        )
+        return {
+            job_id: {"github_url": link, "output_file": output_file, "status": status, "exit_code": exit_code,
+                     "duration": duration if duration is not None else 0.0, "backend": backend}
+            for job_id, link, output_file, status, exit_code, duration, backend in rows
+        }
+
+    def cancel(self, batch):
+        """Drops the jobs of batch that no worker started yet"""
+        with self.transaction() as connection:
+            return connection.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE batch = ? AND status = 'queued'", (time.time(), batch)
+            ).rowcount
+
+    def close(self):
+        self.connection.close()
+
+def worker_name(pid=None):
+    return f"{socket.gethostname()}:{pid or os.getpid()}"
+
+def queue_outcomes(path, tasks, poll=None):
+    """Enqueues tasks and yields (position, outcome) as the workers finish them, like the pools of run_somef_on_links"""
+    if not tasks:
+        return
+
+    queue = JobQueue(path)
+    batch, job_ids = queue.enqueue(tasks)
+    positions = {job_id: position for position, job_id in enumerate(job_ids)}
+
+    if queue.live_workers() == 0:
+        print(f"No SoMEF worker is running on {path} yet, start one with: quantify somef-worker --queue {path}")
+
+    pending = set(job_ids)
+    idle_since = None
+    try:
+        while pending:
+            for job_id, outcome in queue.finished(batch).items():
+                if job_id in pending:
+                    pending.discard(job_id)
+                    yield positions[job_id], outcome
+            if not pending:
+                break
+
+            if queue.live_workers():
+                idle_since = None
+            elif idle_since is None:
+                idle_since = time.monotonic()
+            elif time.monotonic() - idle_since >= HEARTBEAT_SECONDS:
+                break
+            time.sleep(poll or POLL_SECONDS)
+
+        if pending:
+            # Nobody works on the queue, waiting longer would hang the run
+            queue.cancel(batch)
+            print(f"No SoMEF worker took jobs from {path} for {HEARTBEAT_SECONDS}s, "
+                  f"{len(pending)} repositories not extracted")
+            finished = queue.finished(batch)
+            for job_id in sorted(pending):
+                outcome = finished.get(job_id) or dict(failed_outcome(tasks[positions[job_id]]), backend=None)
+                pending.discard(job_id)
+                yield positions[job_id], outcome
+    finally:
+        # Interrupted while waiting, the workers need not extract what nobody waits for anymore
+        if pending:
+            queue.cancel(batch)
+        queue.close()
+
+def worker_loop(path, stop, poll=None):
+    """Runs in a worker process: imports SoMEF once, then extracts queued repositories until stop is set"""
+    # Ctrl+C and a service manager's SIGTERM reach the whole process group, the
+    # daemon stops its workers itself once their current repository is extracted
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+    in_process = somef_importable()
+    if in_process:
+        load_somef_cli()
+    backend = "inprocess" if in_process else "subprocess"
+
+    worker = worker_name()
+    queue = JobQueue(path)
+    try:
+        while not stop.is_set():
+            queue.heartbeat(worker, backend)
+            job = queue.claim(worker, backend)
+            if job is None:
+                stop.wait(poll or POLL_SECONDS)
+                continue
+
+            job_id, task = job
+            timeout = task[-1]
+            # Only a subprocess can be abandoned after the timeout; it gets a session of its
+            # own so the signals meant for the daemon do not reach it either
+            if in_process and timeout is None:
+                outcome = extract_in_process(*task)
+            else:
+                outcome = extract_repository(*task, new_session=True)
+            queue.finish(job_id, outcome)
+    finally:
+        queue.remove_worker(worker)
+        queue.close()
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def release_orphans(queue):
+    """Puts back the jobs left running by workers of this host that are gone, e.g. after the daemon was killed"""
+    host = socket.gethostname()
+    released = 0
+    for worker in queue.running_workers():
+        worker_host, _, pid = worker.rpartition(":")
+        if worker_host == host and pid.isdigit() and not pid_alive(int(pid)):
+            released += queue.release(worker)
+    return released
+
+def interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+def serve(path=DEFAULT_QUEUE_PATH, workers=1, poll=None, stop=None):
+    """Keeps workers processes extracting jobs from the queue at path until interrupted or stop is set"""
+    queue = JobQueue(path)
+    released = release_orphans(queue)
+    if released:
+        print(f"Put {released} jobs of stopped workers back in the queue")
+
+    context = multiprocessing.get_context()
+    stop = stop or context.Event()
+    # SIGTERM (e.g. from systemd) stops the daemon like Ctrl+C; setting stop from the
+    # handler could deadlock on the lock of the stop.wait it interrupts
+    previous_handler = signal.signal(signal.SIGTERM, interrupt)
+
+    def start_worker():
+        process = context.Process(target=worker_loop, args=(path, stop, poll))
+        process.start()
+        return process
+
+    processes = [start_worker() for _ in range(max(1, workers))]
+    print(f"{len(processes)} SoMEF workers waiting for jobs on {path}")
+
+    try:
+        while not stop.is_set():
+            for slot, process in enumerate(processes):
+                if process.is_alive():
+                    continue
+                # The job of a crashed worker is retried on another one
+                released = queue.release(worker_name(process.pid))
+                print(f"SoMEF worker {process.pid} stopped with exit code {process.exitcode}, "
+                      f"{released} jobs back in the queue, starting a new worker")
+                processes[slot] = start_worker()
+            stop.wait(poll or POLL_SECONDS)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        print("Stopping the SoMEF workers once their current repository is extracted...")
+        for process in processes:
+            process.join()
+        queue.close()
+        signal.signal(signal.SIGTERM, previous_handler)
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,87 @@
+import unittest
+import os
+import sys
+import json
+import shutil
+import tempfile
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest import mock
+from quantify import cli, metrics
+from quantify import somef_queue
+from quantify.rqs_scripts import swh_cache
+from quantify.benchmarks import bench_import, bench_pipeline
+
+class TestCliFunction(unittest.TestCase):
+
+    """Test suite for the startup of the quantify CLI"""
+###################################################################
+    def test_import_is_lazy(self):
+        """Test that importing the CLI in a fresh interpreter loads none of the modules its commands import on dispatch"""
+        self.assertEqual(bench_import.heavy_imports("quantify.cli"), [])
+
+    def test_import_time_is_measured(self):
+        """Test that the import time of the CLI is read from python -X importtime"""
+        milliseconds, rows = bench_import.import_time("quantify.cli", repeat=1)
+        self.assertGreater(milliseconds, 0)
+        self.assertIn("quantify.metrics", [name for name, self_us, cumulative_us in rows])
+
+    def test_defaults_match_modules(self):
+        """Test that the defaults the parser repeats are the ones of the modules it does not import"""
+        self.assertEqual(cli.DEFAULT_CACHE_PATH, swh_cache.DEFAULT_CACHE_PATH)
+        self.assertEqual(cli.DEFAULT_TTL_DAYS, swh_cache.DEFAULT_TTL_DAYS)
+        self.assertEqual(cli.DEFAULT_QUEUE_PATH, somef_queue.DEFAULT_QUEUE_PATH)
+        self.assertEqual(cli.BENCH_SOURCE, bench_pipeline.DEFAULT_SOURCE)
+        self.assertEqual(cli.BENCH_STAGES, bench_pipeline.STAGES)
+
+    def test_unreadable_repository_list(self):
+        """Test that rqs still saves RQ1, RQ3-RQ5 and counts an error when the RQ2 repository list cannot be read"""
+        temp_dir = tempfile.mkdtemp()
+        try:
+            somef_dir = os.path.join(temp_dir, 'somef_outputs')
+            os.makedirs(somef_dir)
+            with open(os.path.join(somef_dir, 'output_1.json'), 'w') as f:
+                json.dump({"somef_missing_categories": ["citation"]}, f)
+            output_dir = os.path.join(temp_dir, 'rq_results')
+            metrics_file = os.path.join(temp_dir, 'metrics.json')
+
+            argv = ["quantify", "rqs", "-s", somef_dir, "-i", os.path.join(temp_dir, 'missing.json'), "-o", output_dir,
+                    "--swh-cache", os.path.join(temp_dir, 'swh_cache.sqlite'), "--metrics-out", metrics_file]
+            with mock.patch.object(sys, 'argv', argv), redirect_stdout(StringIO()):
+                cli.main()
+
+            self.assertIn("analysis_default_rq5.json", os.listdir(output_dir))
+            self.assertNotIn("analysis_default_rq2.json", os.listdir(output_dir))
+            with open(metrics_file, 'r') as f:
+                stages = json.load(f)["stages"]
+            self.assertEqual([stage["errors"] for stage in stages if stage["stage"] == "swh"], [1])
+        finally:
+            metrics.disable()
+            shutil.rmtree(temp_dir)
+
+    def test_calculate_missing_analysis_files(self):
+        """Test that calculate counts every missing analysis file once"""
+        temp_dir = tempfile.mkdtemp()
+        try:
+            input_file = os.path.join(temp_dir, 'repos.json')
+            with open(input_file, 'w') as f:
+                json.dump([{"github_url": "https://github.com/foo/one"}], f)
+            rq_results_dir = os.path.join(temp_dir, 'rq_results')
+            os.makedirs(rq_results_dir)
+            metrics_file = os.path.join(temp_dir, 'metrics.json')
+
+            argv = ["quantify", "calculate", "-i", input_file, "-r", rq_results_dir, "-o", os.path.join(temp_dir, 'final_results'),
+                    "--metrics-out", metrics_file]
+            with mock.patch.object(sys, 'argv', argv), redirect_stdout(StringIO()):
+                cli.main()
+
+            with open(metrics_file, 'r') as f:
+                stages = json.load(f)["stages"]
+            errors = {stage["labels"]["rq"]: stage["errors"] for stage in stages}
+            self.assertEqual(errors, {"rq1": 1, "rq2": 1, "rq3": 2, "rq4": 1, "rq5": 1})
+        finally:
+            metrics.disable()
+            shutil.rmtree(temp_dir)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+import os
+import json
+import tempfile
+import shutil
+from quantify import clusters
+
+class TestClustersFunction(unittest.TestCase):
+
+    """Here I'm creating temporary files and clearing them after the test"""
+    def setUp(self):
+
+        self.temp_input_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+
+        shutil.rmtree(self.temp_input_dir)
+
+    def create_test_json_file(self, filename, content):
+        """This is a method to create test JSON files"""
+        file_path = os.path.join(self.temp_input_dir, filename)
+        with open(file_path, 'w') as f:
+            json.dump(content, f)
+        return file_path
+###################################################################
+    def test_load_clusters(self):
+        """This is for testing that clusters keep the manifest order and paths are relative to the manifest"""
+        manifest = self.create_test_json_file('clusters.json', {
+            "rsd": {"somef_dir": "output_rsd", "input_repos": "repos_rsd.json"},
+            "envri": {"index": "/data/envri_index.json.gz"}
+        })
+
+        loaded = clusters.load_clusters(manifest)
+
+        self.assertEqual([entry["cluster"] for entry in loaded], ["rsd", "envri"])
+        self.assertEqual(loaded[0]["somef_dir"], os.path.join(self.temp_input_dir, "output_rsd"))
+        self.assertEqual(loaded[0]["input_repos"], os.path.join(self.temp_input_dir, "repos_rsd.json"))
+        self.assertIsNone(loaded[0]["index"])
+        self.assertEqual(loaded[1]["index"], "/data/envri_index.json.gz")
+        self.assertIsNone(loaded[1]["somef_dir"])
+
+    def test_invalid_manifest(self):
+        """This is for testing that clusters without SoMEF outputs or with unknown keys are refused"""
+        for content in ([], {"rsd": {"input_repos": "repos.json"}}, {"rsd": {"somef_dir": "out", "somef": "typo"}}):
+            manifest = self.create_test_json_file('clusters.json', content)
+            with self.assertRaises(ValueError):
+                clusters.load_clusters(manifest)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import os
+import json
+import tempfile
+import shutil
+from quantify.benchmarks import corpus
+from quantify.rqs_scripts import rq1, rq3, rq4, rq5, scan
+
+class TestCorpusFunction(unittest.TestCase):
+
+    """Here I'm creating temporary files and clearing them after the test"""
+    def setUp(self):
+
+        self.temp_input_dir = tempfile.mkdtemp()
+        self.temp_output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+
+        shutil.rmtree(self.temp_input_dir)
+        shutil.rmtree(self.temp_output_dir)
+
+    def create_test_json_file(self, filename, content):
+        """This is a method to create test JSON files"""
+        file_path = os.path.join(self.temp_input_dir, filename)
+        with open(file_path, 'w') as f:
+            json.dump(content, f)
+        return file_path
+###################################################################
+    def test_generate_corpus(self):
+        """This is for testing that the synthetic corpus follows the profile of the source corpus"""
+        self.create_test_json_file('output_1.json', {
+            "license": [{"result": {"name": "MIT License", "spdx_id": "MIT"}}],
+            "releases": [{"result": {"tag": "v1.0.0"}}],
+            "somef_missing_categories": ["citation"]
+        })
+        self.create_test_json_file('output_2.json', {
+            "license": [{"result": {"name": "Apache License 2.0", "spdx_id": "Apache-2.0"}}],
+            "somef_missing_categories": ["citation", "releases"]
+        })
+
+        profile = corpus.corpus_profile(self.temp_input_dir)
+        self.assertEqual(profile["files"], 2)
+        self.assertEqual(profile["categories"]["license"]["rate"], 1.0)
+        self.assertEqual(profile["categories"]["releases"]["rate"], 0.5)
+
+        corpus.generate_corpus(profile, self.temp_output_dir, 20, seed=1)
+        files = sorted(os.listdir(self.temp_output_dir))
+        self.assertEqual(files, sorted(f"output_{number}.json" for number in range(1, 21)))
+
+        for file_name in files:
+            with open(os.path.join(self.temp_output_dir, file_name), 'r') as f:
+                data = json.load(f)
+            self.assertIn(data["license"], profile["categories"]["license"]["values"])
+            self.assertEqual("releases" in data, "releases" not in data["somef_missing_categories"])
+            self.assertIn("citation", data["somef_missing_categories"])
+
+        result_rq1, result_rq3, result_rq4, result_rq5 = scan.scan(self.temp_output_dir, 'somef_missing_categories', [rq1, rq3, rq4, rq5])
+        self.assertEqual(result_rq1["license"]["count"], 20)
+
+        corpus.generate_corpus(profile, os.path.join(self.temp_output_dir, 'again'), 20, seed=1)
+        with open(os.path.join(self.temp_output_dir, 'output_7.json'), 'r') as f, open(os.path.join(self.temp_output_dir, 'again', 'output_7.json'), 'r') as g:
+            self.assertEqual(f.read(), g.read())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+import os
+import json
+import tempfile
+import shutil
+from quantify import count_results
+from quantify.rqs_scripts import rq1, rq3, rq4, rq5, scan
+
+class TestCountResultsFunction(unittest.TestCase):
+
+    """Here I'm creating temporary files and clearing them after the test"""
+    def setUp(self):
+
+        self.temp_input_dir = tempfile.mkdtemp()
+        self.temp_output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+
+        shutil.rmtree(self.temp_input_dir)
+        shutil.rmtree(self.temp_output_dir)
+
+    def create_test_json_file(self, filename, content):
+        """This is a method to create test JSON files"""
+        file_path = os.path.join(self.temp_input_dir, filename)
+        with open(file_path, 'w') as f:
+            json.dump(content, f)
+        return file_path
+
+    def read_calculation(self, directory, rq_name, cluster):
+        with open(os.path.join(directory, 'calculations', rq_name, f'{rq_name}_results_{cluster}.json'), 'r') as f:
+            return f.read()
+###################################################################
+    def test_in_memory_matches_files(self):
+        """This is for testing that calculating from results in memory writes what calculating from the analysis files writes"""
+        self.create_test_json_file('output_1.json', {
+            "citation": [{"result": {"format": "cff"}, "source": "https://example.org/CITATION.cff"}],
+            "identifier": [{"result": {"value": "https://doi.org/10.5281/zenodo.1234"}}],
+            "license": [{"result": {"name": "MIT License", "spdx_id": "MIT"}}],
+            "releases": [{"result": {"tag": "v1.0.0"}}, {"result": {"tag": "v1.1.0"}}]
+        })
+        self.create_test_json_file('output_2.json', {
+            "releases": [{"result": {"tag": "2024.01"}}],
+            "somef_missing_categories": ["license", "citation"]
+        })
+        cluster, repo_count = 'test', 3
+        files_dir = os.path.join(self.temp_output_dir, 'files')
+        memory_dir = os.path.join(self.temp_output_dir, 'memory')
+
+        result_rq1, result_rq3, result_rq4, result_rq5 = scan.scan(self.temp_input_dir, 'somef_missing_categories', [rq1, rq3, rq4, rq5])
+        consistency = rq3.process_versions(self.temp_input_dir, result_rq3)
+        result_rq2 = {"results": [], "summary": {"count_in_swh": 2, "count_not_in_swh": 1}}
+
+        rq1.save_results(files_dir, result_rq1, f'analysis_{cluster}_rq1.json')
+        with open(os.path.join(files_dir, f'analysis_{cluster}_rq2.json'), 'w') as f:
+            json.dump(result_rq2, f)
+        rq3.save_results(files_dir, result_rq3, consistency, f'class_{cluster}_rq3.json', f'const_{cluster}_rq3.json')
+        rq4.save_results(files_dir, result_rq4, f'analysis_{cluster}_rq4.json')
+        rq5.save_results(files_dir, result_rq5, f'analysis_{cluster}_rq5.json')
+
+        doi, _ = count_results.count_rq1(files_dir, cluster, repo_count)
+        count_results.count_rq2(files_dir, cluster, doi, repo_count)
+        count_results.count_rq3(files_dir, cluster, repo_count)
+        count_results.count_rq4(files_dir, cluster, repo_count)
+        count_results.count_rq5(files_dir, cluster, repo_count)
+
+        calculation_rq1 = count_results.calculate_rq1(result_rq1, cluster, repo_count)
+        count_results.save_calculation(memory_dir, 'rq1', cluster, calculation_rq1)
+        count_results.save_calculation(memory_dir, 'rq2', cluster, count_results.calculate_rq2(result_rq2, cluster, calculation_rq1[cluster]['zenodo_doi'], repo_count))
+        count_results.save_calculation(memory_dir, 'rq3', cluster, count_results.calculate_rq3(result_rq3, consistency, cluster, repo_count))
+        count_results.save_calculation(memory_dir, 'rq4', cluster, count_results.calculate_rq4(result_rq4, cluster, repo_count))
+        count_results.save_calculation(memory_dir, 'rq5', cluster, count_results.calculate_rq5(result_rq5, cluster, repo_count))
+
+        for rq_name in ('rq1', 'rq2', 'rq3', 'rq4', 'rq5'):
+            self.assertEqual(self.read_calculation(memory_dir, rq_name, cluster), self.read_calculation(files_dir, rq_name, cluster))
+        self.assertFalse(os.path.exists(os.path.join(memory_dir, f'analysis_{cluster}_rq1.json')))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+import os
+import json
+import tempfile
+import shutil
+from unittest import mock
+from quantify import cli
+from quantify.rqs_scripts import scan, feature_index
+
+class TestFeatureIndexFunction(unittest.TestCase):
+
+    """Here I'm creating temporary files and clearing them after the test"""
+    def setUp(self):
+
+        self.temp_input_dir = tempfile.mkdtemp()
+        self.temp_output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+
+        shutil.rmtree(self.temp_input_dir)
+        shutil.rmtree(self.temp_output_dir)
+
+    def create_test_json_file(self, filename, content):
+        """This is a method to create test JSON files"""
+        file_path = os.path.join(self.temp_input_dir, filename)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'w') as f:
+            json.dump(content, f, indent=2)
+        return file_path
+
+    def create_test_corpus(self):
+        self.create_test_json_file('output_1.json', {
+            "citation": [{"result": {"format": "cff"}, "source": "https://example.org/CITATION.cff"}],
+            "license": [{"result": {"name": "MIT License", "spdx_id": "MIT"}, "source": "https://example.org/codemeta.json"}],
+            "releases": [{"result": {"tag": "v1.0.0"}}, {"result": {"tag": "v1.1.0"}}],
+            "description": [{"technique": "GitHub_API", "source": "https://example.org/README.md"}]
+        })
+        self.create_test_json_file('output_2.json', {
+            "citation": [{"result": {"format": "bibtex"}}],
+            "readme_url": [{"result": {"value": "https://example.org/README.md"}}],
+            "somef_missing_categories": ["license", "releases", "description"]
+        })
+        self.create_test_json_file(os.path.join('nested', 'output_3.json'), {
+            "license": [{"result": {"name": "Other"}}]
+        })
+###################################################################
+    def test_index_matches_scan(self):
+        """This is for testing that every RQ recomputed from the index equals a scan of the directory"""
+        self.create_test_corpus()
+        missing_key = 'somef_missing_categories'
+        index_path = os.path.join(self.temp_output_dir, 'index.json.gz')
+
+        feature_index.save_index(feature_index.build_index(self.temp_input_dir, missing_key), index_path)
+        index = feature_index.load_index(index_path, missing_key)
+
+        expected = scan.scan(self.temp_input_dir, missing_key, feature_index.VISITORS)
+        recomputed = [feature_index.aggregate(index, visitor) for visitor in feature_index.VISITORS]
+        self.assertEqual(json.dumps(recomputed), json.dumps(expected))
+
+    def test_feature_columns(self):
+        """This is for testing the readable per-repository feature columns"""
+        self.create_test_corpus()
+        index = feature_index.build_index(self.temp_input_dir, 'somef_missing_categories')
+        columns = index['columns']
+        row = index['files'].index('output_1.json')
+
+        self.assertEqual(len(index['files']), 3)
+        self.assertTrue(columns['has_cff'][row])
+        self.assertTrue(columns['has_codemeta'][row])
+        self.assertEqual(columns['spdx_id'][row], 'MIT')
+        self.assertEqual(columns['release_tags'][row], ['v1.0.0', 'v1.1.0'])
+        self.assertEqual(columns['description_source'][row], 'readme')
+        self.assertEqual(columns['citation_format'][index['files'].index('output_2.json')], 'bibtex')
+
+    def test_update_parses_only_changed_files(self):
+        """This is for testing that an update parses only new and changed files and drops removed ones"""
+        self.create_test_corpus()
+        missing_key = 'somef_missing_categories'
+        index = feature_index.build_index(self.temp_input_dir, missing_key)
+
+        self.create_test_json_file('output_2.json', {"citation": [{"result": {"format": "cff"}}]})
+        self.create_test_json_file('output_4.json', {"license": [{"result": {"name": "MIT License", "spdx_id": "MIT"}}]})
+        os.remove(os.path.join(self.temp_input_dir, 'nested', 'output_3.json'))
+        # Touched without being modified, the hash keeps it from being parsed again
+        os.utime(os.path.join(self.temp_input_dir, 'output_1.json'), ns=(0, 0))
+
+        with mock.patch.object(scan, 'load_somef_output', wraps=scan.load_somef_output) as load:
+            updated, stats = feature_index.update_index(index, self.temp_input_dir)
+            parsed = sorted(os.path.basename(call.args[0]) for call in load.call_args_list)
+
+        self.assertEqual(parsed, ['output_2.json', 'output_4.json'])
+        self.assertEqual(stats, {"kept": 1, "parsed": 2, "removed": 1})
+
+        rebuilt = feature_index.build_index(self.temp_input_dir, missing_key)
+        self.assertEqual(updated['files'], rebuilt['files'])
+        self.assertEqual(json.dumps(updated['columns']), json.dumps(rebuilt['columns']))
+
+        again, stats = feature_index.update_index(updated, self.temp_input_dir)
+        self.assertEqual(stats, {"kept": 3, "parsed": 0, "removed": 0})
+
+    def test_wrong_missing_key(self):
+        """This is for testing that an index built with another missing key is refused"""
+        self.create_test_corpus()
+        index_path = os.path.join(self.temp_output_dir, 'index.json')
+        feature_index.save_index(feature_index.build_index(self.temp_input_dir, 'somef_missing_categories'), index_path)
+
+        with self.assertRaises(ValueError):
+            feature_index.load_index(index_path, 'other_key')
+
+    def test_unreadable_index_is_rebuilt(self):
+        """This is for testing that an index that is not gzip or was cut short is rebuilt instead of failing"""
+        self.create_test_corpus()
+        missing_key = 'somef_missing_categories'
+        index_path = os.path.join(self.temp_output_dir, 'index.json.gz')
+        feature_index.save_index(feature_index.build_index(self.temp_input_dir, missing_key), index_path)
+        self.assertEqual(os.listdir(self.temp_output_dir), ['index.json.gz'])
+
+        with open(index_path, 'rb') as f:
+            saved = f.read()
+        for broken in (b'{"version": ', saved[:len(saved) // 2]):
+            with open(index_path, 'wb') as f:
+                f.write(broken)
+            index = cli.refresh_index(index_path, self.temp_input_dir, missing_key)
+            self.assertEqual(len(index['files']), 3)
+            self.assertEqual(len(feature_index.load_index(index_path, missing_key)['files']), 3)
+
+if __name__ == '__main__':
+    unittest.main()
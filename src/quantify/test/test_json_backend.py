@@ -0,0 +1,52 @@
+import unittest
+import json
+from quantify import json_backend
+
+class TestJSONBackendFunction(unittest.TestCase):
+
+    """Test suite for the pluggable JSON backend, run against every backend installed here"""
+    def setUp(self):
+        self.previous = json_backend.BACKEND
+        self.backends = [backend for backend in json_backend.BACKENDS if json_backend.select_backend(backend) == backend]
+        self.documents = [
+            {"citation.cff": {"count": 3, "files": ["output_1.json"]}, "None": {"count": 0}},
+            {"versions": [{"output_1.json": ["v1.0.0", "2024.01"]}], "empty": [], "nested": {"empty": {}}},
+            {"author": "Núñez   😀 \x7f", "control": "\x01\t\n", "quote": "\"\\/"},
+            {"percentages": [12.5, 100.0, 0.1 + 0.2, 1e16, 1e-05, -0.0], "flags": [True, False, None]},
+            {1: "non string key"},
+            {"big": 2 ** 70},
+            {"ratios": [float("nan"), float("inf"), -float("inf")]}
+        ]
+
+    def tearDown(self):
+        json_backend.use_backend(self.previous)
+###################################################################
+    def test_dumps_matches_json(self):
+        """Test that every backend writes exactly what json writes"""
+        for backend in self.backends:
+            self.assertEqual(json_backend.use_backend(backend), backend)
+            for document in self.documents:
+                for indent in (0, 2, 3, 4):
+                    self.assertEqual(json_backend.dumps(document, indent=indent), json.dumps(document, indent=indent))
+                self.assertEqual(json_backend.dumps(document), json.dumps(document, separators=(",", ":")))
+
+    def test_round_trip(self):
+        """Test that loads reads str and bytes, and what dumps_bytes writes"""
+        for backend in self.backends:
+            json_backend.use_backend(backend)
+            for document in self.documents[:4]:
+                text = json.dumps(document, indent=2)
+                self.assertEqual(json_backend.loads(text), document)
+                self.assertEqual(json_backend.loads(text.encode()), document)
+                self.assertEqual(json_backend.loads(json_backend.dumps_bytes(document)), document)
+
+            with self.assertRaises(ValueError):
+                json_backend.loads('{"broken": ')
+
+    def test_unknown_backend_falls_back(self):
+        """Test that asking for a backend that is not installed picks an available one"""
+        self.assertIn(json_backend.select_backend("not_a_backend"), self.backends)
+        self.assertEqual(json_backend.select_backend("json"), "json")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+import os
+import json
+import tempfile
+import shutil
+from quantify import metrics
+
+class TestMetricsFunction(unittest.TestCase):
+
+    """Here I'm creating a temporary directory for the metrics files and clearing it after the test"""
+    def setUp(self):
+
+        self.temp_output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+
+        metrics.disable()
+        shutil.rmtree(self.temp_output_dir)
+###################################################################
+    def test_stages_are_recorded(self):
+        """This is for testing that every stage is recorded with its counters, failed ones included"""
+        with metrics.stage("scan") as counters:
+            counters["files"] += 1
+        self.assertFalse(metrics.enabled())
+
+        metrics.enable("rqs")
+        with metrics.stage("scan", cluster="envri", rq=None) as counters:
+            counters["files"] += 2
+            counters["bytes_read"] += 100
+        with self.assertRaises(RuntimeError):
+            with metrics.stage("calculate", cluster='en"vri', rq="rq1") as counters:
+                counters["errors"] += 1
+                raise RuntimeError("boom")
+
+        json_path = os.path.join(self.temp_output_dir, 'metrics.json')
+        metrics.save(json_path)
+        with open(json_path, 'r') as f:
+            report = json.load(f)
+
+        self.assertEqual(report["command"], "rqs")
+        scan, calculate = report["stages"]
+        self.assertEqual((scan["stage"], scan["labels"], scan["files"], scan["bytes_read"], scan["failed"]), ("scan", {"cluster": "envri"}, 2, 100, 0))
+        self.assertEqual((calculate["errors"], calculate["failed"]), (1, 1))
+        self.assertGreater(scan["peak_rss_bytes"], 0)
+        self.assertGreaterEqual(scan["wall_seconds"], 0)
+
+        prom_path = os.path.join(self.temp_output_dir, 'metrics.prom')
+        metrics.save(prom_path)
+        with open(prom_path, 'r') as f:
+            text = f.read()
+
+        self.assertIn('quantify_stage_files{command="rqs",stage="scan",cluster="envri"} 2\n', text)
+        self.assertIn('quantify_stage_failed{command="rqs",stage="calculate",cluster="en\\"vri",rq="rq1"} 1\n', text)
+        self.assertEqual(sorted(os.listdir(self.temp_output_dir)), ['metrics.json', 'metrics.prom'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import os
+import json
+import tempfile
+import shutil
+import pstats
+from quantify import profiling
+from quantify.rqs_scripts import rq1, rq4, scan
+
+class TestProfilingFunction(unittest.TestCase):
+
+    """Here I'm creating temporary files and clearing them after the test"""
+    def setUp(self):
+
+        self.temp_input_dir = tempfile.mkdtemp()
+        self.temp_output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+
+        profiling.disable()
+        shutil.rmtree(self.temp_input_dir)
+        shutil.rmtree(self.temp_output_dir)
+
+    def create_test_json_file(self, filename, content):
+        """This is a method to create test JSON files"""
+        file_path = os.path.join(self.temp_input_dir, filename)
+        with open(file_path, 'w') as f:
+            json.dump(content, f)
+        return file_path
+###################################################################
+    def test_profiled_stages(self):
+        """This is for testing that every profiled stage leaves a .pstats file and a summary naming the RQ functions"""
+        self.create_test_json_file('output_1.json', {"license": [{"result": {"name": "MIT License", "spdx_id": "MIT"}}]})
+
+        with profiling.profiled("scan", cluster="test"):
+            pass
+        self.assertEqual(os.listdir(self.temp_output_dir), [])
+
+        self.assertEqual(profiling.enable(self.temp_output_dir, top=50), "cProfile")
+        with profiling.profiled("scan", cluster="test"):
+            scan.scan(self.temp_input_dir, 'somef_missing_categories', [rq1, rq4])
+        with profiling.profiled("calculate", cluster="test", rq="rq1"):
+            pass
+
+        self.assertEqual(sorted(os.listdir(self.temp_output_dir)), [
+            '01_scan_test.pstats', '01_scan_test.txt', '02_calculate_test_rq1.pstats', '02_calculate_test_rq1.txt'
+        ])
+        stats = pstats.Stats(os.path.join(self.temp_output_dir, '01_scan_test.pstats'))
+        self.assertIn('visit', {function for file_name, line, function in stats.stats})
+
+        with open(os.path.join(self.temp_output_dir, '01_scan_test.txt'), 'r') as f:
+            summary = f.read()
+        self.assertTrue(summary.startswith('scan cluster=test'))
+        self.assertIn('rq4.py', summary)
+        self.assertEqual(len(profiling.written_files()), 2)
+
+if __name__ == '__main__':
+    unittest.main()
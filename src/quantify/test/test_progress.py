@@ -0,0 +1,63 @@
+import io
+import unittest
+from unittest import mock
+from quantify import progress
+
+class TestProgressFunction(unittest.TestCase):
+
+    """Test suite for the progress lines of the CLI stages"""
+###################################################################
+    def test_log_lines_when_not_a_terminal(self):
+        """Test that a batch log gets periodic lines with done/total, throughput and ETA, and a last line with the duration"""
+        stream = io.StringIO()
+        with mock.patch.object(progress, 'LOG_INTERVAL', 0):
+            with progress.task("Scanning...", stream=stream):
+                for done in range(1, 5):
+                    progress.update(done, 4)
+
+        lines = stream.getvalue().splitlines()
+        self.assertNotIn("\r", stream.getvalue())
+        self.assertTrue(lines[0].startswith("Scanning... 1/4 (25%)"))
+        self.assertIn("files/s ETA", lines[0])
+        self.assertTrue(lines[-1].startswith("Scanning... Done! 0.0s, 4 files"))
+
+    def test_log_lines_are_throttled(self):
+        """Test that updates coming faster than LOG_INTERVAL only print the last line"""
+        stream = io.StringIO()
+        with progress.task("Running RQ2...", unit="repositories", stream=stream):
+            for done in range(1, 1001):
+                progress.update(done, 1000)
+
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertIn("1000 repositories", lines[0])
+
+    def test_terminal_line_is_redrawn(self):
+        """Test that on a terminal the line of the stage is redrawn in place and ended once"""
+        stream = io.StringIO()
+        with mock.patch.object(progress, 'REDRAW_INTERVAL', 0):
+            reporter = progress.Reporter("Indexing...", stream=stream, interactive=True)
+            reporter.update(50, 200)
+            reporter.update(100)
+            reporter.finish()
+
+        output = stream.getvalue()
+        self.assertIn("\rIndexing... 50/200 (25%)", output)
+        self.assertIn("\rIndexing... 100/200 (50%)", output)
+        self.assertEqual(output.count("\n"), 1)
+        self.assertTrue(output.endswith("\n"))
+
+    def test_update_outside_of_a_task(self):
+        """Test that the callback does nothing when no stage is running, and a failed stage says so"""
+        progress.update(1, 2)
+
+        stream = io.StringIO()
+        with self.assertRaises(ValueError):
+            with progress.task("Calculating...", stream=stream):
+                raise ValueError("broken")
+        self.assertTrue(stream.getvalue().startswith("Calculating... Failed"))
+        self.assertEqual(progress.format_duration(3909), "1:05:09")
+        self.assertIsNone(progress.ACTIVE)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+from quantify.benchmarks import regression
+
+class TestRegressionFunction(unittest.TestCase):
+
+    """Test suite for comparing pipeline benchmark reports with a baseline"""
+    def report(self, calibration_seconds, stages):
+        return {
+            "files": 100,
+            "bytes": 1000,
+            "calibration_seconds": calibration_seconds,
+            "rows": [{"stage": stage, "seconds": seconds, "peak_rss_mb": peak_rss, "calibration_seconds": calibration_seconds}
+                     for stage, (seconds, peak_rss) in stages.items()]
+        }
+###################################################################
+    def test_compare_is_calibrated(self):
+        """Test that a machine twice as slow passes, and a stage twice as slow on the same machine fails"""
+        baseline = regression.make_baseline(self.report(0.1, {"scan": (1.0, 50.0), "count": (0.5, 40.0), "tiny": (0.001, 40.0)}))
+
+        slower_machine = self.report(0.2, {"scan": (2.0, 50.0), "count": (1.0, 40.0), "tiny": (0.002, 40.0)})
+        self.assertFalse(any(row["regressed"] for row in regression.compare(slower_machine, baseline)))
+
+        slower_scan = self.report(0.1, {"scan": (2.0, 50.0), "count": (0.5, 100.0), "tiny": (0.01, 40.0), "new": (1.0, 40.0)})
+        rows = {row["stage"]: row for row in regression.compare(slower_scan, baseline, threshold=0.25, memory_threshold=0.5)}
+        self.assertEqual(set(rows), {"scan", "count", "tiny"})
+        self.assertTrue(rows["scan"]["regressed"])
+        self.assertAlmostEqual(rows["scan"]["time_ratio"], 2.0)
+        self.assertTrue(rows["count"]["regressed"])
+        self.assertFalse(rows["tiny"]["regressed"])
+
+        # The time of a short stage is not gated, its memory is
+        more_memory = self.report(0.1, {"tiny": (0.001, 100.0)})
+        self.assertTrue(regression.compare(more_memory, baseline)[0]["regressed"])
+
+        self.assertFalse(any(row["regressed"] for row in regression.compare(slower_scan, baseline, threshold=1.5, memory_threshold=2.0)))
+
+    def test_compare_needs_same_corpus(self):
+        """Test that a report measured on another corpus is not compared"""
+        baseline = regression.make_baseline(self.report(0.1, {"scan": (1.0, 50.0)}))
+        other = self.report(0.1, {"scan": (1.0, 50.0)})
+        other["files"] = 200
+
+        with self.assertRaises(ValueError):
+            regression.compare(other, baseline)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import os
+import json
+import tempfile
+import shutil
+from datetime import datetime, timezone
+from quantify.rqs_scripts import release_timeline
+
+class TestReleaseTimelineFunction(unittest.TestCase):
+
+    """Here I'm creating temporary files and clearing them after the test"""
+    def setUp(self):
+
+        self.temp_input_dir = tempfile.mkdtemp()
+        self.temp_output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+
+        shutil.rmtree(self.temp_input_dir)
+        shutil.rmtree(self.temp_output_dir)
+
+    def create_test_json_file(self, filename, content):
+        """This is a method to create test JSON files"""
+        file_path = os.path.join(self.temp_input_dir, filename)
+        with open(file_path, 'w') as f:
+            json.dump(content, f)
+        return file_path
+###################################################################
+    def test_release_cadence(self):
+        """This is for testing the release count, median interval and last release age of every repository"""
+        self.create_test_json_file('output_1.json', {
+            "releases": [
+                {"result": {"tag": "v1.2.0", "date_published": "2024-01-31T00:00:00Z", "description": "Long release notes"}},
+                {"result": {"tag": "v1.0.0", "date_created": "2024-01-01T00:00:00Z"}},
+                {"result": {"tag": "v1.1.0", "date_published": "2024-01-11T00:00:00Z"}},
+                {"result": {"tag": "nightly"}}
+            ]
+        })
+        self.create_test_json_file('output_2.json', {"releases": [{"result": {"tag": "v0.1", "date_published": "not a date"}}]})
+        self.create_test_json_file('output_3.json', {"releases": [], "somef_missing_categories": ["releases"]})
+
+        result = release_timeline.release_timeline(self.temp_input_dir, 'somef_missing_categories')
+        table = release_timeline.timeline_table(result, datetime(2024, 3, 1, tzinfo=timezone.utc))
+        rows = {row[0]: dict(zip(table["columns"], row)) for row in table["rows"]}
+
+        self.assertEqual(set(rows), {'output_1.json', 'output_2.json'})
+        self.assertEqual(rows['output_1.json'], {
+            "file": "output_1.json",
+            "release_count": 4,
+            "dated_count": 3,
+            "median_interval_days": 15.0,
+            "first_release": "2024-01-01T00:00:00Z",
+            "last_release": "2024-01-31T00:00:00Z",
+            "last_release_age_days": 30.0
+        })
+        self.assertEqual(rows['output_2.json']["dated_count"], 0)
+        self.assertIsNone(rows['output_2.json']["last_release_age_days"])
+        self.assertEqual(table["summary"]["repos"], 2)
+        self.assertEqual(table["summary"]["repos_with_dates"], 1)
+        self.assertEqual(table["as_of"], "2024-03-01T00:00:00Z")
+
+        release_timeline.save_results(self.temp_output_dir, table, 'timeline_test_rq3.json')
+        with open(os.path.join(self.temp_output_dir, 'timeline_test_rq3.json'), 'r') as f:
+            self.assertEqual(json.load(f), table)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,8 +3,44 @@ import os
 import json
 import tempfile
 import shutil
+import threading
+import time
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from quantify.rqs_scripts import rq2
 
+class FakeSWHHandler(BaseHTTPRequestHandler):
+    """Stands in for the SWH origin API: "archived" repos exist, "limited" ones are rate limited once"""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(self.path)
+            server.clients.add(self.client_address)
+            first_try = self.path not in server.seen
+            server.seen.add(self.path)
+
+        headers = {"X-RateLimit-Remaining": "100", "X-RateLimit-Reset": str(int(time.time()) + 3600)}
+        if "limited" in self.path and first_try:
+            status = 429
+            headers = {"Retry-After": "1"}
+        elif "archived" in self.path or "limited" in self.path:
+            status = 200
+        else:
+            status = 404
+
+        body = b"{}"
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
 class TestRQ2Function(unittest.TestCase):
 
     """Here I'm creating temporary files and clearing them after the test"""
@@ -65,6 +101,90 @@ class TestRQ2Function(unittest.TestCase):
         self.assertIn('swh', result)
         self.assertIn('summary', result['swh'])
 
-        
+
+    def test_swh_local_server(self):
+        """This is for testing concurrent lookups, connection reuse and rate limit handling against a local server"""
+        server = ThreadingHTTPServer(("127.0.0.1", 0), FakeSWHHandler)
+        server.lock = threading.Lock()
+        server.requests = []
+        server.clients = set()
+        server.seen = set()
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+
+        try:
+            test_data = [{"github_url": f"https://github.com/foo/archived-{i}"} for i in range(6)]
+            test_data += [
+                {"github_url": "https://github.com/foo/missing"},
+                {"community": "no url"},
+                {"github_url": "https://github.com/foo/limited"}
+            ]
+            input_file = self.create_test_json_file('repos_test.json', test_data)
+            endpoint = f"http://127.0.0.1:{server.server_address[1]}/api/1/origin/"
+
+            rq2.rq2(input_file, "", 'test_output_swh_rq2.json', self.temp_output_dir, concurrency=2, endpoint=endpoint)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        with open(os.path.join(self.temp_output_dir, 'test_output_swh_rq2.json'), 'r') as f:
+            result = json.load(f)
+
+        # Results keep the input order even though lookups run concurrently
+        self.assertEqual([entry["github_link"] for entry in result["results"]], [entry["github_url"] for entry in test_data if "github_url" in entry])
+        self.assertEqual(result["summary"]["count_in_swh"], 7)
+        self.assertEqual(result["summary"]["count_not_in_swh"], 1)
+
+        # The rate limited repository was retried after Retry-After instead of being reported missing
+        self.assertEqual(len(server.requests), 9)
+        # Keep-alive: never more connections than lookup threads
+        self.assertLessEqual(len(server.clients), 2)
+
+    def test_rate_limit_headers(self):
+        """This is for testing that an exhausted quota pauses until X-RateLimit-Reset"""
+        rate_limit = rq2.RateLimit()
+        response = rq2.requests.Response()
+        response.status_code = 200
+        response.headers["X-RateLimit-Remaining"] = "0"
+        response.headers["X-RateLimit-Reset"] = str(time.time() + 120)
+
+        self.assertFalse(rate_limit.update(response))
+        self.assertGreater(rate_limit.resume_at, time.time() + 100)
+
+        response.status_code = 429
+        response.headers["Retry-After"] = "30"
+        self.assertTrue(rate_limit.update(response))
+
+    def test_malformed_rate_limit_headers(self):
+        """This is for testing that unreadable rate limit headers fall back to the default wait instead of raising"""
+        rate_limit = rq2.RateLimit()
+        response = rq2.requests.Response()
+        response.status_code = 200
+        response.headers["X-RateLimit-Remaining"] = "lots"
+        response.headers["X-RateLimit-Reset"] = "soon"
+        self.assertFalse(rate_limit.update(response))
+        self.assertEqual(rate_limit.resume_at, 0.0)
+
+        response.headers["X-RateLimit-Remaining"] = "0"
+        self.assertFalse(rate_limit.update(response))
+        self.assertGreater(rate_limit.resume_at, time.time() + rq2.DEFAULT_RETRY_SECONDS - 10)
+
+        response.status_code = 429
+        response.headers["Retry-After"] = "in a while"
+        self.assertEqual(rq2.retry_after(response), rq2.DEFAULT_RETRY_SECONDS)
+        response.headers["Retry-After"] = "1.5"
+        self.assertEqual(rq2.retry_after(response), 1.5)
+
+    def test_check_swh_presence_sessions(self):
+        """This is for testing that a lookup closes the session it made for itself but leaves a given one open"""
+        with mock.patch.object(rq2, 'query_swh', return_value=(True, 200)), \
+                mock.patch.object(rq2.requests.Session, 'close', autospec=True) as close:
+            self.assertTrue(rq2.check_swh_presence("https://github.com/foo/own", ""))
+            self.assertEqual(close.call_count, 1)
+
+            session = rq2.create_session("")
+            self.assertTrue(rq2.check_swh_presence("https://github.com/foo/shared", "", session))
+            self.assertEqual(close.call_count, 1)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
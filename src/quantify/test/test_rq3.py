@@ -245,6 +245,44 @@ class TestRQ3Function(unittest.TestCase):
             const_result = json.load(f)
         self.assertIn('summary', const_result)
 
+###################################################################
+    def test_classify_versions_batch(self):
+        """Test that the batch classifier matches one call per tag and reuses repeated tags"""
+        versions = ["v1.0.0", "2024.01", "latest", "release 1", "v1.0.0", "latest"]
+        rq3.classify_version.cache_clear()
+
+        classifications = rq3.classify_versions(versions)
+
+        self.assertEqual(classifications, ["Semantic", "Calendar", "Alphanumeric", "Other", "Semantic", "Alphanumeric"])
+        self.assertEqual(rq3.classify_version.cache_info().hits, 2)
+        self.assertEqual(rq3.classify_versions([]), [])
+
+###################################################################
+    def test_parse_version_components(self):
+        """Test that parse_version classifies like classify_version and returns the parsed components"""
+        self.assertEqual(rq3.parse_version("v2.0.1-beta"), ("Semantic", {"major": 2, "minor": 0, "patch": 1, "pre": "beta"}))
+        self.assertEqual(rq3.parse_version("2024.01"), ("Calendar", {"year": 2024, "month": 1, "day_or_minor": None, "micro": None, "modifier": None}))
+        self.assertEqual(rq3.parse_version("latest"), ("Alphanumeric", {}))
+        self.assertEqual(rq3.parse_version("release 1"), ("Other", {}))
+
+        for version in ["1.2.3", "2024.13", "24-03-rc1", "1.2.3.4", "v1.2", "2024_01_15_2"]:
+            self.assertEqual(rq3.parse_version(version)[0], rq3.classify_version(version))
+
+###################################################################
+    def test_process_versions_without_annotation(self):
+        """Test that the consistency summary is the same when the per-tag classifications are not written back"""
+        self.create_test_json_file('output_1.json', {"releases": [{"result": {"tag": "v1.0.0"}}, {"result": {"tag": "v1.1.0"}}]})
+        self.create_test_json_file('output_2.json', {"releases": [{"result": {"tag": "2024.01"}}, {"result": {"tag": "latest"}}]})
+        self.create_test_json_file('output_3.json', {"releases": [{"result": {"tag": "release 1"}}]})
+
+        annotated = rq3.rq3(self.temp_input_dir, 'somef_missing_categories')
+        plain = rq3.rq3(self.temp_input_dir, 'somef_missing_categories')
+        tags = json.loads(json.dumps(plain['releases']['versions']))
+
+        self.assertEqual(rq3.process_versions(self.temp_input_dir, plain, annotate=False), rq3.process_versions(self.temp_input_dir, annotated))
+        self.assertEqual(plain['releases']['versions'], tags)
+        self.assertEqual(annotated['releases']['versions'][1]['output_2.json'][1], {"version": "latest", "classification": "Alphanumeric"})
+
 ##################################################
 
 if __name__ == '__main__':
@@ -0,0 +1,246 @@
+import unittest
+import os
+import sys
+import json
+import stat
+import tempfile
+import shutil
+from unittest import mock
+from quantify import run_somef
+
+# Stands in for the somef CLI: writes its TMPDIR into the output file, "slow" repositories hang
+FAKE_SOMEF = """#!{python}
+import os, sys, time, json
+args = sys.argv[1:]
+repo = args[args.index("-r") + 1]
+output = args[args.index("-o") + 1]
+if os.environ.get("SOMEF_CALLS"):
+    with open(os.environ["SOMEF_CALLS"], "a") as f:
+        f.write(repo + "\\n")
+if "slow" in repo:
+    time.sleep(30)
+if "broken" in repo:
+    sys.exit(1)
+with open(output, "w") as f:
+    json.dump({{"repo": repo, "tmpdir": os.environ.get("TMPDIR")}}, f)
+"""
+
+# Stands in for SoMEF's describe entry point: every import is recorded, "broken" repositories raise
+FAKE_SOMEF_CLI = """import os, json
+with open(os.environ["SOMEF_IMPORTS"], "a") as f:
+    f.write(str(os.getpid()) + "\\n")
+
+def run_cli(threshold=0.8, repo_url=None, output=None, pretty=False, missing=False, keep_tmp=None, **kwargs):
+    if "broken" in repo_url:
+        raise RuntimeError("cannot describe " + repo_url)
+    with open(output, "w") as f:
+        json.dump({"repo": repo_url, "threshold": threshold, "pid": os.getpid()}, f)
+"""
+
+class TestRunSomefFunction(unittest.TestCase):
+
+    """Here I'm creating temporary files and clearing them after the test"""
+    def setUp(self):
+
+        self.temp_input_dir = tempfile.mkdtemp()
+        self.temp_output_dir = tempfile.mkdtemp()
+        self.temp_bin_dir = tempfile.mkdtemp()
+
+        somef_path = os.path.join(self.temp_bin_dir, "somef")
+        with open(somef_path, 'w') as f:
+            f.write(FAKE_SOMEF.format(python=sys.executable))
+        os.chmod(somef_path, os.stat(somef_path).st_mode | stat.S_IEXEC)
+
+        path = self.temp_bin_dir + os.pathsep + os.environ.get("PATH", "")
+        self.path_patch = mock.patch.dict(os.environ, {"PATH": path})
+        self.path_patch.start()
+
+    def tearDown(self):
+
+        self.path_patch.stop()
+        shutil.rmtree(self.temp_input_dir)
+        shutil.rmtree(self.temp_output_dir)
+        shutil.rmtree(self.temp_bin_dir)
+
+    def create_test_json_file(self, filename, content):
+        """This is a method to create test JSON files"""
+        file_path = os.path.join(self.temp_input_dir, filename)
+        with open(file_path, 'w') as f:
+            json.dump(content, f)
+        return file_path
+###################################################################
+    def test_concurrent_extraction(self):
+        """This is for testing that jobs run concurrently, each in its own temp directory"""
+        test_data = [
+            {"github_url": "https://github.com/foo/one"},
+            {"github_url": "https://github.com/foo/two"},
+            {"community": "no url"},
+            {"github_url": "https://github.com/foo/three"}
+        ]
+        input_file = self.create_test_json_file('repos_test.json', test_data)
+        temp = os.path.join(self.temp_input_dir, 'tmp')
+
+        outcomes = run_somef.run_somef_on_links(input_file, self.temp_output_dir, "0.8", temp, jobs=3, backend="subprocess")
+
+        self.assertEqual([outcome["status"] for outcome in outcomes], ["done"] * 3)
+        self.assertEqual(sorted(os.listdir(self.temp_output_dir)), ["output_1.json", "output_2.json", "output_4.json"])
+
+        tmpdirs = set()
+        for outcome in outcomes:
+            with open(outcome["output_file"], 'r') as f:
+                tmpdirs.add(json.load(f)["tmpdir"])
+        self.assertEqual(len(tmpdirs), 3)
+
+    def test_timeout_and_failure(self):
+        """This is for testing that a hung or failing repository does not stop the batch"""
+        test_data = [
+            {"github_url": "https://github.com/foo/slow"},
+            {"github_url": "https://github.com/foo/broken"},
+            {"github_url": "https://github.com/foo/fine"}
+        ]
+        input_file = self.create_test_json_file('repos_test.json', test_data)
+        temp = os.path.join(self.temp_input_dir, 'tmp')
+
+        outcomes = run_somef.run_somef_on_links(input_file, self.temp_output_dir, "0.8", temp, jobs=2, timeout=1, backend="subprocess")
+
+        self.assertEqual([outcome["status"] for outcome in outcomes], ["timeout", "failed", "done"])
+        self.assertEqual(outcomes[1]["exit_code"], 1)
+        self.assertTrue(os.path.exists(os.path.join(self.temp_output_dir, "output_3.json")))
+
+    def test_manifest_and_resume(self):
+        """This is for testing that a resumed run skips finished repositories and retries failed ones"""
+        test_data = [
+            {"github_url": "https://github.com/foo/one"},
+            {"github_url": "https://github.com/foo/broken"},
+            {"github_url": "https://github.com/foo/three"}
+        ]
+        input_file = self.create_test_json_file('repos_test.json', test_data)
+        temp = os.path.join(self.temp_input_dir, 'tmp')
+        output_dir = os.path.join(self.temp_output_dir, 'somef_outputs')
+        calls_file = os.path.join(self.temp_input_dir, 'calls.txt')
+
+        with mock.patch.dict(os.environ, {"SOMEF_CALLS": calls_file}):
+            run_somef.run_somef_on_links(input_file, output_dir, "0.8", temp, backend="subprocess")
+
+            manifest_file = os.path.join(self.temp_output_dir, 'somef_outputs_manifest.json')
+            with open(manifest_file, 'r') as f:
+                manifest = json.load(f)
+            self.assertEqual(manifest["https://github.com/foo/one"]["status"], "done")
+            self.assertEqual(manifest["https://github.com/foo/one"]["output_file"], "output_1.json")
+            self.assertEqual(manifest["https://github.com/foo/broken"]["status"], "failed")
+            self.assertEqual(manifest["https://github.com/foo/broken"]["exit_code"], 1)
+
+            # A truncated output is not trusted even when the manifest says it is done
+            with open(os.path.join(output_dir, 'output_3.json'), 'w') as f:
+                f.write('{"repo": ')
+
+            os.remove(calls_file)
+            run_somef.run_somef_on_links(input_file, output_dir, "0.8", temp, resume=True, backend="subprocess")
+
+        with open(calls_file, 'r') as f:
+            calls = f.read().split()
+        self.assertEqual(sorted(calls), ["https://github.com/foo/broken", "https://github.com/foo/three"])
+
+    def test_resume_after_list_changed(self):
+        """This is for testing that resume does not take another repository's output at the same position for done"""
+        temp = os.path.join(self.temp_input_dir, 'tmp')
+        output_dir = os.path.join(self.temp_output_dir, 'somef_outputs')
+        calls_file = os.path.join(self.temp_input_dir, 'calls.txt')
+
+        first = self.create_test_json_file('repos_first.json', [{"github_url": "https://github.com/foo/one"}, {"github_url": "https://github.com/foo/two"}])
+        run_somef.run_somef_on_links(first, output_dir, "0.8", temp, backend="subprocess")
+
+        # An output left by a run without a manifest is not trusted either
+        with open(os.path.join(output_dir, 'output_3.json'), 'w') as f:
+            json.dump({"repo": "https://github.com/foo/old"}, f)
+
+        second = self.create_test_json_file('repos_second.json', [
+            {"github_url": "https://github.com/foo/two"},
+            {"github_url": "https://github.com/foo/one"},
+            {"github_url": "https://github.com/foo/three"}
+        ])
+        with mock.patch.dict(os.environ, {"SOMEF_CALLS": calls_file}):
+            run_somef.run_somef_on_links(second, output_dir, "0.8", temp, resume=True, backend="subprocess")
+
+        with open(calls_file, 'r') as f:
+            calls = f.read().split()
+        self.assertEqual(sorted(calls), ["https://github.com/foo/one", "https://github.com/foo/three", "https://github.com/foo/two"])
+        with open(os.path.join(output_dir, 'output_1.json'), 'r') as f:
+            self.assertEqual(json.load(f)["repo"], "https://github.com/foo/two")
+
+    def test_in_process_backend(self):
+        """This is for testing that the in-process backend imports SoMEF once per job, not once per repository"""
+        package_dir = os.path.join(self.temp_bin_dir, 'site', 'somef')
+        os.makedirs(package_dir)
+        open(os.path.join(package_dir, '__init__.py'), 'w').close()
+        with open(os.path.join(package_dir, 'somef_cli.py'), 'w') as f:
+            f.write(FAKE_SOMEF_CLI)
+
+        test_data = [{"github_url": f"https://github.com/foo/repo{i}"} for i in range(6)]
+        test_data.append({"github_url": "https://github.com/foo/broken"})
+        input_file = self.create_test_json_file('repos_test.json', test_data)
+        temp = os.path.join(self.temp_input_dir, 'tmp')
+        imports_file = os.path.join(self.temp_input_dir, 'imports.txt')
+
+        with mock.patch.object(sys, 'path', [os.path.dirname(package_dir)] + sys.path), \
+             mock.patch.dict(os.environ, {"SOMEF_IMPORTS": imports_file}):
+            self.assertEqual(run_somef.select_backend("auto"), "inprocess")
+            self.assertEqual(run_somef.select_backend("auto", timeout=60), "subprocess")
+            with self.assertRaises(ValueError):
+                run_somef.select_backend("inprocess", timeout=60)
+
+            outcomes = run_somef.run_somef_on_links(input_file, self.temp_output_dir, "0.8", temp, jobs=2, backend="inprocess")
+
+        self.assertEqual([outcome["status"] for outcome in outcomes], ["done"] * 6 + ["failed"])
+        with open(os.path.join(self.temp_output_dir, 'output_1.json'), 'r') as f:
+            self.assertEqual(json.load(f)["threshold"], 0.8)
+        with open(imports_file, 'r') as f:
+            self.assertLessEqual(len(f.read().split()), 2)
+
+    def test_shards_merge_like_unsharded_run(self):
+        """This is for testing that the shards split the list deterministically and merge into the outputs of one run"""
+        test_data = [{"github_url": f"https://github.com/foo/repo{i}"} for i in range(12)]
+        test_data.insert(5, {"community": "no url"})
+        input_file = self.create_test_json_file('repos_test.json', test_data)
+        temp = os.path.join(self.temp_input_dir, 'tmp')
+        links = [entry["github_url"] for entry in test_data if "github_url" in entry]
+
+        self.assertEqual(run_somef.parse_shard("2/3"), (2, 3))
+        for text in ("0/3", "4/3", "2", "a/b"):
+            with self.assertRaises(ValueError):
+                run_somef.parse_shard(text)
+        # Fixed by the URL alone, so every node and interpreter agrees on it
+        self.assertEqual([run_somef.shard_of(link, 3) for link in links], [1, 1, 3, 1, 3, 3, 2, 3, 3, 2, 3, 2])
+
+        shard_dirs = [os.path.join(self.temp_output_dir, f'shard_{i}') for i in range(1, 4)]
+        extracted = []
+        for i, shard_dir in enumerate(shard_dirs, 1):
+            outcomes = run_somef.run_somef_on_links(input_file, shard_dir, "0.8", temp, jobs=2, backend="subprocess", shard=(i, 3))
+            extracted += [outcome["github_url"] for outcome in outcomes]
+        self.assertEqual(sorted(extracted), sorted(links))
+
+        merged_dir = os.path.join(self.temp_output_dir, 'merged')
+        merged = run_somef.merge_shards(shard_dirs, merged_dir)
+
+        single_dir = os.path.join(self.temp_output_dir, 'single')
+        run_somef.run_somef_on_links(input_file, single_dir, "0.8", temp, backend="subprocess")
+        self.assertEqual(sorted(os.listdir(merged_dir)), sorted(os.listdir(single_dir)))
+        self.assertEqual(set(merged), set(links))
+        self.assertEqual({entry["status"] for entry in merged.values()}, {"done"})
+        with open(run_somef.manifest_path(merged_dir), 'r') as f:
+            self.assertEqual(json.load(f), merged)
+
+        # A retried shard replaces the failed attempt, not the other way around
+        failed = dict(merged[links[0]], status="failed", output_file="output_1.json")
+        retry_dir = os.path.join(self.temp_output_dir, 'retry')
+        os.makedirs(retry_dir)
+        run_somef.save_manifest(run_somef.manifest_path(retry_dir), {links[0]: failed})
+        self.assertEqual(run_somef.merge_shards([retry_dir], merged_dir)[links[0]]["status"], "done")
+
+        # Shards of another list give the same output file to other repositories
+        run_somef.save_manifest(run_somef.manifest_path(retry_dir), {"https://github.com/bar/other": failed})
+        with self.assertRaises(ValueError):
+            run_somef.merge_shards([retry_dir], merged_dir)
+
+if __name__ == '__main__':
+    unittest.main()
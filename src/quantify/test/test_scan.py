@@ -0,0 +1,136 @@
+import unittest
+import os
+import json
+import tempfile
+import shutil
+from unittest import mock
+from concurrent.futures import ProcessPoolExecutor
+from quantify.rqs_scripts import rq1, rq3, rq4, rq5, scan
+
+class TestScanFunction(unittest.TestCase):
+
+    """Here I'm creating temporary files and clearing them after the test"""
+    def setUp(self):
+
+        self.temp_input_dir = tempfile.mkdtemp()
+        self.temp_output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+
+        shutil.rmtree(self.temp_input_dir)
+        shutil.rmtree(self.temp_output_dir)
+
+    def create_test_json_file(self, filename, content):
+        """This is a method to create test JSON files"""
+        file_path = os.path.join(self.temp_input_dir, filename)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'w') as f:
+            json.dump(content, f)
+        return file_path
+
+    def create_test_corpus(self):
+        self.create_test_json_file('output_1.json', {
+            "citation": [{"result": {"format": "cff"}, "source": "https://example.org/CITATION.cff"}],
+            "license": [{"result": {"name": "MIT License", "spdx_id": "MIT"}, "source": "https://example.org/codemeta.json"}],
+            "releases": [{"result": {"tag": "v1.0.0"}}, {"result": {"tag": "v1.1.0"}}]
+        })
+        self.create_test_json_file('output_2.json', {
+            "citation": [{"result": {"format": "bibtex"}}],
+            "somef_missing_categories": ["license", "releases"]
+        })
+        self.create_test_json_file(os.path.join('nested', 'output_3.json'), {
+            "license": [{"result": {"name": "Other"}}]
+        })
+###################################################################
+    def test_single_pass_matches_individual_rqs(self):
+        """This is for testing that one scan gives the same results as running each RQ on its own"""
+        self.create_test_corpus()
+        missing_key = 'somef_missing_categories'
+
+        result_rq1, result_rq3, result_rq4, result_rq5 = scan.scan(self.temp_input_dir, missing_key, [rq1, rq3, rq4, rq5])
+
+        rq1.rq1(self.temp_input_dir, missing_key, 'rq1.json', self.temp_output_dir)
+        rq4.rq4(self.temp_input_dir, missing_key, 'rq4.json', self.temp_output_dir)
+        rq5.rq5(self.temp_input_dir, missing_key, 'rq5.json', self.temp_output_dir)
+
+        with open(os.path.join(self.temp_output_dir, 'rq1.json'), 'r') as f:
+            self.assertEqual(result_rq1, json.load(f))
+        with open(os.path.join(self.temp_output_dir, 'rq4.json'), 'r') as f:
+            self.assertEqual(result_rq4, json.load(f))
+        with open(os.path.join(self.temp_output_dir, 'rq5.json'), 'r') as f:
+            self.assertEqual(result_rq5, json.load(f))
+        self.assertEqual(result_rq3, rq3.rq3(self.temp_input_dir, missing_key))
+
+        # RQ4 walks subdirectories, the other RQs only look at the top level
+        self.assertEqual(result_rq4['license']['no_spdx']['count'], 1)
+        self.assertEqual(result_rq1['license']['count'], 1)
+
+    def test_each_file_loaded_once(self):
+        """This is for testing that every SoMEF output is parsed a single time"""
+        self.create_test_corpus()
+
+        with mock.patch.object(scan, 'load_somef_output', wraps=scan.load_somef_output) as loader:
+            scan.scan(self.temp_input_dir, 'somef_missing_categories', [rq1, rq3, rq4, rq5])
+
+        self.assertEqual(loader.call_count, 3)
+
+    def test_parallel_scan_matches_sequential(self):
+        """This is for testing that a process pool gives the same results in the same order"""
+        self.create_test_corpus()
+        for i in range(4, 12):
+            self.create_test_json_file(f'output_{i}.json', {
+                "contributors": [{"result": {"value": "someone"}}],
+                "releases": [{"result": {"tag": f"{i}.0"}}]
+            })
+        missing_key = 'somef_missing_categories'
+
+        sequential = scan.scan(self.temp_input_dir, missing_key, [rq1, rq3, rq4, rq5])
+        parallel = scan.scan(self.temp_input_dir, missing_key, [rq1, rq3, rq4, rq5], workers=3)
+
+        self.assertEqual(json.dumps(sequential), json.dumps(parallel))
+
+    def test_scan_many_matches_scan(self):
+        """This is for testing that clusters scanned on one shared pool get the results of separate scans"""
+        self.create_test_corpus()
+        other_dir = os.path.join(self.temp_output_dir, 'other_cluster')
+        os.makedirs(other_dir)
+        with open(os.path.join(other_dir, 'output_1.json'), 'w') as f:
+            json.dump({"releases": [{"result": {"tag": "2024.01"}}], "readme_url": [{"result": {"value": "README.md"}}]}, f)
+        missing_key = 'somef_missing_categories'
+        visitors = [rq1, rq3, rq4, rq5]
+
+        expected = [scan.scan(directory, missing_key, visitors) for directory in (self.temp_input_dir, other_dir)]
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            shared = scan.scan_many([self.temp_input_dir, other_dir], missing_key, visitors, workers=2, executor=executor)
+
+        self.assertEqual(json.dumps(shared), json.dumps(expected))
+
+    def test_progress_reaches_total(self):
+        """This is for testing that the progress callback counts every file, sequentially and with workers"""
+        self.create_test_corpus()
+        missing_key = 'somef_missing_categories'
+
+        sequential = []
+        scan.scan_many([self.temp_input_dir, self.temp_input_dir], missing_key, [rq1, rq4], progress=lambda done, total: sequential.append((done, total)))
+        self.assertEqual(sequential, [(done, 6) for done in range(1, 7)])
+
+        parallel = []
+        scan.scan(self.temp_input_dir, missing_key, [rq1, rq4], workers=2, progress=lambda done, total: parallel.append((done, total)))
+        self.assertEqual(parallel[-1], (3, 3))
+        self.assertEqual(parallel, sorted(parallel))
+
+    def test_merge_results(self):
+        """This is for testing that partial results are merged by adding counts and joining lists"""
+        result = rq1.new_result()
+        partial = rq1.new_result()
+        partial['package']['count'] = 2
+        partial['package']['files'] = ['output_1.json', 'output_2.json']
+
+        scan.merge_results(result, partial)
+        scan.merge_results(result, partial)
+
+        self.assertEqual(result['package']['count'], 4)
+        self.assertEqual(len(result['package']['files']), 4)
+
+if __name__ == '__main__':
+    unittest.main()
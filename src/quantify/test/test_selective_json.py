@@ -0,0 +1,81 @@
+import unittest
+import json
+from unittest import mock
+from quantify.rqs_scripts import rq1, rq3, rq4, rq5, scan, selective_json
+
+class TestSelectiveJSONFunction(unittest.TestCase):
+
+    """Test suite for decoding only the fields the RQs declare"""
+    def setUp(self):
+        self.document = {
+            "citation": [
+                {"result": {"format": "cff", "value": "cff-version: 1.2.0"}, "source": "https://example.org/CITATION.cff"}
+            ],
+            "license": [
+                {
+                    "confidence": 1,
+                    "result": {"name": "MIT License", "spdx_id": "MIT", "value": "Permission is hereby granted " * 400},
+                    "source": "https://example.org/LICENSE",
+                    "technique": "file_exploration"
+                }
+            ],
+            "releases": [
+                {"result": {"tag": "v1.0.0", "description": "Release notes\n" * 600}},
+                {"result": {"tag": "v1.1.0", "description": "More notes " * 600}}
+            ],
+            "matrix": [[1, 2], [], {}],
+            "key with \"quotes\"": [{"source": "https://example.org/AUTHORS"}],
+            "somef_missing_categories": ["installation"]
+        }
+
+    def declared(self, value, fields):
+        """Keeps only what a spec asks for, so the fast path can be compared with a full decode"""
+        if fields is True:
+            return value
+        if isinstance(value, list):
+            return [self.declared(item, fields) for item in value]
+        if isinstance(value, dict):
+            kept = {}
+            for key, item in value.items():
+                spec = selective_json.merge_fields(fields.get(key), fields.get("*"))
+                if spec is not None:
+                    kept[key] = self.declared(item, spec)
+            return kept
+        return value
+
+###################################################################
+    def test_declared_fields_match_full_decode(self):
+        """Test that every declared field is decoded for pretty printed and compact documents"""
+        specs = [
+            scan.select_fields([rq1, rq3, rq4, rq5], 'somef_missing_categories'),
+            scan.select_fields([rq3], 'somef_missing_categories'),
+            {"matrix": {}, "key with \"quotes\"": {"source": True}},
+        ]
+        layouts = [json.dumps(self.document, indent=2), json.dumps(self.document, indent=4), json.dumps(self.document)]
+
+        # SMALL_VALUE = 0 forces the layout walk everywhere instead of decoding small values whole
+        for small_value in (0, selective_json.SMALL_VALUE):
+            with mock.patch.object(selective_json, 'SMALL_VALUE', small_value):
+                for fields in specs:
+                    for text in layouts:
+                        selected = selective_json.loads_selected(text, fields)
+                        self.assertEqual(self.declared(selected, fields), self.declared(self.document, fields))
+
+    def test_heavy_fields_are_skipped(self):
+        """Test that license texts and release notes are not decoded when no RQ needs them"""
+        text = json.dumps(self.document, indent=2)
+        fields = {"license": {"result": {"spdx_id": True}}, "releases": {"result": {"tag": True}}}
+
+        selected = selective_json.loads_selected(text, fields)
+
+        self.assertEqual(selected["license"][0]["result"], {"spdx_id": "MIT"})
+        self.assertEqual([release["result"] for release in selected["releases"]], [{"tag": "v1.0.0"}, {"tag": "v1.1.0"}])
+        self.assertNotIn("citation", selected)
+
+    def test_no_fields_decodes_everything(self):
+        """Test that without a spec the whole document is returned"""
+        text = json.dumps(self.document, indent=2)
+        self.assertEqual(selective_json.loads_selected(text), self.document)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+import unittest
+import os
+import sys
+import json
+import tempfile
+import shutil
+import signal
+import multiprocessing
+from unittest import mock
+from quantify import run_somef, somef_queue
+
+# Stands in for SoMEF's describe entry point: every import is recorded, "crash" repositories kill their worker
+FAKE_SOMEF_CLI = """import os, json
+with open(os.environ["SOMEF_IMPORTS"], "a") as f:
+    f.write(str(os.getpid()) + "\\n")
+
+def run_cli(threshold=0.8, repo_url=None, output=None, pretty=False, missing=False, keep_tmp=None, **kwargs):
+    if "crash" in repo_url:
+        os._exit(1)
+    with open(output, "w") as f:
+        json.dump({"repo": repo_url, "pid": os.getpid()}, f)
+"""
+
+class TestSomefQueueFunction(unittest.TestCase):
+
+    """Here I'm creating temporary files and clearing them after the test"""
+    def setUp(self):
+
+        self.temp_input_dir = tempfile.mkdtemp()
+        self.temp_output_dir = tempfile.mkdtemp()
+        self.queue_path = os.path.join(self.temp_input_dir, 'queue', 'somef_queue.sqlite')
+        self.imports_file = os.path.join(self.temp_input_dir, 'imports.txt')
+
+        package_dir = os.path.join(self.temp_input_dir, 'site', 'somef')
+        os.makedirs(package_dir)
+        open(os.path.join(package_dir, '__init__.py'), 'w').close()
+        with open(os.path.join(package_dir, 'somef_cli.py'), 'w') as f:
+            f.write(FAKE_SOMEF_CLI)
+
+        self.patches = [
+            mock.patch.object(sys, 'path', [os.path.dirname(package_dir)] + sys.path),
+            mock.patch.dict(os.environ, {"SOMEF_IMPORTS": self.imports_file}),
+            mock.patch.object(somef_queue, 'POLL_SECONDS', 0.05)
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+
+        for patch in self.patches:
+            patch.stop()
+        shutil.rmtree(self.temp_input_dir)
+        shutil.rmtree(self.temp_output_dir)
+
+    def create_test_json_file(self, filename, content):
+        """This is a method to create test JSON files"""
+        file_path = os.path.join(self.temp_input_dir, filename)
+        with open(file_path, 'w') as f:
+            json.dump(content, f)
+        return file_path
+
+    def start_daemon(self, workers):
+        context = multiprocessing.get_context()
+        stop = context.Event()
+        daemon = context.Process(target=somef_queue.serve, args=(self.queue_path, workers), kwargs={"stop": stop})
+        daemon.start()
+        return daemon, stop
+###################################################################
+    def test_claim_and_release(self):
+        """This is for testing that jobs are claimed in order, and that the job of a gone worker is retried once before it fails"""
+        queue = somef_queue.JobQueue(self.queue_path)
+        tasks = [(f"https://github.com/foo/repo{i}", f"output_{i}.json", "0.8", f"job_{i}", False, None) for i in range(3)]
+        batch, job_ids = queue.enqueue(tasks)
+
+        first = queue.claim("host:1", "inprocess")
+        second = queue.claim("host:2", "inprocess")
+        self.assertEqual([first[0], second[0]], job_ids[:2])
+        self.assertEqual(first[1][0], "https://github.com/foo/repo0")
+
+        self.assertEqual(queue.release("host:1"), 1)
+        self.assertEqual(queue.claim("host:3", "inprocess")[0], job_ids[0])
+        queue.release("host:3")
+
+        queue.finish(second[0], {"status": "done", "exit_code": 0, "duration": 1.5})
+        finished = queue.finished(batch)
+        self.assertEqual(finished[job_ids[0]]["status"], "failed")
+        self.assertEqual(finished[job_ids[1]]["status"], "done")
+        self.assertNotIn(job_ids[2], finished)
+
+        self.assertEqual(queue.cancel(batch), 1)
+        self.assertIsNone(queue.claim("host:4", "inprocess"))
+        queue.close()
+
+    def test_runs_share_warm_workers(self):
+        """This is for testing that two runs queued on the same daemon are extracted by workers that imported SoMEF once"""
+        daemon, stop = self.start_daemon(workers=2)
+        try:
+            for cluster in ("envri", "escape"):
+                input_file = self.create_test_json_file(f'repos_{cluster}.json', [{"github_url": f"https://github.com/{cluster}/repo{i}"} for i in range(5)])
+                output_dir = os.path.join(self.temp_output_dir, cluster)
+                outcomes = run_somef.run_somef_on_links(input_file, output_dir, "0.8", os.path.join(self.temp_input_dir, 'tmp'), queue=self.queue_path)
+
+                self.assertEqual([outcome["status"] for outcome in outcomes], ["done"] * 5)
+                self.assertEqual(sorted(os.listdir(output_dir)), [f"output_{i}.json" for i in range(1, 6)])
+                with open(run_somef.manifest_path(output_dir), 'r') as f:
+                    manifest = json.load(f)
+                self.assertEqual(manifest[f"https://github.com/{cluster}/repo0"]["backend"], "inprocess")
+        finally:
+            stop.set()
+            daemon.join(10)
+
+        self.assertFalse(daemon.is_alive())
+        with open(self.imports_file, 'r') as f:
+            self.assertLessEqual(len(f.read().split()), 2)
+
+    def test_crashed_worker_is_replaced(self):
+        """This is for testing that a repository that kills its worker fails after MAX_ATTEMPTS while the others are extracted"""
+        daemon, stop = self.start_daemon(workers=1)
+        try:
+            input_file = self.create_test_json_file('repos_test.json', [
+                {"github_url": "https://github.com/foo/crash"},
+                {"github_url": "https://github.com/foo/fine"}
+            ])
+            outcomes = run_somef.run_somef_on_links(input_file, self.temp_output_dir, "0.8", os.path.join(self.temp_input_dir, 'tmp'), queue=self.queue_path)
+        finally:
+            stop.set()
+            daemon.join(10)
+
+        self.assertEqual([outcome["status"] for outcome in outcomes], ["failed", "done"])
+
+    @unittest.skipUnless(os.path.exists('/proc/self/status'), "reads the signal mask of the worker from /proc")
+    def test_workers_ignore_sigterm(self):
+        """This is for testing that a SIGTERM sent to the whole process group leaves the workers to the daemon"""
+        daemon, stop = self.start_daemon(workers=1)
+        try:
+            for i in range(2):
+                input_file = self.create_test_json_file('repos_test.json', [{"github_url": f"https://github.com/foo/repo{i}"}])
+                output_dir = os.path.join(self.temp_output_dir, str(i))
+                outcomes = run_somef.run_somef_on_links(input_file, output_dir, "0.8", os.path.join(self.temp_input_dir, 'tmp'), queue=self.queue_path)
+                self.assertEqual([outcome["status"] for outcome in outcomes], ["done"])
+
+                with open(self.imports_file, 'r') as f:
+                    workers = [int(pid) for pid in f.read().split()]
+                self.assertEqual(len(workers), 1)
+                # A worker killed while it waits on the stop event would leave stop.set() hanging, so check first
+                with open(f'/proc/{workers[0]}/status', 'r') as f:
+                    ignored = int(next(line for line in f if line.startswith('SigIgn:')).split()[1], 16)
+                self.assertTrue(ignored & 1 << (signal.SIGTERM - 1))
+                os.kill(workers[0], signal.SIGTERM)
+        finally:
+            stop.set()
+            daemon.join(10)
+
+        self.assertFalse(daemon.is_alive())
+
+    def test_no_worker(self):
+        """This is for testing that a run without any worker gives up and cancels its jobs instead of waiting forever"""
+        input_file = self.create_test_json_file('repos_test.json', [{"github_url": "https://github.com/foo/one"}])
+        with mock.patch.object(somef_queue, 'HEARTBEAT_SECONDS', 0.2):
+            outcomes = run_somef.run_somef_on_links(input_file, self.temp_output_dir, "0.8", os.path.join(self.temp_input_dir, 'tmp'), queue=self.queue_path)
+
+        self.assertEqual([outcome["status"] for outcome in outcomes], ["failed"])
+        queue = somef_queue.JobQueue(self.queue_path)
+        self.assertIsNone(queue.claim("host:1", "inprocess"))
+        queue.close()
+
+    def test_serve_restores_sigterm_handler(self):
+        """This is for testing that serve only handles SIGTERM while it runs"""
+        previous_handler = signal.getsignal(signal.SIGTERM)
+        stop = multiprocessing.get_context().Event()
+        stop.set()
+        somef_queue.serve(self.queue_path, workers=1, stop=stop)
+        self.assertIs(signal.getsignal(signal.SIGTERM), previous_handler)
+
+if __name__ == '__main__':
+    unittest.main()
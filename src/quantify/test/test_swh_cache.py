@@ -0,0 +1,80 @@
+import unittest
+import os
+import json
+import time
+import tempfile
+import shutil
+from unittest import mock
+from quantify.rqs_scripts import rq2, swh_cache
+
+class TestSWHCacheFunction(unittest.TestCase):
+
+    """Here I'm creating temporary files and clearing them after the test"""
+    def setUp(self):
+
+        self.temp_input_dir = tempfile.mkdtemp()
+        self.temp_output_dir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.temp_input_dir, 'cache', 'swh_cache.sqlite')
+
+    def tearDown(self):
+
+        shutil.rmtree(self.temp_input_dir)
+        shutil.rmtree(self.temp_output_dir)
+
+    def create_test_json_file(self, filename, content):
+        """This is a method to create test JSON files"""
+        file_path = os.path.join(self.temp_input_dir, filename)
+        with open(file_path, 'w') as f:
+            json.dump(content, f)
+        return file_path
+###################################################################
+    def test_normalize_origin(self):
+        """This is for testing that equivalent GitHub URLs share one cache entry"""
+        self.assertEqual(swh_cache.normalize_origin("https://GitHub.com/dgarijo/Widoco/"), "https://github.com/dgarijo/Widoco")
+        self.assertEqual(swh_cache.normalize_origin("https://github.com/dgarijo/Widoco.git"), "https://github.com/dgarijo/Widoco")
+
+    def test_cache_ttl_and_refresh(self):
+        """This is for testing that answers expire after the TTL and that refresh ignores them"""
+        cache = swh_cache.SWHCache(self.cache_path, ttl_days=1)
+        cache.put("https://github.com/foo/bar", True, 200)
+        cache.put("https://github.com/foo/error", False, 500)
+        self.assertEqual(cache.get("https://github.com/foo/bar/"), (True, 200))
+        self.assertIsNone(cache.get("https://github.com/foo/error"))
+
+        with mock.patch.object(swh_cache.time, 'time', return_value=time.time() + 2 * 24 * 3600):
+            self.assertIsNone(cache.get("https://github.com/foo/bar"))
+        cache.close()
+
+        refreshed = swh_cache.SWHCache(self.cache_path, ttl_days=1, refresh=True)
+        self.assertIsNone(refreshed.get("https://github.com/foo/bar"))
+        refreshed.close()
+
+    def test_rq2_uses_cache(self):
+        """This is for testing that a second RQ2 run is answered from the cache without querying SWH"""
+        test_data = [
+            {"github_url": "https://github.com/foo/archived"},
+            {"github_url": "https://github.com/foo/missing"}
+        ]
+        input_file = self.create_test_json_file('repos_test.json', test_data)
+
+        def fake_query(github_url, session, endpoint=rq2.SWH_API_ENDPOINT, rate_limit=None):
+            return ("archived" in github_url, 200 if "archived" in github_url else 404)
+
+        cache = swh_cache.SWHCache(self.cache_path)
+        with mock.patch.object(rq2, 'query_swh', side_effect=fake_query) as query:
+            rq2.rq2(input_file, "", 'first_rq2.json', self.temp_output_dir, cache=cache)
+            self.assertEqual(query.call_count, 2)
+
+            rq2.rq2(input_file, "", 'second_rq2.json', self.temp_output_dir, cache=cache)
+            self.assertEqual(query.call_count, 2)
+        cache.close()
+
+        with open(os.path.join(self.temp_output_dir, 'first_rq2.json'), 'r') as f:
+            first = json.load(f)
+        with open(os.path.join(self.temp_output_dir, 'second_rq2.json'), 'r') as f:
+            second = json.load(f)
+        self.assertEqual(first, second)
+        self.assertEqual(second["summary"]["count_in_swh"], 1)
+
+if __name__ == '__main__':
+    unittest.main()